@@ -0,0 +1,138 @@
+import asyncio
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from sqlalchemy.orm import sessionmaker
+from dotenv import load_dotenv
+import database
+from database import engine, DB_POOL_SIZE
+
+load_dotenv()
+
+# Veritabanı işlemlerini event loop dışında çalıştıran iş parçacığı sayısı.
+# Bağlantı havuzundan büyük olursa fazla iş parçacıkları bağlantı bekler.
+DB_THREADS = int(os.getenv("DB_THREADS", DB_POOL_SIZE))
+
+# telegram_id -> users.id eşlemesi için süreç genelinde sınırlı önbellek
+USER_ID_CACHE_SIZE = int(os.getenv("USER_ID_CACHE_SIZE", 10000))
+
+# Commit sonrası nesneler expire edilmez; oturum kapandıktan sonra handler'lar
+# dönen nesnelerin alanlarını güvenle okuyabilir
+AsyncSessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
+
+_executor = ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix="db")
+
+# Yalnızca event loop üzerinden kullanılır, kilit gerekmez
+_user_ids = OrderedDict()
+
+def _with_session(func, *args, **kwargs):
+    db = AsyncSessionLocal()
+    try:
+        return func(db, *args, **kwargs)
+    finally:
+        db.close()
+
+async def run_db(func, *args, **kwargs):
+    # func(db, *args, **kwargs) kendi oturumuyla veritabanı iş parçacığında çalışır
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(_with_session, func, *args, **kwargs))
+
+def _open_stream(func, args, kwargs):
+    db = AsyncSessionLocal()
+    try:
+        return db, iter(func(db, *args, **kwargs))
+    except Exception:
+        db.close()
+        raise
+
+def _next_chunk(iterator, size):
+    chunk = []
+    for item in iterator:
+        chunk.append(item)
+        if len(chunk) >= size:
+            break
+    return chunk
+
+async def stream_db(func, *args, chunk_size=100, **kwargs):
+    # func(db, ...) bir iterator/generator döndürür; öğeler veritabanı iş parçacığında
+    # chunk_size'lık parçalar halinde okunur. Oturum akış boyunca açık kalır.
+    loop = asyncio.get_running_loop()
+    db, iterator = await loop.run_in_executor(_executor, _open_stream, func, args, kwargs)
+    try:
+        while True:
+            chunk = await loop.run_in_executor(_executor, _next_chunk, iterator, chunk_size)
+            if not chunk:
+                break
+            for item in chunk:
+                yield item
+    finally:
+        await loop.run_in_executor(_executor, db.close)
+
+def shutdown():
+    _executor.shutdown(wait=True)
+
+# Kullanıcı işlemleri
+async def create_user(telegram_id, username):
+    return await run_db(database.create_user, telegram_id, username)
+
+async def get_user(telegram_id):
+    return await run_db(database.get_user, telegram_id)
+
+def _remember_user_id(telegram_id, user_id):
+    _user_ids[telegram_id] = user_id
+    _user_ids.move_to_end(telegram_id)
+    if len(_user_ids) > USER_ID_CACHE_SIZE:
+        _user_ids.popitem(last=False)
+
+async def get_or_create_user(telegram_id, username):
+    user_id = await run_db(database.get_or_create_user, telegram_id, username)
+    _remember_user_id(telegram_id, user_id)
+    return user_id
+
+async def get_user_id(telegram_id, username=None):
+    # Önbellekte varsa veritabanına hiç gitmeden users.id döner;
+    # yoksa tek bir upsert ile kullanıcıyı oluşturur/bulur ve önbelleğe ekler
+    user_id = _user_ids.get(telegram_id)
+    if user_id is not None:
+        _user_ids.move_to_end(telegram_id)
+        return user_id
+    return await get_or_create_user(telegram_id, username)
+
+async def get_reminder_settings(user_id):
+    return await run_db(database.get_reminder_settings, user_id)
+
+async def set_reminder_settings(user_id, reminder_time, timezone, next_reminder_at):
+    return await run_db(database.set_reminder_settings, user_id, reminder_time, timezone, next_reminder_at)
+
+# Ürün işlemleri
+async def add_product(user_id, name, expiry_date, category=None, description=None):
+    return await run_db(database.add_product, user_id, name, expiry_date, category, description)
+
+async def get_user_products(user_id):
+    return await run_db(database.get_user_products, user_id)
+
+async def bulk_add_products(user_id, products):
+    return await run_db(database.bulk_add_products, user_id, products)
+
+async def get_user_products_page(user_id, cursor=None, direction="next", limit=10):
+    return await run_db(database.get_user_products_page, user_id, cursor, direction, limit)
+
+async def count_user_products(user_id):
+    return await run_db(database.count_user_products, user_id)
+
+async def get_user_expiring_products(user_id, days=7):
+    return await run_db(database.get_user_expiring_products, user_id, days)
+
+async def delete_product(product_id, user_id):
+    return await run_db(database.delete_product, product_id, user_id)
+
+async def update_product(product_id, user_id, **kwargs):
+    return await run_db(database.update_product, product_id, user_id, **kwargs)
+
+# Arşiv işlemleri
+async def get_user_archive(user_id, limit=20):
+    return await run_db(database.get_user_archive, user_id, limit)
+
+async def count_user_archive(user_id):
+    return await run_db(database.count_user_archive, user_id)
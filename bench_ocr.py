@@ -0,0 +1,322 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import subprocess
+import statistics
+from datetime import date, datetime, timedelta
+import cv2
+import numpy as np
+import ocr
+from ocr_engine import get_engine, OCR_BACKEND
+from date_extractor import date_extractor
+
+# OCR hattı için sentetik, etiketli bir etiket fotoğrafı derlemi üretir ve
+#   - metin bölgesi tespitinin SKT satırını bulma oranını,
+#   - her ön işleme/PSM aşamasının tek başına gecikmesini ve doğruluğunu,
+#   - process_image_ocr hattının tamamının gecikmesini, doğruluğunu ve işlem hacmini
+# ölçüp commit'ler arasında karşılaştırılabilecek bir JSON raporu yazar:
+#   python bench_ocr.py --count 200 --output ocr_report.json
+# Derlem seed ile tekrar üretilebilir; --save-corpus ile görüntüler diske de yazılabilir.
+
+FONTS = [
+    cv2.FONT_HERSHEY_SIMPLEX,
+    cv2.FONT_HERSHEY_DUPLEX,
+    cv2.FONT_HERSHEY_COMPLEX,
+    cv2.FONT_HERSHEY_TRIPLEX,
+    cv2.FONT_HERSHEY_PLAIN,
+]
+
+# Hershey yazı tipleri yalnızca ASCII çizebilir; Türkçe karakterler OCR'ın sık yaptığı gibi
+# ASCII karşılıklarıyla yazılır (date_extractor ikisini de kabul eder)
+MONTH_NAMES = ['OCAK', 'SUBAT', 'MART', 'NISAN', 'MAYIS', 'HAZIRAN',
+               'TEMMUZ', 'AGUSTOS', 'EYLUL', 'EKIM', 'KASIM', 'ARALIK']
+
+DISTRACTORS = ['PARTI NO: {lot}', 'NET 500 G', 'LOT {lot}', 'TETT 4 C', '+4 C ALTINDA SAKLAYINIZ', 'BARKOD {lot}{lot}']
+
+def format_label(kind, expiry, production, rng):
+    # (SKT satırı metni, beklenen date_str) döndürür
+    dmy = expiry.strftime('%d.%m.%Y')
+    if kind == 'skt':
+        return f"SKT: {dmy}", dmy
+    if kind == 'skt_dots':
+        separator = rng.choice(['.', '/'])
+        year = expiry.strftime('%y') if rng.random() < 0.5 else expiry.strftime('%Y')
+        return f"S.K.T {expiry:%d}{separator}{expiry:%m}{separator}{year}", dmy
+    if kind == 'son_kullanma':
+        return f"Son Kullanma Tarihi: {dmy}", dmy
+    if kind == 'month_name':
+        return f"{expiry.day} {MONTH_NAMES[expiry.month - 1]} {expiry.year}", dmy
+    if kind == 'production':
+        return f"URETIM: {production:%d.%m.%Y} SKT: {dmy}", dmy
+    return dmy, dmy
+
+LABEL_KINDS = ['skt', 'skt_dots', 'son_kullanma', 'month_name', 'production', 'generic']
+
+def render_sample(index, rng):
+    expiry = date.today() + timedelta(days=rng.randint(-30, 900))
+    production = expiry - timedelta(days=rng.randint(30, 720))
+    kind = LABEL_KINDS[index % len(LABEL_KINDS)]
+    text, expected = format_label(kind, expiry, production, rng)
+
+    width, height = rng.choice([(900, 600), (1200, 800), (1600, 1200), (2400, 1800)])
+    background = np.array([rng.randint(170, 255) for _ in range(3)], dtype=np.uint8)
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[:] = background
+    # Hafif yatay aydınlatma farkı
+    shade = np.linspace(rng.uniform(0.8, 1.0), 1.0, width, dtype=np.float32)[None, :, None]
+    image = (image * shade).astype(np.uint8)
+
+    font = rng.choice(FONTS)
+    thickness = rng.randint(2, 4)
+    scale = width / 900 * rng.uniform(0.9, 1.6) * (2.0 if font == cv2.FONT_HERSHEY_PLAIN else 1.0)
+    color = tuple(rng.randint(0, 70) for _ in range(3))
+
+    lines = [rng.choice(DISTRACTORS).format(lot=rng.randint(1000, 9999)) for _ in range(rng.randint(1, 3))]
+    target_line = rng.randint(0, len(lines))
+    lines.insert(target_line, text)
+
+    # Satırlar (döndürmeden sonra da) görüntüye sığsın diye gerekirse yazıyı küçült
+    x = rng.randint(width // 20, width // 8)
+    widest = max(cv2.getTextSize(line, font, scale, thickness)[0][0] for line in lines)
+    if widest > (width - x) * 0.85:
+        scale *= (width - x) * 0.85 / widest
+    (_, line_height), _ = cv2.getTextSize('Ag', font, scale, thickness)
+    step = int(line_height * 2.2)
+    y = rng.randint(step, max(step + 1, height - step * len(lines)))
+    target_box = None
+    for i, line in enumerate(lines):
+        (text_width, text_height), baseline = cv2.getTextSize(line, font, scale, thickness)
+        cv2.putText(image, line, (x, y), font, scale, color, thickness, cv2.LINE_AA)
+        if i == target_line:
+            target_box = (x, y - text_height, text_width, text_height + baseline)
+        y += step
+
+    # Döndürme: SKT satırının kutusu da aynı dönüşümle taşınır
+    angle = rng.uniform(-8, 8)
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    image = cv2.warpAffine(image, matrix, (width, height), borderMode=cv2.BORDER_REPLICATE)
+    bx, by, bw, bh = target_box
+    corners = np.array([[bx, by, 1], [bx + bw, by, 1], [bx, by + bh, 1], [bx + bw, by + bh, 1]], dtype=np.float32)
+    moved = corners @ matrix.T
+    x0, y0 = moved.min(axis=0)
+    x1, y1 = moved.max(axis=0)
+    target_box = (int(x0), int(y0), int(x1 - x0), int(y1 - y0))
+
+    blur = rng.choice([0, 0, 3, 5])
+    if blur:
+        image = cv2.GaussianBlur(image, (blur, blur), 0)
+    noise = rng.uniform(0, 12)
+    if noise:
+        image = np.clip(image + np.random.default_rng(index).normal(0, noise, image.shape), 0, 255).astype(np.uint8)
+
+    quality = rng.randint(55, 95)
+    ok, encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise RuntimeError("JPEG kodlanamadı")
+    return {
+        'id': index,
+        'kind': kind,
+        'text': text,
+        'expected': expected,
+        'box': target_box,
+        'size': (width, height),
+        'jpeg': encoded.tobytes(),
+    }
+
+def generate_corpus(count, seed):
+    rng = random.Random(seed)
+    return [render_sample(index, rng) for index in range(count)]
+
+def save_corpus(corpus, directory):
+    os.makedirs(directory, exist_ok=True)
+    labels = []
+    for sample in corpus:
+        filename = f"{sample['id']:04d}_{sample['kind']}.jpg"
+        with open(os.path.join(directory, filename), 'wb') as f:
+            f.write(sample['jpeg'])
+        labels.append({'file': filename, **{k: v for k, v in sample.items() if k != 'jpeg'}})
+    with open(os.path.join(directory, 'labels.json'), 'w', encoding='utf-8') as f:
+        json.dump(labels, f, ensure_ascii=False, indent=2)
+
+def percentiles(values):
+    if not values:
+        return None
+    values = sorted(values)
+    def pick(q):
+        return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 2)
+    return {
+        'p50_ms': pick(0.50),
+        'p90_ms': pick(0.90),
+        'p99_ms': pick(0.99),
+        'mean_ms': round(statistics.fmean(values) * 1000, 2),
+    }
+
+def covers(region, box, scale, min_overlap=0.8):
+    # Bölge (küçültülmüş koordinatlarda) SKT satırının en az min_overlap kadarını içeriyor mu
+    rx, ry, rw, rh = (v / scale for v in region)
+    bx, by, bw, bh = box
+    ix = max(0, min(rx + rw, bx + bw) - max(rx, bx))
+    iy = max(0, min(ry + rh, by + bh) - max(ry, by))
+    return bw * bh > 0 and ix * iy >= min_overlap * bw * bh
+
+def is_correct(text, expected):
+    candidates = date_extractor.extract(text)
+    return bool(candidates) and candidates[0]['date_str'] == expected
+
+def check_engine():
+    # Tesseract kurulu değilse OCR aşamaları ölçülemez; hata rapora yazılır
+    engine = get_engine()
+    try:
+        engine.image_to_string(np.full((32, 32), 255, dtype=np.uint8), 6)
+        return engine.name, None
+    except Exception as e:
+        return engine.name, str(e)
+
+def bench_regions_and_stages(corpus, run_stages):
+    decode_times, region_times = [], []
+    region_hits = 0
+    stages = {name: {'ocr': [], 'correct': 0, 'errors': 0} for name, _, _ in ocr.OCR_STAGES}
+    # Ön işleme süreleri aşamalardan ayrı, fonksiyon başına tutulur; paylaşılan ön işleme
+    # (ör. basic_psm6 ve basic_psm11) her fotoğrafta bir kez sayılır
+    preprocess_times = {preprocess.__name__: [] for _, preprocess, _ in ocr.OCR_STAGES}
+    engine = get_engine()
+
+    for sample in corpus:
+        started = time.perf_counter()
+        image, scale = ocr.downscale_image(ocr.decode_image(sample['jpeg']))
+        decode_times.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        regions = ocr.find_text_regions(image)
+        region_times.append(time.perf_counter() - started)
+        if any(covers(region, sample['box'], scale) for region in regions):
+            region_hits += 1
+
+        crops = [image[y:y + h, x:x + w] for x, y, w, h in regions] or [image]
+        # Hattaki gibi aynı ön işleme birden fazla aşamada kullanılırsa bir kez hesaplanır
+        preprocessed = {}
+        for name, preprocess, psm in ocr.OCR_STAGES:
+            stage = stages[name]
+            if preprocess not in preprocessed:
+                started = time.perf_counter()
+                preprocessed[preprocess] = [preprocess(crop) for crop in crops]
+                preprocess_times[preprocess.__name__].append(time.perf_counter() - started)
+            processed = preprocessed[preprocess]
+            if not run_stages:
+                continue
+
+            # Aşama tek başına: tüm kırpıntılar bu ön işleme ve PSM ile okunur
+            started = time.perf_counter()
+            try:
+                text = '\n'.join(engine.image_to_string(img, psm) for img in processed)
+            except Exception:
+                stage['errors'] += 1
+                continue
+            stage['ocr'].append(time.perf_counter() - started)
+            if is_correct(text, sample['expected']):
+                stage['correct'] += 1
+
+    count = len(corpus)
+    report = {
+        'decode_downscale': percentiles(decode_times),
+        'find_text_regions': {**percentiles(region_times), 'recall': round(region_hits / count, 4)},
+        'preprocess': {name: percentiles(times) for name, times in preprocess_times.items()},
+        'stages': {},
+    }
+    for name, preprocess, _ in ocr.OCR_STAGES:
+        stage = stages[name]
+        report['stages'][name] = {
+            'preprocess': preprocess.__name__,
+            'ocr': percentiles(stage['ocr']),
+            'accuracy': round(stage['correct'] / count, 4) if run_stages else None,
+            'errors': stage['errors'],
+        }
+    return report
+
+def bench_pipeline(corpus):
+    latencies, by_kind, by_stage = [], {}, {}
+    correct = 0
+    started_all = time.perf_counter()
+    for sample in corpus:
+        started = time.perf_counter()
+        results = ocr.process_image_ocr(sample['jpeg'])
+        latencies.append(time.perf_counter() - started)
+
+        hit = bool(results) and results[0]['date_str'] == sample['expected']
+        correct += hit
+        kind = by_kind.setdefault(sample['kind'], {'count': 0, 'correct': 0})
+        kind['count'] += 1
+        kind['correct'] += hit
+        if results:
+            stage_name = results[0]['stage'].split('/', 1)[-1]
+            by_stage[stage_name] = by_stage.get(stage_name, 0) + 1
+    elapsed = time.perf_counter() - started_all
+
+    return {
+        'latency': percentiles(latencies),
+        'accuracy': round(correct / len(corpus), 4),
+        'throughput_per_s': round(len(corpus) / elapsed, 2),
+        'by_kind': {k: round(v['correct'] / v['count'], 4) for k, v in sorted(by_kind.items())},
+        'winning_stage': by_stage,
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR hattı için sentetik derlem ile performans/doğruluk ölçümü")
+    parser.add_argument('--count', type=int, default=60, help="üretilecek görüntü sayısı")
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--output', help="JSON raporun yazılacağı dosya (varsayılan: standart çıktı)")
+    parser.add_argument('--save-corpus', metavar='DIR', help="üretilen görüntüleri ve etiketleri bu klasöre yaz")
+    parser.add_argument('--skip-stages', action='store_true', help="aşama bazlı OCR ölçümünü atla (yalnızca hat)")
+    args = parser.parse_args()
+
+    # OCR metinleri raporu boğmasın
+    import logging
+    logging.basicConfig(level=logging.WARNING)
+
+    started = time.perf_counter()
+    corpus = generate_corpus(args.count, args.seed)
+    generated = time.perf_counter() - started
+    if args.save_corpus:
+        save_corpus(corpus, args.save_corpus)
+
+    engine_name, engine_error = check_engine()
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+            'backend': OCR_BACKEND,
+            'engine': engine_name,
+            'engine_error': engine_error,
+            'count': args.count,
+            'seed': args.seed,
+            'corpus_kinds': LABEL_KINDS,
+            'corpus_generation_s': round(generated, 3),
+        },
+    }
+    report.update(bench_regions_and_stages(corpus, run_stages=engine_error is None and not args.skip_stages))
+    report['pipeline'] = bench_pipeline(corpus) if engine_error is None else None
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+    if engine_error:
+        print(f"Uyarı: OCR motoru çalışmıyor, yalnızca görüntü işleme aşamaları ölçüldü: {engine_error}", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+import time
+
+# Ölçüm, diğer tüm içe aktarmalardan önce başlar
+STARTED = time.perf_counter()
+
+import os
+import sys
+import json
+import argparse
+import asyncio
+import tempfile
+import statistics
+import subprocess
+
+# Botun başlangıç süresini ve bellek kullanımını OCR yığını (OpenCV, numpy, Tesseract)
+# yüklenmiş ve yüklenmemiş olarak ölçer. Her ölçüm ayrı bir Python sürecinde yapılır:
+#   python bench_startup.py --runs 5
+# Telegram'a bağlanılmaz; istekler süreç içinde sahte bir Bot API ile yanıtlanır ve
+# geçici bir SQLite veritabanı kullanılır.
+
+OCR_MODULES = ('cv2', 'numpy', 'pytesseract', 'PIL')
+
+def rss_mb():
+    # Linux'ta anlık RSS, diğer sistemlerde en yüksek RSS
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1024 * 1024) if sys.platform == 'darwin' else maxrss / 1024
+
+def make_fake_request():
+    from telegram.request import BaseRequest
+
+    class FakeBotAPI(BaseRequest):
+        # getMe ve sendMessage'ı ağ olmadan yanıtlar; ilk yanıtın zamanını kaydeder
+        def __init__(self):
+            self.first_reply_at = None
+            self.replied = asyncio.Event()
+
+        async def initialize(self):
+            pass
+
+        async def shutdown(self):
+            pass
+
+        async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                             connect_timeout=None, pool_timeout=None):
+            endpoint = url.rsplit('/', 1)[-1]
+            params = request_data.parameters if request_data else {}
+            if endpoint == 'getMe':
+                result = {'id': 1, 'is_bot': True, 'first_name': 'bench', 'username': 'bench_bot'}
+            elif endpoint == 'sendMessage':
+                if self.first_reply_at is None:
+                    self.first_reply_at = time.perf_counter()
+                    self.replied.set()
+                result = {'message_id': 1, 'date': int(time.time()),
+                          'chat': {'id': params.get('chat_id'), 'type': 'private'}, 'text': params.get('text', '')}
+            else:
+                result = True
+            return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+    return FakeBotAPI()
+
+def start_update(user_id=1):
+    return {
+        'update_id': 1,
+        'message': {
+            'message_id': 1, 'date': int(time.time()), 'text': '/start',
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': 'bench'},
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': 6}],
+        },
+    }
+
+async def measure_first_update(eager_ocr):
+    import database
+    database.init_db()
+    import bot
+    from telegram import Update
+    from telegram.ext import ApplicationBuilder
+
+    if eager_ocr:
+        # Eski davranış: OCR yığını bot ile birlikte başlangıçta yüklenir
+        bot.load_ocr()
+    imported = time.perf_counter()
+
+    fake = make_fake_request()
+    original_build = ApplicationBuilder.build
+    ApplicationBuilder.build = lambda self: original_build(self.request(fake).get_updates_request(make_fake_request()))
+    try:
+        application = bot.build_application()
+    finally:
+        ApplicationBuilder.build = original_build
+
+    await application.initialize()
+    await application.start()
+    await application.update_queue.put(Update.de_json(start_update(), application.bot))
+    await asyncio.wait_for(fake.replied.wait(), timeout=30)
+    await application.stop()
+    await application.shutdown()
+    bot.ocr_executor.shutdown()
+
+    return {
+        'import_s': round(imported - STARTED, 3),
+        'first_update_s': round(fake.first_reply_at - STARTED, 3),
+        'rss_mb': round(rss_mb(), 1) if rss_mb() is not None else None,
+        'ocr_loaded': [name for name in OCR_MODULES if name in sys.modules],
+    }
+
+def run_child(eager_ocr):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ)
+        env['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        env.setdefault('TELEGRAM_BOT_TOKEN', '1:bench')
+        # Arka plan ön yüklemesi ölçümü bozmasın
+        env['OCR_PRELOAD'] = '0'
+        command = [sys.executable, __file__, '--child'] + (['--eager-ocr'] if eager_ocr else [])
+        started = time.perf_counter()
+        output = subprocess.run(command, env=env, capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        # Yorumlayıcının açılışı dahil toplam süre
+        result['process_s'] = round(time.perf_counter() - started, 3)
+        return result
+
+def summarize(results):
+    summary = {}
+    for key in ('import_s', 'first_update_s', 'process_s', 'rss_mb'):
+        values = [r[key] for r in results if r[key] is not None]
+        summary[key] = round(statistics.median(values), 3) if values else None
+    summary['ocr_loaded'] = results[-1]['ocr_loaded']
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Bot başlangıç süresi ve bellek ölçümü")
+    parser.add_argument('--runs', type=int, default=3, help="her mod için ölçüm sayısı (medyan raporlanır)")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--eager-ocr', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        import logging
+        logging.disable(logging.CRITICAL)
+        print(json.dumps(asyncio.run(measure_first_update(args.eager_ocr))))
+        return
+
+    report = {}
+    for mode, eager_ocr in (('lazy_ocr', False), ('eager_ocr', True)):
+        report[mode] = summarize([run_child(eager_ocr) for _ in range(args.runs)])
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+if __name__ == '__main__':
+    main()
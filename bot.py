@@ -1,608 +1,910 @@
-import os
-import logging
-import cv2
-import numpy as np
-import pytesseract
-import re
-from PIL import Image
-from datetime import datetime, timedelta
-from dotenv import load_dotenv
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, ContextTypes, ConversationHandler, filters
-from database import SessionLocal, create_user, get_user, add_product, get_user_products, delete_product
-
-# Logging ayarları
-logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-# Tesseract yolunu ayarla
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-
-# .env dosyasından token'ı yükle
-load_dotenv()
-TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
-
-# Conversation states
-MENU, PRODUCT_NAME, EXPIRY_DATE, DELETE_PRODUCT, WAITING_PHOTO, VERIFY_DATE = range(6)
-
-# OCR işlevi
-async def process_image_ocr(photo_path):
-    try:
-        # Görüntüyü oku
-        image = cv2.imread(photo_path)
-        original = image.copy()
-        
-        # Görüntü ön işleme fonksiyonları
-        def preprocess_basic(img):
-            # Temel ön işleme
-            img = cv2.resize(img, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            denoised = cv2.fastNlMeansDenoising(gray)
-            return denoised
-        
-        def preprocess_adaptive(img):
-            # Adaptif işleme
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-            thresh = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
-            return thresh
-        
-        def preprocess_advanced(img):
-            # Gelişmiş ön işleme
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            ddepth = cv2.CV_32F
-            gradX = cv2.Sobel(gray, ddepth=ddepth, dx=1, dy=0, ksize=-1)
-            gradY = cv2.Sobel(gray, ddepth=ddepth, dx=0, dy=1, ksize=-1)
-            gradient = cv2.subtract(gradX, gradY)
-            gradient = cv2.convertScaleAbs(gradient)
-            blurred = cv2.blur(gradient, (9, 9))
-            (_, thresh) = cv2.threshold(blurred, 225, 255, cv2.THRESH_BINARY)
-            return thresh
-
-        # Farklı ön işleme yöntemleri ve OCR konfigürasyonları
-        preprocessing_methods = [
-            (preprocess_basic, '--oem 3 --psm 6 -l tur'),
-            (preprocess_basic, '--oem 3 --psm 11 -l tur'),
-            (preprocess_adaptive, '--oem 3 --psm 6 -l tur'),
-            (preprocess_advanced, '--oem 3 --psm 6 -l tur'),
-        ]
-        
-        # Geliştirilmiş tarih formatları ve regex pattern'leri
-        date_patterns = {
-            # Standart formatlar
-            r'\d{2}[./]\d{2}[./]\d{4}': '%d.%m.%Y',  # DD/MM/YYYY veya DD.MM.YYYY
-            r'\d{2}[./]\d{2}[./]\d{2}': '%d.%m.%y',   # DD/MM/YY veya DD.MM.YY
-            
-            # Esnek boşluklu formatlar
-            r'(\d{2})\s*[./]\s*(\d{2})\s*[./]\s*(\d{2,4})': None,  # DD / MM / YYYY
-            
-            # SKT özel formatları
-            r'SKT[:\s]*(\d{2})[./](\d{2})[./](\d{2,4})': None,  # SKT: DD/MM/YYYY
-            r'S\.K\.T[:\s]*(\d{2})[./](\d{2})[./](\d{2,4})': None,  # S.K.T: DD/MM/YYYY
-            r'Son\s*Kul\w*\s*Tar\w*[:\s]*(\d{2})[./](\d{2})[./](\d{2,4})': None,  # Son Kullanma Tarihi: DD/MM/YYYY
-            
-            # Ay isimleri ile formatlar
-            r'(\d{1,2})\s*(OCAK|ŞUBAT|MART|NİSAN|MAYIS|HAZİRAN|TEMMUZ|AĞUSTOS|EYLÜL|EKİM|KASIM|ARALIK)\s*(\d{2,4})': 'month_name',
-            r'(\d{1,2})\s*(OCA|ŞUB|MAR|NİS|MAY|HAZ|TEM|AĞU|EYL|EKİ|KAS|ARA)\s*(\d{2,4})': 'month_abbr',
-            
-            # Üretim/Son Kullanma formatları
-            r'Üretim:\s*(\d{2})[./](\d{2})[./](\d{2,4}).*S\.?K\.?T\.?:?\s*(\d{2})[./](\d{2})[./](\d{2,4})': 'production_expiry'
-        }
-
-        # Ay isimlerini sayılara çevirme sözlüğü
-        month_names = {
-            'OCAK': '01', 'OCA': '01',
-            'ŞUBAT': '02', 'ŞUB': '02',
-            'MART': '03', 'MAR': '03',
-            'NİSAN': '04', 'NİS': '04',
-            'MAYIS': '05', 'MAY': '05',
-            'HAZİRAN': '06', 'HAZ': '06',
-            'TEMMUZ': '07', 'TEM': '07',
-            'AĞUSTOS': '08', 'AĞU': '08',
-            'EYLÜL': '09', 'EYL': '09',
-            'EKİM': '10', 'EKİ': '10',
-            'KASIM': '11', 'KAS': '11',
-            'ARALIK': '12', 'ARA': '12'
-        }
-
-        all_results = []
-        
-        # Her ön işleme yöntemi ve OCR konfigürasyonu için dene
-        for preprocess_func, config in preprocessing_methods:
-            # Görüntüyü ön işle
-            processed_image = preprocess_func(image.copy())
-            
-            # Debug için işlenmiş görüntüyü kaydet
-            debug_filename = f'debug_{preprocessing_methods.index((preprocess_func, config))}.jpg'
-            cv2.imwrite(debug_filename, processed_image)
-            
-            # OCR işlemi
-            text = pytesseract.image_to_string(processed_image, config=config)
-            logger.info(f"OCR Sonucu ({config}): {text}")
-            
-            # Her satırı ayrı ayrı kontrol et
-            lines = text.split('\n')
-            for line in lines:
-                # Her pattern için kontrol et
-                for pattern, format_type in date_patterns.items():
-                    matches = re.finditer(pattern, line, re.IGNORECASE)
-                    for match in matches:
-                        try:
-                            date_str = None
-                            confidence = 1.0
-                            production_date = None
-                            
-                            if format_type == 'month_name' or format_type == 'month_abbr':
-                                # Ay isimli format
-                                day, month_name, year = match.groups()
-                                month = month_names.get(month_name.upper())
-                                if month:
-                                    day = day.zfill(2)
-                                    if len(year) == 2:
-                                        year = '20' + year
-                                    date_str = f"{day}.{month}.{year}"
-                                    confidence = 1.2  # Ay isimleri daha güvenilir
-                            
-                            elif format_type == 'production_expiry':
-                                # Üretim ve SKT birlikte
-                                prod_day, prod_month, prod_year, exp_day, exp_month, exp_year = match.groups()
-                                if len(exp_year) == 2:
-                                    exp_year = '20' + exp_year
-                                if len(prod_year) == 2:
-                                    prod_year = '20' + prod_year
-                                date_str = f"{exp_day}.{exp_month}.{exp_year}"
-                                production_date = f"{prod_day}.{prod_month}.{prod_year}"
-                                confidence = 1.5  # İki tarih birden bulunduğu için daha güvenilir
-                            
-                            elif format_type:
-                                # Standart format
-                                date_str = match.group(0).replace('/', '.')
-                                date_obj = datetime.strptime(date_str, format_type)
-                                date_str = date_obj.strftime("%d.%m.%Y")
-                            
-                            else:
-                                # Özel format (gruplar halinde)
-                                if len(match.groups()) == 3:
-                                    day, month, year = match.groups()
-                                    if len(year) == 2:
-                                        year = '20' + year
-                                    date_str = f"{day.strip()}.{month.strip()}.{year.strip()}"
-                            
-                            if date_str:
-                                # Tarihi doğrula
-                                date_obj = datetime.strptime(date_str, "%d.%m.%Y")
-                                
-                                # Geçerlilik kontrolü
-                                if date_obj.year >= 2000 and date_obj.year <= 2100:
-                                    result = {
-                                        'date_str': date_obj.strftime("%d.%m.%Y"),
-                                        'confidence': confidence,
-                                        'line': line.strip(),
-                                        'production_date': production_date
-                                    }
-                                    all_results.append(result)
-                                    
-                        except (ValueError, AttributeError) as e:
-                            logger.debug(f"Tarih ayrıştırma hatası: {str(e)}")
-                            continue
-        
-        # Sonuçları değerlendir
-        if all_results:
-            # Güven skoruna göre sırala
-            all_results.sort(key=lambda x: x['confidence'], reverse=True)
-            
-            # En yüksek güven skoruna sahip sonucu seç
-            best_result = all_results[0]
-            
-            # Detaylı log
-            logger.info(f"Tespit edilen en iyi sonuç: {best_result}")
-            
-            # Üretim tarihi varsa ekstra bilgi ekle
-            if best_result['production_date']:
-                return f"{best_result['date_str']} (Üretim: {best_result['production_date']})"
-            
-            return best_result['date_str']
-        
-        return None
-        
-    except Exception as e:
-        logger.error(f"OCR işlemi sırasında hata: {str(e)}")
-        return None
-
-# Geçici dosyaları temizleme fonksiyonu
-def cleanup_temp_files(user_id):
-    try:
-        # Kullanıcıya özel geçici dosyayı sil
-        temp_file = f"temp_{user_id}.jpg"
-        if os.path.exists(temp_file):
-            os.remove(temp_file)
-        
-        # Debug görsellerini sil
-        for i in range(4):  # preprocessing_methods sayısı kadar
-            debug_file = f"debug_{i}.jpg"
-            if os.path.exists(debug_file):
-                os.remove(debug_file)
-    except Exception as e:
-        logger.error(f"Dosya temizleme hatası: {str(e)}")
-
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user = update.effective_user
-    db = SessionLocal()
-    
-    try:
-        db_user = get_user(db, user.id)
-        if not db_user:
-            create_user(db, user.id, user.username)
-    finally:
-        db.close()
-    
-    keyboard = [
-        ["➕ Ürün Ekle", "📋 Ürünleri Listele"],
-        ["⚠️ Yaklaşan SKT'ler", "🗑️ Ürün Sil"]
-    ]
-    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-    
-    await update.message.reply_text(
-        f"Merhaba {user.first_name}! 🎉\n\n"
-        "SKT Kontrol Botuna hoş geldiniz.\n"
-        "Lütfen aşağıdaki menüden bir işlem seçin:",
-        reply_markup=reply_markup
-    )
-    return MENU
-
-async def menu_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    text = update.message.text
-    
-    if text == "➕ Ürün Ekle":
-        keyboard = [
-            ["📝 Manuel Giriş", "📸 Fotoğraftan SKT Okut"]
-        ]
-        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-        await update.message.reply_text(
-            "Lütfen ekleme yöntemini seçin:",
-            reply_markup=reply_markup
-        )
-        return PRODUCT_NAME
-    elif text == "📋 Ürünleri Listele":
-        await list_products(update, context)
-        return MENU
-    elif text == "🗑️ Ürün Sil":
-        await show_delete_menu(update, context)
-        return DELETE_PRODUCT
-    elif text == "⚠️ Yaklaşan SKT'ler":
-        await show_expiring_products(update, context)
-        return MENU
-    
-    return MENU
-
-async def get_product_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    text = update.message.text
-    
-    if text == "🔙 Ana Menü":
-        return await return_to_main_menu(update, context)
-    elif text == "📸 Fotoğraftan SKT Okut" or text == "📸 Tekrar Dene":
-        await update.message.reply_text(
-            "Lütfen ürünün son kullanma tarihinin olduğu kısmın fotoğrafını gönderin."
-        )
-        return WAITING_PHOTO
-    elif text == "📝 Manuel Giriş":
-        keyboard = [
-            ["🔙 Ana Menü"]
-        ]
-        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-        
-        await update.message.reply_text(
-            "Lütfen ürün adını girin:",
-            reply_markup=reply_markup
-        )
-        context.user_data['input_method'] = 'manual'
-        return PRODUCT_NAME
-    else:
-        if context.user_data.get('input_method') == 'manual':
-            context.user_data['product_name'] = text
-            keyboard = [
-                ["🔙 Ana Menü"]
-            ]
-            reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-            
-            await update.message.reply_text(
-                "Lütfen son kullanma tarihini GG.AA.YYYY formatında girin:\n"
-                "Örnek: 31.12.2024",
-                reply_markup=reply_markup
-            )
-            return EXPIRY_DATE
-        elif context.user_data.get('input_method') == 'ocr':
-            context.user_data['product_name'] = text
-            db = SessionLocal()
-            try:
-                user = get_user(db, update.effective_user.id)
-                expiry_date = datetime.strptime(context.user_data['detected_date'], "%d.%m.%Y").date()
-                add_product(
-                    db,
-                    user.id,
-                    context.user_data['product_name'],
-                    expiry_date
-                )
-                
-                await return_to_main_menu(update, context, "✅ Ürün başarıyla eklendi!")
-                return MENU
-            finally:
-                db.close()
-    
-    return MENU
-
-async def return_to_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE, message=None):
-    keyboard = [
-        ["➕ Ürün Ekle", "📋 Ürünleri Listele"],
-        ["⚠️ Yaklaşan SKT'ler", "🗑️ Ürün Sil"]
-    ]
-    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-    
-    if message:
-        await update.message.reply_text(message, reply_markup=reply_markup)
-    else:
-        await update.message.reply_text(
-            "Ana menüye dönüldü.\n"
-            "Lütfen bir işlem seçin:",
-            reply_markup=reply_markup
-        )
-    return MENU
-
-async def get_expiry_date(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    text = update.message.text
-    
-    if text == "🔙 Ana Menü":
-        return await return_to_main_menu(update, context)
-        
-    try:
-        date_text = update.message.text
-        expiry_date = datetime.strptime(date_text, "%d.%m.%Y").date()
-        
-        db = SessionLocal()
-        try:
-            user = get_user(db, update.effective_user.id)
-            add_product(
-                db,
-                user.id,
-                context.user_data['product_name'],
-                expiry_date
-            )
-        finally:
-            db.close()
-        
-        await return_to_main_menu(update, context, "✅ Ürün başarıyla eklendi!")
-        return MENU
-        
-    except ValueError:
-        keyboard = [
-            ["🔙 Ana Menü"]
-        ]
-        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-        
-        await update.message.reply_text(
-            "❌ Geçersiz tarih formatı! Lütfen GG.AA.YYYY formatında tekrar girin:\n"
-            "Örnek: 31.12.2024",
-            reply_markup=reply_markup
-        )
-        return EXPIRY_DATE
-
-async def list_products(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    db = SessionLocal()
-    try:
-        user = get_user(db, update.effective_user.id)
-        products = get_user_products(db, user.id)
-        
-        if not products:
-            await update.message.reply_text("📭 Henüz kayıtlı ürününüz bulunmamaktadır.")
-            return
-        
-        message = "📋 Ürün Listesi:\n\n"
-        for product in products:
-            days_left = (product.expiry_date - datetime.now().date()).days
-            status = "🟢" if days_left > 7 else "🟡" if days_left > 0 else "🔴"
-            
-            message += (
-                f"{status} {product.name}\n"
-                f"SKT: {product.expiry_date.strftime('%d.%m.%Y')} ({days_left} gün kaldı)\n"
-                f"ID: {product.id}\n\n"
-            )
-        
-        await update.message.reply_text(message)
-    finally:
-        db.close()
-
-async def show_delete_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    db = SessionLocal()
-    try:
-        user = get_user(db, update.effective_user.id)
-        products = get_user_products(db, user.id)
-        
-        if not products:
-            await update.message.reply_text("📭 Silinecek ürün bulunmamaktadır.")
-            return MENU
-        
-        message = "🗑️ Silmek istediğiniz ürünün ID'sini girin:\n\n"
-        for product in products:
-            message += f"ID: {product.id} - {product.name}\n"
-        
-        await update.message.reply_text(message)
-        return DELETE_PRODUCT
-    finally:
-        db.close()
-
-async def delete_product_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    try:
-        product_id = int(update.message.text)
-        db = SessionLocal()
-        try:
-            user = get_user(db, update.effective_user.id)
-            if delete_product(db, product_id, user.id):
-                await update.message.reply_text("✅ Ürün başarıyla silindi!")
-            else:
-                await update.message.reply_text("❌ Ürün bulunamadı veya size ait değil!")
-        finally:
-            db.close()
-    except ValueError:
-        await update.message.reply_text("❌ Geçersiz ID! Lütfen sayısal bir ID girin.")
-    
-    return MENU
-
-async def show_expiring_products(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    db = SessionLocal()
-    try:
-        user = get_user(db, update.effective_user.id)
-        products = get_user_products(db, user.id)
-        
-        if not products:
-            await update.message.reply_text("📭 Henüz kayıtlı ürününüz bulunmamaktadır.")
-            return
-        
-        expiring_products = []
-        for product in products:
-            days_left = (product.expiry_date - datetime.now().date()).days
-            if days_left <= 7:
-                expiring_products.append((product, days_left))
-        
-        if not expiring_products:
-            await update.message.reply_text("✅ 7 gün içinde son kullanma tarihi yaklaşan ürününüz bulunmamaktadır.")
-            return
-        
-        message = "⚠️ Yaklaşan Son Kullanma Tarihleri:\n\n"
-        for product, days_left in expiring_products:
-            status = "🟡" if days_left > 0 else "🔴"
-            
-            if days_left <= 0:
-                durum = "SON KULLANMA TARİHİ GEÇMİŞ!"
-            else:
-                durum = f"{days_left} gün kaldı"
-            
-            message += (
-                f"{status} {product.name}\n"
-                f"SKT: {product.expiry_date.strftime('%d.%m.%Y')} ({durum})\n"
-                f"ID: {product.id}\n\n"
-            )
-        
-        await update.message.reply_text(message)
-    finally:
-        db.close()
-
-async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text("İşlem iptal edildi.")
-    return MENU
-
-async def photo_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    try:
-        # Fotoğrafı indir
-        photo = await update.message.photo[-1].get_file()
-        photo_path = f"temp_{update.effective_user.id}.jpg"
-        await photo.download_to_drive(photo_path)
-        
-        # OCR işlemi
-        date_str = await process_image_ocr(photo_path)
-        
-        # Tüm geçici dosyaları temizle
-        cleanup_temp_files(update.effective_user.id)
-        
-        if date_str:
-            keyboard = [
-                ["✅ Doğru", "❌ Yanlış"]
-            ]
-            reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-            
-            await update.message.reply_text(
-                f"Tespit edilen tarih: {date_str}\n\n"
-                "Bu tarih doğru mu?",
-                reply_markup=reply_markup
-            )
-            context.user_data['detected_date'] = date_str
-            return VERIFY_DATE
-        else:
-            keyboard = [
-                ["📝 Manuel Giriş", "📸 Tekrar Dene"]
-            ]
-            reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-            
-            await update.message.reply_text(
-                "❌ Son kullanma tarihi tespit edilemedi.\n"
-                "Lütfen seçim yapın:",
-                reply_markup=reply_markup
-            )
-            return PRODUCT_NAME
-            
-    except Exception as e:
-        logger.error(f"Fotoğraf işleme hatası: {str(e)}")
-        # Hata durumunda da dosyaları temizle
-        cleanup_temp_files(update.effective_user.id)
-        
-        keyboard = [
-            ["📝 Manuel Giriş", "📸 Tekrar Dene"]
-        ]
-        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-        
-        await update.message.reply_text(
-            "❌ Fotoğraf işlenirken bir hata oluştu.\n"
-            "Lütfen seçim yapın:",
-            reply_markup=reply_markup
-        )
-        return PRODUCT_NAME
-
-async def verify_date_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    text = update.message.text
-    
-    if text == "✅ Doğru":
-        keyboard = [
-            ["🔙 Ana Menü"]
-        ]
-        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-        
-        await update.message.reply_text(
-            "Lütfen ürün adını girin:",
-            reply_markup=reply_markup
-        )
-        context.user_data['input_method'] = 'ocr'
-        return PRODUCT_NAME
-    elif text == "❌ Yanlış":
-        keyboard = [
-            ["📝 Manuel Giriş", "📸 Tekrar Dene", "🔙 Ana Menü"]
-        ]
-        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-        
-        await update.message.reply_text(
-            "Lütfen seçim yapın:",
-            reply_markup=reply_markup
-        )
-        return PRODUCT_NAME
-
-def main():
-    application = Application.builder().token(TOKEN).build()
-    
-    conv_handler = ConversationHandler(
-        entry_points=[CommandHandler('start', start)],
-        states={
-            MENU: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, menu_handler)
-            ],
-            PRODUCT_NAME: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, get_product_name)
-            ],
-            EXPIRY_DATE: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, get_expiry_date)
-            ],
-            DELETE_PRODUCT: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, delete_product_handler)
-            ],
-            WAITING_PHOTO: [
-                MessageHandler(filters.PHOTO, photo_handler)
-            ],
-            VERIFY_DATE: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, verify_date_handler)
-            ]
-        },
-        fallbacks=[CommandHandler('iptal', cancel)]
-    )
-    
-    application.add_handler(conv_handler)
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
-
-if __name__ == '__main__':
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from dotenv import load_dotenv
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup
+from telegram.error import BadRequest
+from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, ContextTypes, ConversationHandler, filters
+from async_database import run_db, bulk_add_products, get_or_create_user, get_user_id, add_product, get_user_products_page, delete_product, count_user_products, get_user_expiring_products, get_user_archive, count_user_archive, get_reminder_settings, set_reminder_settings, shutdown as shutdown_database
+from ocr_executor import OCRExecutor, OCRQueueFull
+from ocr_engine import get_engine
+from ocr_cache import OCRCache, OCR_CACHE_PERSIST, compute_dhash
+from scheduler import setup_scheduler, split_message, parse_reminder_time, next_reminder_at, ARCHIVE_AFTER_DAYS, REMINDER_TIME, REMINDER_TIMEZONE, REMINDER_SPREAD_MINUTES, UTC
+from importer import import_products, ImportFileError, IMPORT_MAX_FILE_SIZE
+import metrics
+
+# Logging ayarları
+logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# .env dosyasından token'ı yükle
+load_dotenv()
+TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
+
+# OCR yığını (OpenCV, numpy, Tesseract) ilk fotoğrafta yüklenir. OCR_PRELOAD açıksa
+# bot güncellemeleri işlemeye başladıktan hemen sonra arka planda önceden yüklenir.
+OCR_PRELOAD = os.getenv('OCR_PRELOAD', '1').lower() in ('1', 'true', 'yes')
+
+# Ürün listesi ve silme menüsünde sayfa başına gösterilecek ürün sayısı
+PRODUCTS_PAGE_SIZE = int(os.getenv('PRODUCTS_PAGE_SIZE', 10))
+
+# Albüm (çoklu fotoğraf) gönderiminde son fotoğraftan sonra kaç saniye beklenip toplu OCR'a geçileceği
+ALBUM_DEBOUNCE = float(os.getenv('ALBUM_DEBOUNCE', 1.5))
+
+# polling: getUpdates ile uzun sorgulama, webhook: Telegram güncellemeleri HTTP ile gönderir (bkz. webhook.py)
+BOT_MODE = os.getenv('BOT_MODE', 'polling').lower()
+
+# Aynı anda işlenecek en fazla güncelleme. 1'den büyük olmalı; yoksa süren bir OCR ya da
+# veritabanı işi diğer kullanıcıların mesajlarını bekletir. OCR havuzunun kapasitesinden
+# (OCR_WORKERS + OCR_QUEUE_SIZE) büyük tutulursa havuz dolduğunda kullanıcıya "meşgul" yanıtı gider.
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', 32))
+
+# Yalnızca handler'ların işlediği güncelleme türleri istenir
+ALLOWED_UPDATES = [Update.MESSAGE, Update.CALLBACK_QUERY]
+
+# /stats komutunu kullanabilecek Telegram kullanıcı ID'leri (virgülle ayrılmış)
+ADMIN_IDS = {int(value) for value in os.getenv('ADMIN_IDS', '').replace(',', ' ').split()}
+
+# Conversation states
+MENU, PRODUCT_NAME, EXPIRY_DATE, DELETE_PRODUCT, WAITING_PHOTO, VERIFY_DATE, BATCH_REVIEW = range(7)
+
+# Ana menü butonları (klavye başka bir durumdayken de ekranda kalabilir)
+MENU_BUTTONS = ("➕ Ürün Ekle", "📋 Ürünleri Listele", "⚠️ Yaklaşan SKT'ler", "🗑️ Ürün Sil")
+
+# OCR işlerini event loop dışında çalıştıran süreç havuzu;
+# her işçi başlarken kendi kalıcı OCR motorunu hazırlar
+ocr_executor = OCRExecutor(initializer=get_engine)
+# Albüm fotoğrafları havuza işçi sayısı kadar verilir; büyük bir albüm kuyruğu
+# doldurup kendi fotoğraflarını ya da diğer kullanıcıların isteklerini reddettirmez
+album_ocr_slots = asyncio.Semaphore(ocr_executor.max_workers)
+# Kuyruk dolu olduğu için okunamayan albüm fotoğrafı
+OCR_BUSY = object()
+
+# Aynı / çok benzer fotoğraflar için OCR sonuç önbelleği
+ocr_cache = OCRCache()
+
+_ocr = None
+
+def load_ocr():
+    # ocr modülünü ilk ihtiyaçta içe aktarır; içe aktarma kilidi eşzamanlı çağrıları sıraya koyar
+    global _ocr
+    if _ocr is None:
+        import ocr
+        _ocr = ocr
+    return _ocr
+
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = update.effective_user
+    
+    await get_or_create_user(user.id, user.username)
+    
+    keyboard = [
+        ["➕ Ürün Ekle", "📋 Ürünleri Listele"],
+        ["⚠️ Yaklaşan SKT'ler", "🗑️ Ürün Sil"]
+    ]
+    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    
+    await update.message.reply_text(
+        f"Merhaba {user.first_name}! 🎉\n\n"
+        "SKT Kontrol Botuna hoş geldiniz.\n"
+        "Lütfen aşağıdaki menüden bir işlem seçin:",
+        reply_markup=reply_markup
+    )
+    return MENU
+
+async def menu_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    text = update.message.text
+    
+    if text == "➕ Ürün Ekle":
+        keyboard = [
+            ["📝 Manuel Giriş", "📸 Fotoğraftan SKT Okut"],
+            ["📄 Toplu Ekle (CSV/Excel)"]
+        ]
+        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+        await update.message.reply_text(
+            "Lütfen ekleme yöntemini seçin:",
+            reply_markup=reply_markup
+        )
+        return PRODUCT_NAME
+    elif text == "📋 Ürünleri Listele":
+        await list_products(update, context)
+        return MENU
+    elif text == "🗑️ Ürün Sil":
+        await show_delete_menu(update, context)
+        return DELETE_PRODUCT
+    elif text == "⚠️ Yaklaşan SKT'ler":
+        await show_expiring_products(update, context)
+        return MENU
+    
+    return MENU
+
+async def get_product_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    text = update.message.text
+    
+    if text == "🔙 Ana Menü":
+        return await return_to_main_menu(update, context)
+    elif text == "📸 Fotoğraftan SKT Okut" or text == "📸 Tekrar Dene":
+        await update.message.reply_text(
+            "Lütfen ürünün son kullanma tarihinin olduğu kısmın fotoğrafını gönderin.\n"
+            "Birden fazla ürün için fotoğrafları tek bir albüm olarak gönderebilirsiniz."
+        )
+        return WAITING_PHOTO
+    elif text == "📄 Toplu Ekle (CSV/Excel)":
+        await update.message.reply_text(
+            "Ürünlerinizi CSV veya Excel (XLSX) dosyası olarak gönderin.\n\n"
+            "Sütunlar: ad, skt, kategori, açıklama (kategori ve açıklama isteğe bağlı)\n"
+            "Tarih biçimi: GG.AA.YYYY\n\n"
+            "Örnek:\n"
+            "ad;skt;kategori\n"
+            "Süt;31.12.2024;Süt Ürünleri"
+        )
+        return await return_to_main_menu(update, context, "Dosyayı istediğiniz zaman gönderebilirsiniz.")
+    elif text == "📝 Manuel Giriş":
+        keyboard = [
+            ["🔙 Ana Menü"]
+        ]
+        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+        
+        await update.message.reply_text(
+            "Lütfen ürün adını girin:",
+            reply_markup=reply_markup
+        )
+        context.user_data['input_method'] = 'manual'
+        return PRODUCT_NAME
+    else:
+        if context.user_data.get('input_method') == 'manual':
+            context.user_data['product_name'] = text
+            keyboard = [
+                ["🔙 Ana Menü"]
+            ]
+            reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+            
+            await update.message.reply_text(
+                "Lütfen son kullanma tarihini GG.AA.YYYY formatında girin:\n"
+                "Örnek: 31.12.2024",
+                reply_markup=reply_markup
+            )
+            return EXPIRY_DATE
+        elif context.user_data.get('input_method') == 'ocr':
+            context.user_data['product_name'] = text
+            user_id = await get_user_id(update.effective_user.id, update.effective_user.username)
+            expiry_date = datetime.strptime(context.user_data['detected_date'], "%d.%m.%Y").date()
+            await add_product(
+                user_id,
+                context.user_data['product_name'],
+                expiry_date
+            )
+            
+            await return_to_main_menu(update, context, "✅ Ürün başarıyla eklendi!")
+            return MENU
+    
+    return MENU
+
+async def return_to_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE, message=None):
+    keyboard = [
+        ["➕ Ürün Ekle", "📋 Ürünleri Listele"],
+        ["⚠️ Yaklaşan SKT'ler", "🗑️ Ürün Sil"]
+    ]
+    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    
+    if message:
+        await update.message.reply_text(message, reply_markup=reply_markup)
+    else:
+        await update.message.reply_text(
+            "Ana menüye dönüldü.\n"
+            "Lütfen bir işlem seçin:",
+            reply_markup=reply_markup
+        )
+    return MENU
+
+async def get_expiry_date(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    text = update.message.text
+    
+    if text == "🔙 Ana Menü":
+        return await return_to_main_menu(update, context)
+        
+    try:
+        date_text = update.message.text
+        expiry_date = datetime.strptime(date_text, "%d.%m.%Y").date()
+        
+        user_id = await get_user_id(update.effective_user.id, update.effective_user.username)
+        await add_product(
+            user_id,
+            context.user_data['product_name'],
+            expiry_date
+        )
+        
+        await return_to_main_menu(update, context, "✅ Ürün başarıyla eklendi!")
+        return MENU
+        
+    except ValueError:
+        keyboard = [
+            ["🔙 Ana Menü"]
+        ]
+        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+        
+        await update.message.reply_text(
+            "❌ Geçersiz tarih formatı! Lütfen GG.AA.YYYY formatında tekrar girin:\n"
+            "Örnek: 31.12.2024",
+            reply_markup=reply_markup
+        )
+        return EXPIRY_DATE
+
+def format_product_line(product, today):
+    days_left = (product.expiry_date - today).days
+    status = "🟢" if days_left > 7 else "🟡" if days_left > 0 else "🔴"
+    return (
+        f"{status} {product.name[:200]}\n"
+        f"SKT: {product.expiry_date.strftime('%d.%m.%Y')} ({days_left} gün kaldı)\n"
+        f"ID: {product.id}"
+    )
+
+def encode_cursor(product):
+    return f"{product.expiry_date.isoformat()}:{product.id}"
+
+def decode_cursor(value):
+    expiry_date, product_id = value.split(':')
+    return datetime.strptime(expiry_date, "%Y-%m-%d").date(), int(product_id)
+
+async def render_products_page(user_id, view, cursor=None, direction='next'):
+    # view: 'list' (ürün listesi) veya 'del' (satır başına silme butonlu liste).
+    # Butonların callback_data'sı: "<view>:<prev|next>:<SKT>:<id>" ve "rm:<ürün id>:<SKT>:<id>"
+    products, has_prev, has_next = await get_user_products_page(user_id, cursor, direction, PRODUCTS_PAGE_SIZE)
+    if not products and cursor is not None:
+        # Sayfadaki ürünler silinmiş olabilir: önce bir önceki sayfaya, o da yoksa başa dön
+        products, has_prev, has_next = await get_user_products_page(user_id, cursor, 'prev', PRODUCTS_PAGE_SIZE)
+        if not products:
+            products, has_prev, has_next = await get_user_products_page(user_id, None, 'next', PRODUCTS_PAGE_SIZE)
+    if not products:
+        return None, None
+    
+    today = datetime.now().date()
+    if view == 'del':
+        header = "🗑️ Silmek istediğiniz ürünün butonuna basın veya ID'sini yazın:"
+    else:
+        header = "📋 Ürün Listesi:"
+    text = "\n\n".join([header] + [format_product_line(product, today) for product in products])
+    
+    keyboard = []
+    if view == 'del':
+        anchor = encode_cursor(products[0])
+        for product in products:
+            keyboard.append([InlineKeyboardButton(f"🗑️ {product.name[:40]}", callback_data=f"rm:{product.id}:{anchor}")])
+    
+    navigation = []
+    if has_prev:
+        navigation.append(InlineKeyboardButton("◀️", callback_data=f"{view}:prev:{encode_cursor(products[0])}"))
+    if has_next:
+        navigation.append(InlineKeyboardButton("▶️", callback_data=f"{view}:next:{encode_cursor(products[-1])}"))
+    if navigation:
+        keyboard.append(navigation)
+    
+    return text, InlineKeyboardMarkup(keyboard) if keyboard else None
+
+async def list_products(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = await get_user_id(update.effective_user.id, update.effective_user.username)
+    text, reply_markup = await render_products_page(user_id, 'list')
+    
+    if text is None:
+        await update.message.reply_text("📭 Henüz kayıtlı ürününüz bulunmamaktadır.")
+        return
+    
+    await update.message.reply_text(text, reply_markup=reply_markup)
+
+async def show_delete_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = await get_user_id(update.effective_user.id, update.effective_user.username)
+    text, reply_markup = await render_products_page(user_id, 'del')
+    
+    if text is None:
+        await update.message.reply_text("📭 Silinecek ürün bulunmamaktadır.")
+        return MENU
+    
+    await update.message.reply_text(text, reply_markup=reply_markup)
+    return DELETE_PRODUCT
+
+async def products_page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Listeleme/silme sayfalarındaki inline butonlar; konuşma durumundan bağımsız çalışır
+    query = update.callback_query
+    user_id = await get_user_id(query.from_user.id, query.from_user.username)
+    action, value, cursor = query.data.split(':', 2)
+    
+    try:
+        cursor = decode_cursor(cursor)
+    except ValueError:
+        await query.answer()
+        return
+    
+    if action == 'rm':
+        if await delete_product(int(value), user_id):
+            await query.answer("✅ Ürün başarıyla silindi!")
+        else:
+            await query.answer("❌ Ürün bulunamadı veya size ait değil!")
+        view, direction = 'del', 'at'
+    else:
+        await query.answer()
+        view, direction = action, value
+    
+    text, reply_markup = await render_products_page(user_id, view, cursor, direction)
+    if text is None:
+        text = "📭 Henüz kayıtlı ürününüz bulunmamaktadır."
+    try:
+        await query.edit_message_text(text, reply_markup=reply_markup)
+    except BadRequest as e:
+        # Sayfa değişmediyse (ör. aynı butona iki kez basıldı) Telegram hata döner
+        if 'not modified' not in str(e):
+            raise
+
+async def delete_product_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Inline butonla silindiğinde konuşma bu durumda kalır; menü butonlarını menüye yönlendir
+    if update.message.text in MENU_BUTTONS:
+        return await menu_handler(update, context)
+    
+    try:
+        product_id = int(update.message.text)
+        user_id = await get_user_id(update.effective_user.id, update.effective_user.username)
+        if await delete_product(product_id, user_id):
+            await update.message.reply_text("✅ Ürün başarıyla silindi!")
+        else:
+            await update.message.reply_text("❌ Ürün bulunamadı veya size ait değil!")
+    except ValueError:
+        await update.message.reply_text("❌ Geçersiz ID! Lütfen sayısal bir ID girin.")
+    
+    return MENU
+
+async def show_expiring_products(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = await get_user_id(update.effective_user.id, update.effective_user.username)
+    
+    # 7 günlük pencere ve sıralama veritabanında uygulanır
+    expiring_products = await get_user_expiring_products(user_id, 7)
+    
+    if not expiring_products:
+        if await count_user_products(user_id) == 0:
+            await update.message.reply_text("📭 Henüz kayıtlı ürününüz bulunmamaktadır.")
+        else:
+            await update.message.reply_text("✅ 7 gün içinde son kullanma tarihi yaklaşan ürününüz bulunmamaktadır.")
+        return
+    
+    today = datetime.now().date()
+    lines = []
+    for product in expiring_products:
+        days_left = (product.expiry_date - today).days
+        status = "🟡" if days_left > 0 else "🔴"
+        
+        if days_left <= 0:
+            durum = "SON KULLANMA TARİHİ GEÇMİŞ!"
+        else:
+            durum = f"{days_left} gün kaldı"
+        
+        lines.append(
+            f"{status} {product.name}\n"
+            f"SKT: {product.expiry_date.strftime('%d.%m.%Y')} ({durum})\n"
+            f"ID: {product.id}"
+        )
+    
+    # Uzun listeler Telegram'ın mesaj sınırına göre birden fazla mesaja bölünür
+    for message in split_message("⚠️ Yaklaşan Son Kullanma Tarihleri:\n\n", lines):
+        await update.message.reply_text(message)
+
+async def show_archive(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = await get_user_id(update.effective_user.id, update.effective_user.username)
+    
+    # Son 20 arşiv kaydı; toplam sayı ayrıca sayılır
+    archived = await get_user_archive(user_id, 20)
+    if not archived:
+        await update.message.reply_text("📭 Arşivde ürününüz bulunmamaktadır.")
+        return
+    
+    total = await count_user_archive(user_id)
+    lines = [
+        f"📦 Arşiv ({total} ürün)\n"
+        f"SKT'si {ARCHIVE_AFTER_DAYS} günden uzun süre önce geçen ürünler burada saklanır."
+    ]
+    for product in archived:
+        lines.append(f"🔴 {product.name}\nSKT: {product.expiry_date.strftime('%d.%m.%Y')}")
+    if total > len(archived):
+        lines.append(f"... ve {total - len(archived)} eski ürün daha")
+    
+    await update.message.reply_text("\n\n".join(lines))
+
+async def reminder_time_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # /saat: mevcut ayar, /saat 08:30 [Europe/Berlin]: yeni saat (ve saat dilimi), /saat varsayilan: otomatik saate dön
+    user_id = await get_user_id(update.effective_user.id, update.effective_user.username)
+    settings = await get_reminder_settings(user_id)
+    args = context.args
+    
+    if not args:
+        timezone = settings.timezone or REMINDER_TIMEZONE
+        if settings.reminder_time:
+            current = settings.reminder_time
+        else:
+            current = f"otomatik ({REMINDER_TIME} ile sonraki {REMINDER_SPREAD_MINUTES} dakika arası)"
+        lines = [f"⏰ Hatırlatma saatiniz: {current}", f"Saat dilimi: {timezone}"]
+        if settings.next_reminder_at:
+            next_local = settings.next_reminder_at.replace(tzinfo=UTC).astimezone(ZoneInfo(timezone))
+            lines.append(f"Sonraki hatırlatma: {next_local.strftime('%d.%m.%Y %H:%M')}")
+        lines.append("\nDeğiştirmek için: /saat 08:30 veya /saat 08:30 Europe/Berlin\nOtomatiğe dönmek için: /saat varsayilan")
+        await update.message.reply_text("\n".join(lines))
+        return
+    
+    if args[0].lower() in ('varsayilan', 'varsayılan'):
+        reminder_time, timezone = None, None
+    else:
+        try:
+            reminder_time = parse_reminder_time(args[0])
+        except ValueError:
+            await update.message.reply_text("❌ Geçersiz saat. Lütfen SS:DD formatında girin (örn: /saat 08:30)")
+            return
+        timezone = settings.timezone
+        if len(args) > 1:
+            try:
+                ZoneInfo(args[1])
+            except (ZoneInfoNotFoundError, ValueError):
+                await update.message.reply_text("❌ Geçersiz saat dilimi (örn: Europe/Istanbul, Europe/Berlin)")
+                return
+            timezone = args[1]
+    
+    next_at = next_reminder_at(user_id, reminder_time, timezone)
+    await set_reminder_settings(user_id, reminder_time, timezone, next_at)
+    
+    zone = timezone or REMINDER_TIMEZONE
+    next_local = next_at.replace(tzinfo=UTC).astimezone(ZoneInfo(zone))
+    await update.message.reply_text(
+        f"✅ Hatırlatma saatiniz {reminder_time or 'otomatik'} ({zone}) olarak ayarlandı.\n"
+        f"Sonraki hatırlatma: {next_local.strftime('%d.%m.%Y %H:%M')}"
+    )
+
+async def import_document_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Konuşma durumundan bağımsız: gönderilen her CSV/XLSX belgesi toplu ürün ekleme olarak işlenir
+    document = update.message.document
+    if document.file_size and document.file_size > IMPORT_MAX_FILE_SIZE:
+        await update.message.reply_text(f"❌ Dosya çok büyük (en fazla {IMPORT_MAX_FILE_SIZE // (1024 * 1024)} MB).")
+        return
+    
+    user_id = await get_user_id(update.effective_user.id, update.effective_user.username)
+    file = await document.get_file()
+    data = bytes(await file.download_as_bytearray())
+    
+    try:
+        # Okuma, doğrulama ve toplu ekleme veritabanı iş parçacığında çalışır
+        imported, rejected = await run_db(import_products, user_id, data, document.file_name)
+    except ImportFileError as e:
+        await update.message.reply_text(f"❌ {str(e)}")
+        return
+    except Exception as e:
+        logger.error(f"İçe aktarma hatası ({document.file_name}): {str(e)}")
+        await update.message.reply_text(
+            "❌ Dosya içe aktarılamadı, hiçbir ürün eklenmedi.\n"
+            "Lütfen dosyayı kontrol edip tekrar gönderin."
+        )
+        return
+    
+    lines = [f"✅ {imported} ürün eklendi."]
+    if rejected:
+        lines.append(f"❌ {len(rejected)} satır eklenemedi:")
+        for line, reason in rejected[:20]:
+            lines.append(f"Satır {line}: {reason}")
+        if len(rejected) > 20:
+            lines.append(f"... ve {len(rejected) - 20} satır daha")
+    
+    await update.message.reply_text("\n".join(lines)[:4096])
+
+async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await update.message.reply_text("İşlem iptal edildi.")
+    return MENU
+
+async def recognize_photo(image_bytes, request_id=None):
+    # Önce önbelleğe bak (hash hesaplaması da event loop dışında yapılır), yoksa OCR havuzuna gönder.
+    # (image_hash, sonuçlar) döndürür; havuz doluysa OCRQueueFull fırlatır.
+    image_hash = await asyncio.to_thread(compute_dhash, image_bytes)
+    results = ocr_cache.get(image_hash)
+    
+    if results is not None:
+        metrics.OCR_REQUESTS.inc('cache')
+        logger.info(f"OCR önbellekten yanıtlandı ({ocr_cache.stats()})")
+        return image_hash, results
+    
+    ocr = _ocr or await asyncio.to_thread(load_ocr)
+    try:
+        results, timings = await ocr_executor.submit(ocr.process_image_ocr_timed, image_bytes, request_id)
+    except OCRQueueFull:
+        metrics.OCR_REQUESTS.inc('queue_full')
+        raise
+    metrics.record_ocr_timings(timings)
+    metrics.OCR_REQUESTS.inc('found' if results else 'not_found')
+    if results:
+        ocr_cache.put(image_hash, results)
+        if OCR_CACHE_PERSIST:
+            await asyncio.to_thread(ocr_cache.persist, image_hash, results)
+    return image_hash, results
+
+async def photo_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if update.message.media_group_id:
+        return await album_photo_handler(update, context)
+    
+    try:
+        # Fotoğrafı belleğe indir
+        photo = await update.message.photo[-1].get_file()
+        image_bytes = await photo.download_as_bytearray()
+        request_id = f"{update.effective_user.id}_{update.message.message_id}"
+        
+        try:
+            image_hash, results = await recognize_photo(image_bytes, request_id)
+        except OCRQueueFull:
+            logger.warning(f"OCR kuyruğu dolu, istek reddedildi (bekleyen: {ocr_executor.pending})")
+            await update.message.reply_text(
+                "⏳ Şu anda çok fazla fotoğraf işleniyor.\n"
+                "Lütfen birkaç saniye sonra tekrar gönderin."
+            )
+            return WAITING_PHOTO
+        context.user_data['ocr_hash'] = image_hash
+        
+        if results:
+            best_result = results[0]
+            logger.info(f"SKT '{best_result['stage']}' aşamasında bulundu")
+            
+            # Üretim tarihi varsa ekstra bilgi ekle
+            date_str = best_result['date_str']
+            if best_result['production_date']:
+                date_str = f"{date_str} (Üretim: {best_result['production_date']})"
+            
+            keyboard = [
+                ["✅ Doğru", "❌ Yanlış"]
+            ]
+            reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+            
+            await update.message.reply_text(
+                f"Tespit edilen tarih: {date_str}\n\n"
+                "Bu tarih doğru mu?",
+                reply_markup=reply_markup
+            )
+            context.user_data['detected_date'] = best_result['date_str']
+            return VERIFY_DATE
+        else:
+            keyboard = [
+                ["📝 Manuel Giriş", "📸 Tekrar Dene"]
+            ]
+            reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+            
+            await update.message.reply_text(
+                "❌ Son kullanma tarihi tespit edilemedi.\n"
+                "Lütfen seçim yapın:",
+                reply_markup=reply_markup
+            )
+            return PRODUCT_NAME
+            
+    except Exception as e:
+        logger.error(f"Fotoğraf işleme hatası: {str(e)}")
+        
+        keyboard = [
+            ["📝 Manuel Giriş", "📸 Tekrar Dene"]
+        ]
+        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+        
+        await update.message.reply_text(
+            "❌ Fotoğraf işlenirken bir hata oluştu.\n"
+            "Lütfen seçim yapın:",
+            reply_markup=reply_markup
+        )
+        return PRODUCT_NAME
+
+async def album_photo_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Albümdeki fotoğraflar ayrı güncellemeler olarak gelir: hepsi toplanır, son fotoğraftan
+    # ALBUM_DEBOUNCE saniye sonra tek bir iş hepsini birlikte işler
+    media_group_id = update.message.media_group_id
+    album = context.user_data.get('album')
+    if album is None or album['media_group_id'] != media_group_id:
+        album = context.user_data['album'] = {'media_group_id': media_group_id, 'photos': [], 'items': None}
+    album['photos'].append((update.message.message_id, update.message.photo[-1].file_id))
+    
+    chat_id = update.effective_chat.id
+    name = f"album:{chat_id}:{media_group_id}"
+    for job in context.job_queue.get_jobs_by_name(name):
+        job.schedule_removal()
+    context.job_queue.run_once(process_album, ALBUM_DEBOUNCE, data=media_group_id, name=name,
+                               chat_id=chat_id, user_id=update.effective_user.id)
+    
+    if len(album['photos']) == 1:
+        await update.message.reply_text("📸 Fotoğraflar alındı, tarihler okunuyor...")
+    return BATCH_REVIEW
+
+async def read_album_photo(context, chat_id, message_id, file_id):
+    file = await context.bot.get_file(file_id)
+    image_bytes = await file.download_as_bytearray()
+    async with album_ocr_slots:
+        try:
+            _, results = await recognize_photo(image_bytes, f"{chat_id}_{message_id}")
+        except OCRQueueFull:
+            return OCR_BUSY
+    return results[0]['date_str'] if results else None
+
+async def process_album(context: ContextTypes.DEFAULT_TYPE):
+    album = context.user_data.get('album')
+    if album is None or album['media_group_id'] != context.job.data:
+        return
+    
+    # Fotoğraflar aynı anda indirilir, OCR havuzuna işçi sayısı kadarı birlikte verilir
+    photos = sorted(album['photos'])
+    dates = await asyncio.gather(
+        *(read_album_photo(context, context.job.chat_id, message_id, file_id) for message_id, file_id in photos),
+        return_exceptions=True
+    )
+    album['items'] = [date_str if isinstance(date_str, str) else None for date_str in dates]
+    
+    # Hatalar "tarih bulunamadı" sonucundan ayrı gösterilir ve kaydedilir
+    busy = failed = 0
+    lines = [f"📸 {len(photos)} fotoğraf işlendi:\n"]
+    for number, ((message_id, _), date_str) in enumerate(zip(photos, dates), start=1):
+        if date_str is OCR_BUSY:
+            busy += 1
+            lines.append(f"{number}. ⏳ yoğunluk nedeniyle okunamadı (tarihi yazın veya tekrar gönderin)")
+        elif isinstance(date_str, Exception):
+            failed += 1
+            logger.error(f"Albüm fotoğrafı okunamadı ({context.job.chat_id}_{message_id}): {date_str!r}",
+                         exc_info=date_str)
+            lines.append(f"{number}. ⚠️ fotoğraf işlenemedi (tarihi yazın veya tekrar gönderin)")
+        else:
+            lines.append(f"{number}. {date_str or '❓ tarih bulunamadı'}")
+    logger.info(f"Albüm işlendi ({context.job.chat_id}): {len(photos)} fotoğraf, "
+                f"{sum(1 for d in album['items'] if d)} tarih bulundu, {busy} fotoğraf yoğunluktan okunamadı, "
+                f"{failed} fotoğraf hatalı")
+    lines.append(
+        "\nEklemek istediğiniz her ürün için bir satır yazın:\n"
+        "<no> <ürün adı> [GG.AA.YYYY]\n\n"
+        "Tarih yazmazsanız bulunan tarih kullanılır. Yazmadığınız numaralar eklenmez.\n"
+        "Örnek:\n"
+        "1 Süt\n"
+        "2 Peynir 05.04.2025"
+    )
+    keyboard = [
+        ["🔙 Ana Menü"]
+    ]
+    await context.bot.send_message(
+        chat_id=context.job.chat_id,
+        text="\n".join(lines),
+        reply_markup=ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    )
+
+def parse_batch_review(text, items):
+    # "<no> <ürün adı> [GG.AA.YYYY]" satırlarını ayrıştırır: (ürünler, hatalar)
+    products, errors, seen = [], [], set()
+    for line in text.splitlines():
+        parts = line.split()
+        if not parts:
+            continue
+        if not parts[0].rstrip('.').isdigit() or len(parts) < 2:
+            errors.append(f"'{line}': <no> <ürün adı> [GG.AA.YYYY] biçiminde olmalı")
+            continue
+        number = int(parts[0].rstrip('.'))
+        if not 1 <= number <= len(items):
+            errors.append(f"'{line}': {number} numaralı fotoğraf yok")
+            continue
+        if number in seen:
+            errors.append(f"'{line}': {number} numarası birden fazla kez yazılmış")
+            continue
+        
+        date_str = items[number - 1]
+        name_parts = parts[1:]
+        try:
+            expiry_date = datetime.strptime(name_parts[-1], "%d.%m.%Y").date()
+            name_parts = name_parts[:-1]
+        except ValueError:
+            if date_str is None:
+                errors.append(f"'{line}': {number} numaralı fotoğrafta tarih bulunamadı, lütfen tarihi yazın")
+                continue
+            expiry_date = datetime.strptime(date_str, "%d.%m.%Y").date()
+        if not name_parts:
+            errors.append(f"'{line}': ürün adı eksik")
+            continue
+        
+        seen.add(number)
+        products.append({'name': ' '.join(name_parts), 'expiry_date': expiry_date, 'category': None, 'description': None})
+    return products, errors
+
+async def batch_review_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    text = update.message.text
+    album = context.user_data.get('album')
+    
+    if text == "🔙 Ana Menü" or album is None:
+        context.user_data.pop('album', None)
+        return await return_to_main_menu(update, context)
+    if album['items'] is None:
+        await update.message.reply_text("⏳ Fotoğraflar hâlâ işleniyor, lütfen biraz bekleyin.")
+        return BATCH_REVIEW
+    
+    products, errors = parse_batch_review(text, album['items'])
+    if errors:
+        await update.message.reply_text("❌ Hiçbir ürün eklenmedi, lütfen düzeltip tekrar gönderin:\n\n" + "\n".join(errors[:20]))
+        return BATCH_REVIEW
+    if not products:
+        await update.message.reply_text("Lütfen en az bir ürün yazın.")
+        return BATCH_REVIEW
+    
+    # Tüm ürünler tek işlemde eklenir
+    user_id = await get_user_id(update.effective_user.id, update.effective_user.username)
+    imported = await bulk_add_products(user_id, products)
+    context.user_data.pop('album', None)
+    return await return_to_main_menu(update, context, f"✅ {imported} ürün başarıyla eklendi!")
+
+async def verify_date_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    text = update.message.text
+    
+    if text == "✅ Doğru":
+        keyboard = [
+            ["🔙 Ana Menü"]
+        ]
+        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+        
+        await update.message.reply_text(
+            "Lütfen ürün adını girin:",
+            reply_markup=reply_markup
+        )
+        context.user_data['input_method'] = 'ocr'
+        return PRODUCT_NAME
+    elif text == "❌ Yanlış":
+        # Yanlış bulunan sonuç tekrar denemede önbellekten dönmesin
+        image_hash = context.user_data.pop('ocr_hash', None)
+        if image_hash is not None and ocr_cache.invalidate(image_hash) is not None and OCR_CACHE_PERSIST:
+            await asyncio.to_thread(ocr_cache.delete_persisted, image_hash)
+        
+        keyboard = [
+            ["📝 Manuel Giriş", "📸 Tekrar Dene", "🔙 Ana Menü"]
+        ]
+        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+        
+        await update.message.reply_text(
+            "Lütfen seçim yapın:",
+            reply_markup=reply_markup
+        )
+        return PRODUCT_NAME
+
+def format_duration(seconds):
+    if seconds is None:
+        return "-"
+    if seconds < 1:
+        return f"{seconds * 1000:.0f} ms"
+    return f"{seconds:.2f} sn"
+
+def format_stats(bot_data):
+    uptime = int(metrics.UPTIME.value())
+    lines = [f"📊 İstatistikler (çalışma süresi: {uptime // 3600} sa {uptime % 3600 // 60} dk)"]
+    
+    lines.append("\nHandler'lar (çağrı / p50 / p95 / hata):")
+    for (name,) in metrics.HANDLER_SECONDS.labels():
+        _, _, count = metrics.HANDLER_SECONDS.snapshot(name)
+        lines.append(
+            f"• {name}: {count} / {format_duration(metrics.HANDLER_SECONDS.quantile(0.5, name))} / "
+            f"{format_duration(metrics.HANDLER_SECONDS.quantile(0.95, name))} / {metrics.HANDLER_ERRORS.value(name)}"
+        )
+    
+    lines.append("\nOCR aşamaları (adet / ortalama / p95):")
+    for (stage,) in metrics.OCR_STAGE_SECONDS.labels():
+        _, total, count = metrics.OCR_STAGE_SECONDS.snapshot(stage)
+        lines.append(f"• {stage}: {count} / {format_duration(total / count)} / "
+                     f"{format_duration(metrics.OCR_STAGE_SECONDS.quantile(0.95, stage))}")
+    requests = ", ".join(f"{result}: {int(metrics.OCR_REQUESTS.value(result))}" for (result,) in metrics.OCR_REQUESTS.labels())
+    lines.append(f"İstekler: {requests or '-'} | bekleyen: {ocr_executor.pending}")
+    
+    lines.append("\nVeritabanı sorguları (adet / ortalama / p95):")
+    for (operation,) in metrics.DB_QUERY_SECONDS.labels():
+        _, total, count = metrics.DB_QUERY_SECONDS.snapshot(operation)
+        lines.append(f"• {operation}: {count} / {format_duration(total / count)} / "
+                     f"{format_duration(metrics.DB_QUERY_SECONDS.quantile(0.95, operation))}")
+    errors = sum(metrics.DB_ERRORS.value(*labels) for labels in metrics.DB_ERRORS.labels())
+    lines.append(f"Hatalar: {errors} | kullanımdaki bağlantı: {metrics.DB_POOL_CHECKED_OUT.value()}")
+    
+    lines.append(f"\nSon hatırlatma: {bot_data.get('last_reminder_run', '-')}")
+    lines.append(f"Son arşivleme: {bot_data.get('last_archive_run', '-')}")
+    return "\n".join(lines)[:4096]
+
+async def show_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Yalnızca yöneticiler; diğer kullanıcılara komut yokmuş gibi davranılır
+    if update.effective_user.id not in ADMIN_IDS:
+        return
+    await update.message.reply_text(format_stats(context.bot_data))
+
+async def load_ocr_cache(application):
+    if OCR_CACHE_PERSIST:
+        entries = await asyncio.to_thread(ocr_cache.load_persisted)
+        for image_hash, results, stored_at in entries:
+            ocr_cache.put(image_hash, results, stored_at)
+        logger.info(f"OCR önbelleğine {len(entries)} kayıt yüklendi")
+
+async def preload_ocr(context: ContextTypes.DEFAULT_TYPE):
+    started = datetime.now()
+    await asyncio.to_thread(load_ocr)
+    logger.info(f"OCR modülü arka planda yüklendi ({(datetime.now() - started).total_seconds():.2f} sn)")
+
+async def shutdown_ocr(application):
+    logger.info(f"OCR önbellek istatistikleri: {ocr_cache.stats()}")
+    ocr_executor.shutdown()
+    shutdown_database()
+
+async def post_init(application):
+    await load_ocr_cache(application)
+    application.bot_data['metrics_server'] = await metrics.start_metrics_server()
+
+async def post_shutdown(application):
+    server = application.bot_data.pop('metrics_server', None)
+    if server is not None:
+        server.close()
+        await server.wait_closed()
+    # Parçalar kira süresinin dolmasını beklemeden diğer süreçlere geçsin
+    leases = application.bot_data.get('shard_leases')
+    if leases is not None:
+        try:
+            await leases.release_all()
+        except Exception as e:
+            logger.warning(f"Parça kiraları bırakılamadı: {str(e)}")
+    await shutdown_ocr(application)
+
+def build_application():
+    application = (
+        Application.builder()
+        .token(TOKEN)
+        .concurrent_updates(CONCURRENT_UPDATES)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
+    
+    conv_handler = ConversationHandler(
+        entry_points=[CommandHandler('start', start)],
+        states={
+            MENU: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, menu_handler)
+            ],
+            PRODUCT_NAME: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, get_product_name)
+            ],
+            EXPIRY_DATE: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, get_expiry_date)
+            ],
+            DELETE_PRODUCT: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, delete_product_handler)
+            ],
+            WAITING_PHOTO: [
+                MessageHandler(filters.PHOTO, photo_handler)
+            ],
+            VERIFY_DATE: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, verify_date_handler)
+            ],
+            BATCH_REVIEW: [
+                MessageHandler(filters.PHOTO, photo_handler),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, batch_review_handler)
+            ]
+        },
+        fallbacks=[CommandHandler('iptal', cancel)]
+    )
+    
+    application.add_handler(conv_handler)
+    application.add_handler(CommandHandler('arsiv', show_archive))
+    application.add_handler(CommandHandler('stats', show_stats))
+    application.add_handler(CommandHandler('saat', reminder_time_command))
+    application.add_handler(MessageHandler(filters.Document.ALL, import_document_handler))
+    application.add_handler(CallbackQueryHandler(products_page_callback, pattern=r'^(list|del|rm):'))
+    
+    # Handler süreleri ve hataları (bkz. metrics.py)
+    metrics.instrument_handlers(application)
+    
+    # Günlük SKT hatırlatmaları
+    setup_scheduler(application)
+    
+    # İş kuyruğu uygulama başladıktan sonra çalışır; ilk güncellemeler OCR yüklenmesini beklemez
+    if OCR_PRELOAD:
+        application.job_queue.run_once(preload_ocr, 0, name='preload_ocr')
+    return application
+
+def main():
+    application = build_application()
+    
+    if BOT_MODE == 'webhook':
+        # tornado yalnızca webhook modunda gerekir
+        from webhook import run_webhook
+        run_webhook(application, allowed_updates=ALLOWED_UPDATES)
+    else:
+        application.run_polling(allowed_updates=ALLOWED_UPDATES)
+
+if __name__ == '__main__':
     main() 
\ No newline at end of file
@@ -1,98 +1,560 @@
-from sqlalchemy import create_engine, Column, Integer, String, Date, ForeignKey, DateTime
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
-from datetime import datetime
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///skt_bot.db")
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(bind=engine)
-Base = declarative_base()
-
-class User(Base):
-    __tablename__ = "users"
-    
-    id = Column(Integer, primary_key=True)
-    telegram_id = Column(Integer, unique=True)
-    username = Column(String)
-    created_at = Column(DateTime, default=datetime.now)
-    products = relationship("Product", back_populates="user")
-
-class Product(Base):
-    __tablename__ = "products"
-    
-    id = Column(Integer, primary_key=True)
-    name = Column(String, nullable=False)
-    expiry_date = Column(Date, nullable=False)
-    category = Column(String)
-    description = Column(String)
-    created_at = Column(DateTime, default=datetime.now)
-    user_id = Column(Integer, ForeignKey("users.id"))
-    user = relationship("User", back_populates="products")
-
-def init_db():
-    Base.metadata.create_all(engine)
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-# Kullanıcı işlemleri
-def create_user(db, telegram_id, username):
-    user = User(telegram_id=telegram_id, username=username)
-    db.add(user)
-    db.commit()
-    return user
-
-def get_user(db, telegram_id):
-    return db.query(User).filter(User.telegram_id == telegram_id).first()
-
-# Ürün işlemleri
-def add_product(db, user_id, name, expiry_date, category=None, description=None):
-    product = Product(
-        name=name,
-        expiry_date=expiry_date,
-        category=category,
-        description=description,
-        user_id=user_id
-    )
-    db.add(product)
-    db.commit()
-    return product
-
-def get_user_products(db, user_id):
-    return db.query(Product).filter(Product.user_id == user_id).order_by(Product.expiry_date).all()
-
-def get_expiring_products(db, days=7):
-    from datetime import date, timedelta
-    target_date = date.today() + timedelta(days=days)
-    return db.query(Product).filter(Product.expiry_date <= target_date).all()
-
-def delete_product(db, product_id, user_id):
-    product = db.query(Product).filter(
-        Product.id == product_id,
-        Product.user_id == user_id
-    ).first()
-    if product:
-        db.delete(product)
-        db.commit()
-        return True
-    return False
-
-def update_product(db, product_id, user_id, **kwargs):
-    product = db.query(Product).filter(
-        Product.id == product_id,
-        Product.user_id == user_id
-    ).first()
-    if product:
-        for key, value in kwargs.items():
-            setattr(product, key, value)
-        db.commit()
-        return product
-    return None 
\ No newline at end of file
+from sqlalchemy import create_engine, Column, Integer, String, Date, ForeignKey, DateTime, Text, Index, select, insert, update, case, func, literal, tuple_, exists, inspect, text, bindparam, true
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from datetime import datetime, date, timedelta
+import os
+from dotenv import load_dotenv
+from metrics import instrument_engine
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///skt_bot.db")
+
+# Bağlantı havuzu ayarları
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))
+
+engine = create_engine(
+    DATABASE_URL,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_pre_ping=True
+)
+# Sorgu sayıları ve süreleri (bkz. metrics.py)
+instrument_engine(engine)
+SessionLocal = sessionmaker(bind=engine)
+Base = declarative_base()
+
+class User(Base):
+    __tablename__ = "users"
+    
+    id = Column(Integer, primary_key=True)
+    telegram_id = Column(Integer, unique=True)
+    username = Column(String)
+    created_at = Column(DateTime, default=datetime.now)
+    # Kullanıcının seçtiği hatırlatma saati (HH:MM) ve saat dilimi; boşsa varsayılanlar kullanılır
+    reminder_time = Column(String(5))
+    timezone = Column(String(64))
+    # Bir sonraki hatırlatmanın zamanı (UTC). Zamanlayıcı her turda yalnızca zamanı gelenleri okur.
+    next_reminder_at = Column(DateTime, index=True)
+    products = relationship("Product", back_populates="user")
+
+class Product(Base):
+    __tablename__ = "products"
+    
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    expiry_date = Column(Date, nullable=False, index=True)
+    category = Column(String)
+    description = Column(String)
+    created_at = Column(DateTime, default=datetime.now)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    user = relationship("User", back_populates="products")
+    
+    __table_args__ = (
+        # Kullanıcının ürünlerini SKT sırasıyla / tarih aralığıyla okuyan sorgular için
+        Index("ix_products_user_id_expiry_date", "user_id", "expiry_date"),
+    )
+
+class ProductArchive(Base):
+    # SKT'si saklama süresinden daha önce geçmiş ürünler; products tablosu küçük kalsın diye buraya taşınır
+    __tablename__ = "products_archive"
+    
+    # Arşivin kendi anahtarı; SQLite silinen ürünlerin id'lerini tekrar kullanabildiği için
+    # ürünün id'si ayrı sütunda tutulur
+    id = Column(Integer, primary_key=True)
+    product_id = Column(Integer)
+    name = Column(String, nullable=False)
+    expiry_date = Column(Date, nullable=False)
+    category = Column(String)
+    description = Column(String)
+    created_at = Column(DateTime)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    archived_at = Column(DateTime, default=datetime.now)
+    
+    __table_args__ = (
+        Index("ix_products_archive_user_id_expiry_date", "user_id", "expiry_date"),
+    )
+
+# Hatırlatma aşamaları: her ürün için her aşamada en fazla bir bildirim gönderilir
+REMINDER_STAGE_WEEK = 1     # SKT'ye REMINDER_DAYS gün veya daha az kaldı
+REMINDER_STAGE_DAY = 2      # SKT bugün ya da yarın
+REMINDER_STAGE_EXPIRED = 3  # SKT geçti
+
+class ProductReminder(Base):
+    __tablename__ = "product_reminders"
+    
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    stage = Column(Integer, nullable=False)
+    notified_at = Column(DateTime, default=datetime.now)
+
+class FailedNotification(Base):
+    __tablename__ = "failed_notifications"
+    
+    id = Column(Integer, primary_key=True)
+    chat_id = Column(Integer, nullable=False, index=True)
+    text = Column(Text, nullable=False)
+    error = Column(String)
+    attempts = Column(Integer, default=1)
+    created_at = Column(DateTime, default=datetime.now)
+
+class ShardLease(Base):
+    # Hatırlatma taraması kullanıcı id'sine göre parçalara (users.id % parça sayısı) bölünür.
+    # Her parçayı aynı anda yalnızca kira sahibi süreç işler; kira süresi dolarsa başka süreç devralır.
+    __tablename__ = "shard_leases"
+    
+    shard = Column(Integer, primary_key=True)
+    owner = Column(String)
+    expires_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)
+
+class Replica(Base):
+    # Çalışan bot süreçleri; parçalar canlı süreçler arasında eşit paylaştırılır
+    __tablename__ = "replicas"
+    
+    replica_id = Column(String, primary_key=True)
+    heartbeat_at = Column(DateTime, index=True)
+
+class OCRCacheEntry(Base):
+    __tablename__ = "ocr_cache"
+    
+    image_hash = Column(String, primary_key=True)
+    results = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.now, index=True)
+
+def init_db():
+    Base.metadata.create_all(engine)
+    migrate_db()
+
+def migrate_db():
+    # create_all mevcut tablolara yeni sütun ve indeks eklemez; eksikleri burada oluştur.
+    # Sonradan eklenen sütunlar boş bırakılabilir olmalıdır. Tekrar tekrar çalıştırılabilir.
+    inspector = inspect(engine)
+    added = set()
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=engine.dialect)
+                with engine.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                added.add((table.name, column.name))
+    
+    if ("products_archive", "product_id") in added:
+        # Eski arşiv satırlarının id'si ürünün id'siydi; ürün id'sini yeni sütuna taşı.
+        # PostgreSQL'de id dizisi hiç ilerlemediği için en büyük id'nin ötesine al.
+        with engine.begin() as conn:
+            conn.execute(text("UPDATE products_archive SET product_id = id WHERE product_id IS NULL"))
+            if engine.dialect.name == "postgresql":
+                conn.execute(text(
+                    "SELECT setval(pg_get_serial_sequence('products_archive', 'id'), "
+                    "COALESCE(MAX(id), 0) + 1, false) FROM products_archive"
+                ))
+    
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Kullanıcı işlemleri
+def create_user(db, telegram_id, username):
+    user = User(telegram_id=telegram_id, username=username)
+    db.add(user)
+    db.commit()
+    return user
+
+def get_user(db, telegram_id):
+    return db.query(User).filter(User.telegram_id == telegram_id).first()
+
+UPSERT_INSERTS = {
+    "sqlite": sqlite_insert,
+    "postgresql": postgresql_insert,
+}
+
+def get_or_create_user(db, telegram_id, username):
+    # Tek bir INSERT ... ON CONFLICT sorgusuyla kullanıcıyı ekler ya da kullanıcı adını günceller,
+    # users.id değerini döndürür. Aynı anda gelen /start istekleri yarışmaz.
+    insert = UPSERT_INSERTS.get(db.get_bind().dialect.name)
+    if insert is None:
+        user = get_user(db, telegram_id) or create_user(db, telegram_id, username)
+        return user.id
+    
+    stmt = insert(User).values(telegram_id=telegram_id, username=username, created_at=datetime.now())
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[User.telegram_id],
+        set_={"username": stmt.excluded.username}
+    ).returning(User.id)
+    user_id = db.execute(stmt).scalar_one()
+    db.commit()
+    return user_id
+
+def get_reminder_settings(db, user_id):
+    return db.execute(
+        select(User.reminder_time, User.timezone, User.next_reminder_at).where(User.id == user_id)
+    ).one()
+
+def set_reminder_settings(db, user_id, reminder_time, timezone, next_reminder_at):
+    db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(reminder_time=reminder_time, timezone=timezone, next_reminder_at=next_reminder_at)
+    )
+    db.commit()
+
+def in_shards(shard_count, shards):
+    # shards None ise filtre yok; aksi halde yalnızca bu parçalardaki kullanıcılar
+    if shards is None:
+        return true()
+    return (User.id % shard_count).in_(list(shards))
+
+def get_unscheduled_users(db, limit=1000, shard_count=1, shards=None):
+    # Henüz hatırlatma zamanı hesaplanmamış kullanıcılar (yeni kayıtlar ve sütun eklendiğinde mevcut olanlar)
+    return db.execute(
+        select(User.id, User.reminder_time, User.timezone)
+        .where(User.next_reminder_at.is_(None), in_shards(shard_count, shards))
+        .limit(limit)
+    ).all()
+
+def get_due_users(db, now, limit=200, shard_count=1, shards=None):
+    # next_reminder_at indeksi üzerinden yalnızca zamanı gelmiş kullanıcılar, en eskiden başlayarak
+    return db.execute(
+        select(User.id, User.reminder_time, User.timezone, User.next_reminder_at)
+        .where(User.next_reminder_at <= now, in_shards(shard_count, shards))
+        .order_by(User.next_reminder_at)
+        .limit(limit)
+    ).all()
+
+def set_next_reminders(db, schedule):
+    # schedule: [(users.id, next_reminder_at), ...] — yalnızca zamanı hâlâ boş olanlar doldurulur
+    # (bu arada /saat ile ayarlanan ya da başka süreçte planlanan kullanıcılar ezilmez)
+    if not schedule:
+        return 0
+    users = User.__table__
+    db.execute(
+        update(users)
+        .where(users.c.id == bindparam("user_id"), users.c.next_reminder_at.is_(None))
+        .values(next_reminder_at=bindparam("next_at")),
+        [{"user_id": user_id, "next_at": next_at} for user_id, next_at in schedule]
+    )
+    db.commit()
+    return len(schedule)
+
+def claim_due_users(db, schedule):
+    # schedule: [(users.id, okunan next_reminder_at, yeni next_reminder_at), ...].
+    # İyimser güncelleme: next_reminder_at okunduğundan beri değişmediyse ilerletilir ve kullanıcı
+    # bu sürece ait olur. Aynı kullanıcıyı iki süreç okusa bile yalnızca biri hatırlatma gönderir.
+    users = User.__table__
+    claimed = []
+    for user_id, current, next_at in schedule:
+        result = db.execute(
+            update(users)
+            .where(users.c.id == user_id, users.c.next_reminder_at == current)
+            .values(next_reminder_at=next_at)
+        )
+        if result.rowcount == 1:
+            claimed.append(user_id)
+    db.commit()
+    return claimed
+
+# Parça kiraları
+def ensure_shard_leases(db, shard_count):
+    existing = set(db.execute(select(ShardLease.shard)).scalars())
+    missing = [{"shard": shard} for shard in range(shard_count) if shard not in existing]
+    if missing:
+        # Aynı anda başlayan süreçler aynı satırları eklemeye çalışabilir
+        insert = UPSERT_INSERTS.get(db.get_bind().dialect.name)
+        if insert is None:
+            db.execute(ShardLease.__table__.insert(), missing)
+        else:
+            db.execute(insert(ShardLease).values(missing).on_conflict_do_nothing(index_elements=[ShardLease.shard]))
+        db.commit()
+    return len(missing)
+
+def heartbeat_replica(db, replica_id, now, ttl_seconds):
+    # Sürecin canlılık kaydını günceller, canlı süreç sayısını döndürür (kendisi dahil)
+    if db.execute(update(Replica).where(Replica.replica_id == replica_id).values(heartbeat_at=now)).rowcount == 0:
+        db.add(Replica(replica_id=replica_id, heartbeat_at=now))
+    # Uzun süredir sessiz süreçlerin kayıtlarını temizle
+    db.execute(Replica.__table__.delete().where(Replica.heartbeat_at < now - timedelta(seconds=ttl_seconds * 10)))
+    db.commit()
+    return db.execute(
+        select(func.count()).select_from(Replica).where(Replica.heartbeat_at >= now - timedelta(seconds=ttl_seconds))
+    ).scalar_one()
+
+def renew_shard_leases(db, owner, now, expires_at, shard_count):
+    # Sahip olunan kiraların süresini uzatır, sahip olunan parçaları döndürür
+    db.execute(
+        update(ShardLease)
+        .where(ShardLease.owner == owner, ShardLease.shard < shard_count)
+        .values(expires_at=expires_at, heartbeat_at=now)
+    )
+    db.commit()
+    return list(db.execute(
+        select(ShardLease.shard).where(ShardLease.owner == owner, ShardLease.shard < shard_count).order_by(ShardLease.shard)
+    ).scalars())
+
+def get_free_shards(db, now, shard_count):
+    return list(db.execute(
+        select(ShardLease.shard)
+        .where(ShardLease.shard < shard_count, (ShardLease.owner.is_(None)) | (ShardLease.expires_at < now))
+        .order_by(ShardLease.shard)
+    ).scalars())
+
+def claim_shard_lease(db, shard, owner, now, expires_at):
+    # Boş ya da süresi dolmuş kirayı tek bir koşullu UPDATE ile alır; yarışan süreçlerden yalnızca biri kazanır
+    result = db.execute(
+        update(ShardLease)
+        .where(ShardLease.shard == shard, (ShardLease.owner.is_(None)) | (ShardLease.expires_at < now))
+        .values(owner=owner, expires_at=expires_at, heartbeat_at=now)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+def release_shard_leases(db, owner, shards=None):
+    # shards None ise sürecin tüm kiraları bırakılır (kapanışta diğer süreçler hemen devralabilsin)
+    stmt = update(ShardLease).where(ShardLease.owner == owner)
+    if shards is not None:
+        stmt = stmt.where(ShardLease.shard.in_(list(shards)))
+    result = db.execute(stmt.values(owner=None, expires_at=None))
+    db.commit()
+    return result.rowcount
+
+# Ürün işlemleri
+def add_product(db, user_id, name, expiry_date, category=None, description=None):
+    product = Product(
+        name=name,
+        expiry_date=expiry_date,
+        category=category,
+        description=description,
+        user_id=user_id
+    )
+    db.add(product)
+    db.commit()
+    return product
+
+def bulk_add_products(db, user_id, products, commit=True):
+    # products: [{"name", "expiry_date", "category", "description"}, ...] — tek INSERT.
+    # commit=False ise işlemi çağıran tamamlar (ör. birden fazla parçayı tek işlemde eklemek için)
+    if not products:
+        return 0
+    now = datetime.now()
+    db.execute(insert(Product), [dict(product, user_id=user_id, created_at=now) for product in products])
+    if commit:
+        db.commit()
+    return len(products)
+
+def get_user_products(db, user_id):
+    return db.query(Product).filter(Product.user_id == user_id).order_by(Product.expiry_date).all()
+
+def get_user_products_page(db, user_id, cursor=None, direction="next", limit=10):
+    # (expiry_date, id) üzerinde keyset sayfalama: OFFSET kullanılmaz, her sayfa
+    # (user_id, expiry_date) indeksinde cursor'dan başlayan kısa bir aralık taramasıdır.
+    # cursor: (expiry_date, id); direction: "next" (cursor'dan sonrası), "prev" (öncesi),
+    # "at" (cursor dahil sonrası, aynı sayfayı yeniden göstermek için).
+    # (ürünler, önceki sayfa var mı, sonraki sayfa var mı) döndürür.
+    key = tuple_(Product.expiry_date, Product.id)
+    query = db.query(Product).filter(Product.user_id == user_id)
+    if cursor is not None:
+        if direction == "prev":
+            query = query.filter(key < tuple_(*cursor))
+        elif direction == "at":
+            query = query.filter(key >= tuple_(*cursor))
+        else:
+            query = query.filter(key > tuple_(*cursor))
+    
+    if direction == "prev":
+        products = query.order_by(Product.expiry_date.desc(), Product.id.desc()).limit(limit + 1).all()
+        has_more = len(products) > limit
+        products = products[:limit][::-1]
+    else:
+        products = query.order_by(Product.expiry_date, Product.id).limit(limit + 1).all()
+        has_more = len(products) > limit
+        products = products[:limit]
+    
+    if not products:
+        return [], False, False
+    
+    # Diğer yönde ürün olup olmadığını tek bir EXISTS sorgusuyla kontrol et
+    if direction == "prev":
+        last = products[-1]
+        other = db.query(exists().where(
+            Product.user_id == user_id,
+            key > tuple_(last.expiry_date, last.id)
+        )).scalar()
+        return products, has_more, other
+    
+    first = products[0]
+    other = db.query(exists().where(
+        Product.user_id == user_id,
+        key < tuple_(first.expiry_date, first.id)
+    )).scalar()
+    return products, other, has_more
+
+def count_user_products(db, user_id):
+    return db.query(Product).filter(Product.user_id == user_id).count()
+
+def get_user_expiring_products(db, user_id, days=7, today=None):
+    # (user_id, expiry_date) indeksi üzerinde aralık taraması
+    target_date = (today or date.today()) + timedelta(days=days)
+    return db.query(Product).filter(
+        Product.user_id == user_id,
+        Product.expiry_date <= target_date
+    ).order_by(Product.expiry_date).all()
+
+def get_expiring_products(db, days=7, today=None):
+    target_date = (today or date.today()) + timedelta(days=days)
+    return db.query(Product).filter(Product.expiry_date <= target_date).all()
+
+def reminder_stage_expr(today):
+    return case(
+        (Product.expiry_date < today, REMINDER_STAGE_EXPIRED),
+        (Product.expiry_date <= today + timedelta(days=1), REMINDER_STAGE_DAY),
+        else_=REMINDER_STAGE_WEEK
+    )
+
+def iter_due_reminders(db, days=7, today=None, lookback_days=3, batch_size=500, user_ids=None):
+    # Yalnızca son bildiriminden bu yana yeni bir aşamaya geçmiş ürünleri akış halinde döndürür.
+    # Tarama expiry_date indeksinde [bugün - lookback_days, bugün + days] aralığıyla sınırlıdır,
+    # yani eski geçmiş ürünler hiç okunmaz; aralıktaki zaten bildirilmiş ürünleri de defter eler.
+    # Kullanıcının telegram_id'si aynı sorguda gelir (N+1 yok), satırlar kullanıcıya göre
+    # gruplu sıradadır ve yield_per sayesinde bellekte en fazla batch_size satır tutulur.
+    # user_ids verilirse yalnızca bu kullanıcıların ürünleri okunur (user_id, expiry_date indeksi).
+    today = today or date.today()
+    stage = reminder_stage_expr(today)
+    stmt = (
+        select(User.telegram_id, Product.id, Product.name, Product.expiry_date, Product.category, stage.label("stage"))
+        .join(Product.user)
+        .outerjoin(ProductReminder, ProductReminder.product_id == Product.id)
+        .where(
+            Product.expiry_date >= today - timedelta(days=lookback_days),
+            Product.expiry_date <= today + timedelta(days=days),
+            func.coalesce(ProductReminder.stage, 0) < stage
+        )
+        .order_by(Product.user_id, Product.expiry_date)
+        .execution_options(yield_per=batch_size)
+    )
+    if user_ids is not None:
+        stmt = stmt.where(Product.user_id.in_(user_ids))
+    return db.execute(stmt)
+
+def mark_products_notified(db, product_stages):
+    # product_stages: [(product_id, stage), ...] — defteri tek sorguda günceller
+    if not product_stages:
+        return 0
+    now = datetime.now()
+    values = [{"product_id": product_id, "stage": stage, "notified_at": now} for product_id, stage in product_stages]
+    insert = UPSERT_INSERTS.get(db.get_bind().dialect.name)
+    if insert is None:
+        for value in values:
+            db.merge(ProductReminder(**value))
+    else:
+        stmt = insert(ProductReminder).values(values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ProductReminder.product_id],
+            set_={"stage": stmt.excluded.stage, "notified_at": stmt.excluded.notified_at}
+        )
+        db.execute(stmt)
+    db.commit()
+    return len(values)
+
+def delete_product(db, product_id, user_id):
+    product = db.query(Product).filter(
+        Product.id == product_id,
+        Product.user_id == user_id
+    ).first()
+    if product:
+        db.query(ProductReminder).filter(ProductReminder.product_id == product.id).delete()
+        db.delete(product)
+        db.commit()
+        return True
+    return False
+
+def update_product(db, product_id, user_id, **kwargs):
+    product = db.query(Product).filter(
+        Product.id == product_id,
+        Product.user_id == user_id
+    ).first()
+    if product:
+        # SKT değişirse hatırlatmalar yeni tarihe göre baştan başlasın
+        if "expiry_date" in kwargs and kwargs["expiry_date"] != product.expiry_date:
+            db.query(ProductReminder).filter(ProductReminder.product_id == product.id).delete()
+        for key, value in kwargs.items():
+            setattr(product, key, value)
+        db.commit()
+        return product
+    return None
+
+# Arşiv işlemleri
+# products sütunu -> products_archive sütunu
+ARCHIVE_COLUMNS = {"id": "product_id", "name": "name", "expiry_date": "expiry_date", "category": "category",
+                   "description": "description", "created_at": "created_at", "user_id": "user_id"}
+
+def archive_expired_products(db, before, batch_size=500, purge=False):
+    # SKT'si `before` tarihinden önce olan en fazla batch_size ürünü tek ve kısa bir işlemde
+    # arşive taşır (purge=True ise doğrudan siler). Taşınan satır sayısını döndürür;
+    # batch_size'dan az dönerse taşınacak ürün kalmamıştır.
+    ids = db.execute(
+        select(Product.id)
+        .where(Product.expiry_date < before)
+        .order_by(Product.expiry_date)
+        .limit(batch_size)
+    ).scalars().all()
+    if not ids:
+        return 0
+    
+    if not purge:
+        columns = [getattr(Product, name) for name in ARCHIVE_COLUMNS]
+        db.execute(
+            ProductArchive.__table__.insert().from_select(
+                list(ARCHIVE_COLUMNS.values()) + ["archived_at"],
+                select(*columns, literal(datetime.now(), DateTime)).where(Product.id.in_(ids))
+            )
+        )
+    db.query(ProductReminder).filter(ProductReminder.product_id.in_(ids)).delete(synchronize_session=False)
+    db.query(Product).filter(Product.id.in_(ids)).delete(synchronize_session=False)
+    db.commit()
+    return len(ids)
+
+def get_user_archive(db, user_id, limit=20):
+    return db.query(ProductArchive).filter(
+        ProductArchive.user_id == user_id
+    ).order_by(ProductArchive.expiry_date.desc()).limit(limit).all()
+
+def count_user_archive(db, user_id):
+    return db.query(ProductArchive).filter(ProductArchive.user_id == user_id).count()
+
+# Gönderilemeyen bildirimler
+def add_failed_notification(db, chat_id, text, error, attempts=1):
+    failed = FailedNotification(chat_id=chat_id, text=text, error=error, attempts=attempts)
+    db.add(failed)
+    db.commit()
+    return failed
+
+# OCR önbelleği işlemleri
+def get_ocr_cache_entries(db, since, limit):
+    return db.query(OCRCacheEntry).filter(
+        OCRCacheEntry.created_at >= since
+    ).order_by(OCRCacheEntry.created_at.desc()).limit(limit).all()
+
+def save_ocr_cache_entry(db, image_hash, results):
+    db.merge(OCRCacheEntry(image_hash=image_hash, results=results, created_at=datetime.now()))
+    db.commit()
+
+def delete_ocr_cache_entry(db, image_hash):
+    db.query(OCRCacheEntry).filter(OCRCacheEntry.image_hash == image_hash).delete()
+    db.commit()
+
+def delete_expired_ocr_cache_entries(db, before):
+    count = db.query(OCRCacheEntry).filter(OCRCacheEntry.created_at < before).delete()
+    db.commit()
+    return count
@@ -0,0 +1,159 @@
+import re
+import sys
+import json
+from datetime import date
+
+# Ay isimleri ve kısaltmaları (sıra önemli: uzun isimler kısaltmalardan önce denenmeli)
+MONTHS = [
+    ('OCAK', 'OCA', 1),
+    ('ŞUBAT', 'ŞUB', 2),
+    ('MART', 'MAR', 3),
+    ('NİSAN', 'NİS', 4),
+    ('MAYIS', 'MAY', 5),
+    ('HAZİRAN', 'HAZ', 6),
+    ('TEMMUZ', 'TEM', 7),
+    ('AĞUSTOS', 'AĞU', 8),
+    ('EYLÜL', 'EYL', 9),
+    ('EKİM', 'EKİ', 10),
+    ('KASIM', 'KAS', 11),
+    ('ARALIK', 'ARA', 12),
+]
+
+# OCR Türkçe karakterleri sık sık ASCII karşılıklarıyla okur, ikisini de kabul et
+_TURKISH_FOLD = str.maketrans('İIıiŞşĞğÜüÖöÇç', 'IIIISSGGUUOOCC')
+_TURKISH_CLASSES = {
+    'İ': '[İIiı]', 'I': '[İIiı]', 'Ş': '[ŞS]', 'Ğ': '[ĞG]',
+    'Ü': '[ÜU]', 'Ö': '[ÖO]', 'Ç': '[ÇC]',
+}
+
+def _fold(text):
+    return text.translate(_TURKISH_FOLD).upper()
+
+def _tolerant(word):
+    return ''.join(_TURKISH_CLASSES.get(ch, ch) for ch in word)
+
+_MONTH_LOOKUP = {}
+for _name, _abbr, _number in MONTHS:
+    _MONTH_LOOKUP[_fold(_name)] = _number
+    _MONTH_LOOKUP[_fold(_abbr)] = _number
+
+_MONTH_ALTERNATION = '|'.join(
+    [_tolerant(name) for name, _, _ in MONTHS] + [_tolerant(abbr) for _, abbr, _ in MONTHS]
+)
+
+# Satır sonunu geçmeyen boşluk (eşleşmeler satır bazlı kalsın)
+_SP = r'[^\S\n]*'
+_SEP = _SP + r'[./]' + _SP
+_YEAR = r'(?:\d{4}|\d{2})(?!\d)'
+
+def _dmy(prefix):
+    return rf'(?P<{prefix}_d>\d{{2}}){_SEP}(?P<{prefix}_m>\d{{2}}){_SEP}(?P<{prefix}_y>{_YEAR})'
+
+# Tüm formatlar tek bir alternasyonda birleştirilir, metin tek geçişte taranır.
+# Aynı konumda eşleşen alternatiflerden ilki kazandığı için en güvenilir format başta.
+DATE_PATTERN = re.compile(
+    # Üretim ve SKT birlikte: "Üretim: 01.01.2024 ... SKT: 01.01.2026"
+    rf'(?P<production>{_tolerant("ÜRETİM")}:{_SP}{_dmy("p")}.*S\.?K\.?T\.?:?{_SP}{_dmy("pe")})'
+    # SKT ibareli: "SKT: 01.01.2026", "S.K.T 01/01/26", "Son Kullanma Tarihi: ..."
+    rf'|(?P<anchored>(?:SKT|S\.K\.T\.?|Son{_SP}Kul\w*{_SP}Tar\w*)[:\t ]*{_dmy("a")})'
+    # Ay isimli: "12 OCAK 2026", "12 OCA 26"
+    rf'|(?P<month_name>(?P<n_d>\d{{1,2}}){_SP}(?P<n_m>{_MONTH_ALTERNATION})\.?{_SP}(?P<n_y>{_YEAR}))'
+    # Genel: "01.01.2026", "01/01/26", "01 / 01 / 2026"
+    rf'|(?P<generic>{_dmy("g")})',
+    re.IGNORECASE
+)
+
+# Format türüne göre güven skorları
+CONFIDENCE = {
+    'production': 1.5,  # İki tarih birden bulunduğu için daha güvenilir
+    'anchored': 1.3,    # SKT ibaresi tarihin SKT olduğunu doğrular
+    'month_name': 1.2,  # Ay isimleri daha güvenilir
+    'generic': 1.0,
+}
+
+class DateExtractor:
+    # OCR metninden son kullanma tarihi adaylarını tek geçişte çıkarır.
+    # Adaylar güven skoruna göre sıralı sözlükler olarak döner.
+    def __init__(self, min_year=2000, max_year=2100, pattern=DATE_PATTERN):
+        self.min_year = min_year
+        self.max_year = max_year
+        self.pattern = pattern
+
+    def _to_date(self, day, month, year):
+        if len(year) == 2:
+            year = '20' + year
+        year = int(year)
+        if year < self.min_year or year > self.max_year:
+            return None
+        try:
+            return date(year, int(month), int(day))
+        except ValueError:
+            return None
+
+    def _parse(self, match):
+        kind = match.lastgroup
+        group = match.group
+        production_date = None
+
+        if kind == 'production':
+            expiry = self._to_date(group('pe_d'), group('pe_m'), group('pe_y'))
+            production_date = self._to_date(group('p_d'), group('p_m'), group('p_y'))
+        elif kind == 'anchored':
+            expiry = self._to_date(group('a_d'), group('a_m'), group('a_y'))
+        elif kind == 'month_name':
+            month = _MONTH_LOOKUP.get(_fold(group('n_m')))
+            expiry = self._to_date(group('n_d'), month, group('n_y')) if month else None
+        else:
+            expiry = self._to_date(group('g_d'), group('g_m'), group('g_y'))
+
+        return kind, expiry, production_date
+
+    def extract(self, text):
+        candidates = {}
+
+        for match in self.pattern.finditer(text):
+            kind, expiry, production_date = self._parse(match)
+            if expiry is None:
+                continue
+
+            date_str = f"{expiry.day:02d}.{expiry.month:02d}.{expiry.year}"
+            production_str = None
+            if production_date:
+                production_str = f"{production_date.day:02d}.{production_date.month:02d}.{production_date.year}"
+            confidence = CONFIDENCE[kind]
+
+            # Aynı tarih birden fazla kez bulunursa en yüksek skorlu olanı tut
+            key = (date_str, production_str)
+            if key in candidates and candidates[key]['confidence'] >= confidence:
+                continue
+
+            line_start = text.rfind('\n', 0, match.start()) + 1
+            line_end = text.find('\n', match.end())
+            candidates[key] = {
+                'date_str': date_str,
+                'confidence': confidence,
+                'line': text[line_start:line_end if line_end != -1 else len(text)].strip(),
+                'production_date': production_str,
+                'kind': kind,
+            }
+
+        # Güven skoruna göre sırala (eşitlikte metinde önce geçen önde kalır)
+        return sorted(candidates.values(), key=lambda x: x['confidence'], reverse=True)
+
+    def best(self, text):
+        candidates = self.extract(text)
+        return candidates[0] if candidates else None
+
+# Paylaşılan varsayılan örnek
+date_extractor = DateExtractor()
+
+if __name__ == '__main__':
+    # Toplu kullanım: dosyalardaki (ya da stdin'deki) OCR metinlerinden adayları JSON olarak yazdır
+    paths = sys.argv[1:] or ['-']
+    for path in paths:
+        if path == '-':
+            text = sys.stdin.read()
+        else:
+            with open(path, encoding='utf-8') as f:
+                text = f.read()
+        print(json.dumps({'source': path, 'candidates': date_extractor.extract(text)}, ensure_ascii=False))
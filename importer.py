@@ -0,0 +1,172 @@
+import os
+import io
+import csv
+import logging
+from datetime import datetime, date
+from dotenv import load_dotenv
+from database import bulk_add_products
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Tek dosyada kabul edilen en fazla satır ve dosya boyutu, tek INSERT'te eklenen satır sayısı
+IMPORT_MAX_ROWS = int(os.getenv('IMPORT_MAX_ROWS', 20000))
+IMPORT_MAX_FILE_SIZE = int(os.getenv('IMPORT_MAX_FILE_SIZE', 5 * 1024 * 1024))
+IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', 1000))
+
+# Sütun başlıkları (küçük harfe çevrilmiş hali) -> ürün alanı
+COLUMN_ALIASES = {
+    'name': ('name', 'ad', 'adı', 'adi', 'ürün', 'urun', 'ürün adı', 'urun adi', 'ürün_adı', 'urun_adi'),
+    'expiry_date': ('expiry', 'expiry_date', 'skt', 'son kullanma tarihi', 'son_kullanma_tarihi', 'tarih'),
+    'category': ('category', 'kategori'),
+    'description': ('description', 'açıklama', 'aciklama', 'not'),
+}
+# Başlık satırı yoksa sütunların varsayılan sırası
+DEFAULT_COLUMNS = ['name', 'expiry_date', 'category', 'description']
+
+DATE_FORMATS = ('%d.%m.%Y', '%d/%m/%Y', '%d-%m-%Y', '%Y-%m-%d', '%d.%m.%y')
+
+MAX_NAME_LENGTH = 200
+
+class ImportFileError(Exception):
+    pass
+
+def parse_date(value):
+    # Excel hücreleri datetime/date olarak, CSV hücreleri metin olarak gelir
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value).strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+def map_header(cells):
+    # Başlık satırı tanınırsa {alan: sütun no} döner, tanınmazsa None
+    columns = {}
+    for index, cell in enumerate(cells):
+        key = str(cell or '').strip().lower()
+        for field, aliases in COLUMN_ALIASES.items():
+            if key in aliases and field not in columns:
+                columns[field] = index
+    if 'name' in columns and 'expiry_date' in columns:
+        return columns
+    return None
+
+def iter_csv_rows(data):
+    # Excel'in Türkçe kaydettiği dosyalar çoğunlukla cp1254 ve ';' ayraçlıdır
+    try:
+        text = data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        text = data.decode('cp1254')
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    for row in csv.reader(io.StringIO(text), dialect):
+        yield row
+
+def iter_xlsx_rows(data):
+    # openpyxl isteğe bağlıdır; yalnızca Excel dosyası gelince yüklenir
+    try:
+        import openpyxl
+    except ImportError:
+        raise ImportFileError("Excel dosyaları için sunucuda openpyxl kurulu değil. Lütfen CSV gönderin.")
+    workbook = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield list(row)
+    finally:
+        workbook.close()
+
+def iter_rows(data, filename):
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension in ('.xlsx', '.xlsm'):
+        return iter_xlsx_rows(data)
+    if extension in ('.csv', '.txt', ''):
+        return iter_csv_rows(data)
+    raise ImportFileError("Desteklenmeyen dosya türü. Lütfen CSV veya XLSX dosyası gönderin.")
+
+def parse_row(cells, columns):
+    # (ürün sözlüğü, None) ya da (None, red nedeni) döndürür
+    def cell(field):
+        index = columns.get(field)
+        if index is None or index >= len(cells) or cells[index] is None:
+            return None
+        value = cells[index]
+        if isinstance(value, (date, datetime)):
+            return value
+        value = str(value).strip()
+        return value or None
+
+    name = cell('name')
+    if not name:
+        return None, "ürün adı boş"
+    if len(name) > MAX_NAME_LENGTH:
+        return None, f"ürün adı {MAX_NAME_LENGTH} karakterden uzun"
+
+    raw_date = cell('expiry_date')
+    if raw_date is None:
+        return None, "SKT boş"
+    expiry_date = parse_date(raw_date)
+    if expiry_date is None:
+        return None, f"geçersiz tarih '{raw_date}'"
+
+    return {
+        'name': name,
+        'expiry_date': expiry_date,
+        'category': cell('category'),
+        'description': cell('description'),
+    }, None
+
+def import_products(db, user_id, data, filename, batch_size=IMPORT_BATCH_SIZE, max_rows=IMPORT_MAX_ROWS):
+    # Satırlar akış halinde okunup doğrulanır, geçerli olanlar batch_size'lık toplu INSERT'lerle
+    # tek bir işlemde eklenir: bir hata olursa hiçbir satır eklenmez, dosya güvenle tekrar gönderilebilir.
+    # (eklenen, [(satır no, neden), ...]) döndürür.
+    try:
+        imported, rejected = _import_rows(db, user_id, data, filename, batch_size, max_rows)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    logger.info(f"İçe aktarma tamamlandı ({filename}): {imported} eklendi, {len(rejected)} reddedildi")
+    return imported, rejected
+
+def _import_rows(db, user_id, data, filename, batch_size, max_rows):
+    imported = 0
+    rejected = []
+    batch = []
+    columns = None
+
+    for line, cells in enumerate(iter_rows(data, filename), start=1):
+        if not any(str(c).strip() for c in cells if c is not None):
+            continue
+        if columns is None:
+            columns = map_header(cells)
+            if columns is not None:
+                continue
+            columns = {field: index for index, field in enumerate(DEFAULT_COLUMNS)}
+
+        if imported + len(batch) + len(rejected) >= max_rows:
+            rejected.append((line, f"satır sınırı ({max_rows}) aşıldı, kalan satırlar okunmadı"))
+            break
+
+        product, reason = parse_row(cells, columns)
+        if product is None:
+            rejected.append((line, reason))
+            continue
+
+        batch.append(product)
+        if len(batch) >= batch_size:
+            imported += bulk_add_products(db, user_id, batch, commit=False)
+            batch = []
+
+    if batch:
+        imported += bulk_add_products(db, user_id, batch, commit=False)
+    return imported, rejected
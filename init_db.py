@@ -1,6 +1,6 @@
-from database import init_db
-
-if __name__ == "__main__":
-    print("Veritabanı tabloları oluşturuluyor...")
-    init_db()
+from database import init_db
+
+if __name__ == "__main__":
+    print("Veritabanı tabloları ve indeksleri oluşturuluyor...")
+    init_db()
     print("Veritabanı başarıyla oluşturuldu!") 
\ No newline at end of file
@@ -0,0 +1,65 @@
+import os
+import math
+import socket
+import logging
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+from database import ensure_shard_leases, heartbeat_replica, renew_shard_leases, get_free_shards, claim_shard_lease, release_shard_leases
+from async_database import run_db
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Hatırlatma taramasının bölüneceği parça sayısı (users.id % REMINDER_SHARDS). Birden fazla bot
+# süreci aynı veritabanını kullandığında parçalar kiralarla süreçler arasında paylaştırılır.
+# Tüm süreçlerde aynı olmalıdır.
+REMINDER_SHARDS = int(os.getenv('REMINDER_SHARDS', 1))
+# Kira süresi (sn): süreç bu kadar süre kirasını yenilemezse parçaları başka süreçlere geçer.
+# Kiralar bu sürenin üçte birinde bir yenilenir.
+SHARD_LEASE_SECONDS = int(os.getenv('SHARD_LEASE_SECONDS', 180))
+# Sürecin kimliği; boş bırakılırsa makine adı ve süreç numarasından üretilir
+REPLICA_ID = os.getenv('REPLICA_ID') or f"{socket.gethostname()}-{os.getpid()}"
+
+class ShardLeases:
+    # Süreç canlılık kaydını ve parça kiralarını yönetir. Her yenilemede canlı süreç sayısına göre
+    # hedef parça sayısı hesaplanır: eksikse boş/süresi dolmuş parçalar alınır, fazlaysa
+    # fazlası bırakılır (yeni katılan süreç bir sonraki turda onları alır).
+    def __init__(self, shard_count=REMINDER_SHARDS, replica_id=REPLICA_ID, lease_seconds=SHARD_LEASE_SECONDS):
+        self.shard_count = shard_count
+        self.replica_id = replica_id
+        self.lease_seconds = lease_seconds
+        self.owned = []
+        self._initialized = False
+
+    async def refresh(self, now=None):
+        now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+        expires_at = now + timedelta(seconds=self.lease_seconds)
+        if not self._initialized:
+            await run_db(ensure_shard_leases, self.shard_count)
+            self._initialized = True
+
+        replicas = await run_db(heartbeat_replica, self.replica_id, now, self.lease_seconds)
+        owned = await run_db(renew_shard_leases, self.replica_id, now, expires_at, self.shard_count)
+        target = math.ceil(self.shard_count / max(1, replicas))
+
+        if len(owned) > target:
+            released = owned[target:]
+            await run_db(release_shard_leases, self.replica_id, released)
+            owned = owned[:target]
+            logger.info(f"Parça kiraları bırakıldı: {released} ({replicas} canlı süreç)")
+        elif len(owned) < target:
+            for shard in await run_db(get_free_shards, now, self.shard_count):
+                if len(owned) >= target:
+                    break
+                if await run_db(claim_shard_lease, shard, self.replica_id, now, expires_at):
+                    owned.append(shard)
+                    logger.info(f"Parça {shard} kiralandı ({self.replica_id})")
+
+        self.owned = sorted(owned)
+        return self.owned
+
+    async def release_all(self):
+        self.owned = []
+        if self._initialized:
+            await run_db(release_shard_leases, self.replica_id)
@@ -0,0 +1,338 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import itertools
+import statistics
+from datetime import date, timedelta
+
+# Botun gerçek Application/ConversationHandler'ını, Telegram yerine süreç içindeki sahte bir
+# Bot API ile yük altında çalıştırır. Her sanal kullanıcı gerçek bir kullanıcı gibi bir
+# güncelleme gönderip yanıtını bekler ve şu akışları izler:
+#   /start -> ➕ Ürün Ekle -> 📝 Manuel Giriş -> ürün adı -> SKT
+#   📋 Ürünleri Listele -> ▶️ sayfa, 🗑️ Ürün Sil -> satırdaki sil butonu
+#   (isteğe bağlı) 📸 Fotoğraftan SKT Okut -> fotoğraf
+# Rapor: adım bazlı gecikme yüzdelikleri, güncelleme/sn, hatalar ve veritabanı çekişmesi
+# ("database is locked", havuz zaman aşımları, havuzda aynı anda kullanılan en çok bağlantı).
+#   python loadtest.py --users 200 --concurrency 50
+#   python loadtest.py --database-url postgresql://... --photo-ratio 0.2
+
+REPLY_METHODS = ('sendMessage', 'editMessageText')
+
+def make_fake_bot_api(files):
+    from telegram.request import BaseRequest
+
+    class FakeBotAPI(BaseRequest):
+        # Yanıtları sohbet bazında bekleyen sanal kullanıcılara iletir
+        def __init__(self):
+            self.waiters = {}
+            self.last_markup = {}
+            self.calls = {}
+            self._message_ids = itertools.count(1)
+
+        async def initialize(self):
+            pass
+
+        async def shutdown(self):
+            pass
+
+        def expect_reply(self, chat_id):
+            future = asyncio.get_running_loop().create_future()
+            self.waiters[chat_id] = future
+            return future
+
+        async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                             connect_timeout=None, pool_timeout=None):
+            if '/file/' in url:
+                return 200, files[url.rsplit('/', 1)[-1]]
+
+            endpoint = url.rsplit('/', 1)[-1]
+            params = request_data.parameters if request_data else {}
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+
+            if endpoint == 'getMe':
+                result = {'id': 1, 'is_bot': True, 'first_name': 'load', 'username': 'load_bot'}
+            elif endpoint in REPLY_METHODS:
+                chat_id = int(params.get('chat_id') or 0)
+                markup = params.get('reply_markup')
+                self.last_markup[chat_id] = json.loads(markup) if isinstance(markup, str) else markup
+                future = self.waiters.pop(chat_id, None)
+                if future is not None and not future.done():
+                    future.set_result(params.get('text', ''))
+                result = {'message_id': next(self._message_ids), 'date': int(time.time()),
+                          'chat': {'id': chat_id, 'type': 'private'}, 'text': params.get('text', '')}
+            elif endpoint == 'getFile':
+                result = {'file_id': params['file_id'], 'file_unique_id': params['file_id'],
+                          'file_path': f"photos/{params['file_id']}"}
+            else:
+                result = True
+            return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+    return FakeBotAPI()
+
+class UpdateFactory:
+    def __init__(self):
+        self._ids = itertools.count(1)
+
+    def _user(self, user_id):
+        return {'id': user_id, 'is_bot': False, 'first_name': f'yuk{user_id}', 'username': f'yuk{user_id}'}
+
+    def message(self, user_id, text=None, photo=None):
+        message = {
+            'message_id': next(self._ids), 'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'}, 'from': self._user(user_id),
+        }
+        if text is not None:
+            message['text'] = text
+            if text.startswith('/'):
+                message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        if photo is not None:
+            message['photo'] = [{'file_id': photo, 'file_unique_id': photo, 'width': 800, 'height': 600}]
+        return {'update_id': next(self._ids), 'message': message}
+
+    def callback(self, user_id, data):
+        return {'update_id': next(self._ids), 'callback_query': {
+            'id': str(next(self._ids)), 'chat_instance': str(user_id), 'data': data, 'from': self._user(user_id),
+            'message': {'message_id': 1, 'date': int(time.time()), 'chat': {'id': user_id, 'type': 'private'}, 'text': '-'},
+        }}
+
+def callback_buttons(markup, prefix):
+    if not markup:
+        return []
+    return [button['callback_data'] for row in markup.get('inline_keyboard', []) for button in row
+            if button.get('callback_data', '').startswith(prefix)]
+
+def make_photo(user_id):
+    # Her kullanıcıya farklı bir fotoğraf: OCR önbelleği sonuçları bozmasın
+    import cv2
+    import numpy as np
+    image = np.full((600, 800, 3), 235, dtype=np.uint8)
+    expiry = date.today() + timedelta(days=user_id % 700)
+    cv2.putText(image, f"LOT {user_id}", (40, 200), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (20, 20, 20), 3)
+    cv2.putText(image, f"SKT: {expiry:%d.%m.%Y}", (40, 320), cv2.FONT_HERSHEY_SIMPLEX, 1.8, (20, 20, 20), 4)
+    return cv2.imencode('.jpg', image)[1].tobytes()
+
+class LoadTest:
+    def __init__(self, application, api, timeout, products_per_user, photo_ratio, seed):
+        self.application = application
+        self.api = api
+        self.timeout = timeout
+        self.products_per_user = products_per_user
+        self.photo_ratio = photo_ratio
+        self.random = random.Random(seed)
+        self.updates = UpdateFactory()
+        self.latencies = {}
+        self.timeouts = {}
+        self.sent = 0
+
+    async def step(self, name, user_id, update):
+        from telegram import Update
+        reply = self.api.expect_reply(user_id)
+        started = time.perf_counter()
+        await self.application.update_queue.put(Update.de_json(update, self.application.bot))
+        self.sent += 1
+        try:
+            text = await asyncio.wait_for(reply, self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts[name] = self.timeouts.get(name, 0) + 1
+            return None
+        self.latencies.setdefault(name, []).append(time.perf_counter() - started)
+        return text
+
+    async def run_user(self, user_id, files):
+        message = self.updates.message
+        await self.step('start', user_id, message(user_id, '/start'))
+
+        for i in range(self.products_per_user):
+            expiry = date.today() + timedelta(days=self.random.randint(-5, 400))
+            await self.step('menu_add', user_id, message(user_id, '➕ Ürün Ekle'))
+            await self.step('manual_entry', user_id, message(user_id, '📝 Manuel Giriş'))
+            await self.step('product_name', user_id, message(user_id, f'Ürün {user_id}-{i}'))
+            await self.step('expiry_date', user_id, message(user_id, expiry.strftime('%d.%m.%Y')))
+
+        await self.step('list', user_id, message(user_id, '📋 Ürünleri Listele'))
+        for data in callback_buttons(self.api.last_markup.get(user_id), 'list:next:')[:1]:
+            await self.step('list_next_page', user_id, self.updates.callback(user_id, data))
+
+        await self.step('delete_menu', user_id, message(user_id, '🗑️ Ürün Sil'))
+        for data in callback_buttons(self.api.last_markup.get(user_id), 'rm:')[:1]:
+            await self.step('delete_button', user_id, self.updates.callback(user_id, data))
+        # /iptal konuşmayı ana menüde bırakır
+        await self.step('cancel', user_id, message(user_id, '/iptal'))
+
+        if self.random.random() < self.photo_ratio:
+            files[f'photo{user_id}'] = await asyncio.to_thread(make_photo, user_id)
+            await self.step('menu_add', user_id, message(user_id, '➕ Ürün Ekle'))
+            await self.step('photo_prompt', user_id, message(user_id, '📸 Fotoğraftan SKT Okut'))
+            await self.step('photo', user_id, message(user_id, photo=f'photo{user_id}'))
+            await self.step('cancel', user_id, message(user_id, '/iptal'))
+
+def percentiles(values):
+    values = sorted(values)
+    def pick(q):
+        return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 2)
+    return {'count': len(values), 'p50_ms': pick(0.5), 'p90_ms': pick(0.9), 'p99_ms': pick(0.99),
+            'max_ms': round(values[-1] * 1000, 2), 'mean_ms': round(statistics.fmean(values) * 1000, 2)}
+
+async def run(args):
+    import logging
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger('bot').setLevel(logging.ERROR)
+
+    import database
+    database.init_db()
+    import bot
+    import async_database
+    from sqlalchemy import event
+    from telegram.ext import ApplicationBuilder
+
+    files = {}
+    api = make_fake_bot_api(files)
+    original_build = ApplicationBuilder.build
+    ApplicationBuilder.build = lambda self: original_build(self.request(api).get_updates_request(make_fake_bot_api(files)))
+    try:
+        application = bot.build_application()
+    finally:
+        ApplicationBuilder.build = original_build
+
+    # Handler hataları ve veritabanı çekişmesi
+    errors = {}
+    contention = {'database_locked': 0, 'pool_timeouts': 0, 'max_checked_out': 0, 'max_db_queue': 0, 'checkouts': 0}
+
+    async def count_error(update, context):
+        error = context.error
+        text = str(error)
+        if 'database is locked' in text:
+            contention['database_locked'] += 1
+        elif 'QueuePool limit' in text:
+            contention['pool_timeouts'] += 1
+        errors[type(error).__name__] = errors.get(type(error).__name__, 0) + 1
+    application.add_error_handler(count_error)
+
+    @event.listens_for(database.engine, 'checkout')
+    def on_checkout(*_):
+        contention['checkouts'] += 1
+
+    # Havuzdan bağlantı alırken geçen süre (havuz doluysa bekleme burada olur)
+    pool_waits = []
+    pool_connect = database.engine.pool.connect
+    def timed_connect():
+        started = time.perf_counter()
+        try:
+            return pool_connect()
+        finally:
+            pool_waits.append(time.perf_counter() - started)
+    database.engine.pool.connect = timed_connect
+
+    # Aynı anda işlenen güncellemeler; concurrent_updates kapalıysa ya da bir handler
+    # event loop'u tıkıyorsa 1'i geçmez ve çekişme ölçümleri anlamsız kalır
+    in_flight = {'current': 0, 'max': 0}
+    process_update = application.process_update
+    async def counted_process_update(update):
+        in_flight['current'] += 1
+        in_flight['max'] = max(in_flight['max'], in_flight['current'])
+        try:
+            await process_update(update)
+        finally:
+            in_flight['current'] -= 1
+    application.process_update = counted_process_update
+
+    async def sample_pool():
+        pool = database.engine.pool
+        while True:
+            if hasattr(pool, 'checkedout'):
+                contention['max_checked_out'] = max(contention['max_checked_out'], pool.checkedout())
+            queue = async_database._executor._work_queue.qsize()
+            contention['max_db_queue'] = max(contention['max_db_queue'], queue)
+            await asyncio.sleep(0.005)
+
+    load = LoadTest(application, api, args.timeout, args.products, args.photo_ratio, args.seed)
+    limiter = asyncio.Semaphore(args.concurrency)
+
+    async def user(user_id):
+        async with limiter:
+            await load.run_user(user_id, files)
+
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    await application.start()
+    sampler = asyncio.create_task(sample_pool())
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(user(100000 + i) for i in range(args.users)))
+    finally:
+        elapsed = time.perf_counter() - started
+        sampler.cancel()
+        await application.stop()
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+
+    all_latencies = [value for values in load.latencies.values() for value in values]
+    concurrency = {
+        'concurrent_updates': application.update_processor.max_concurrent_updates,
+        'max_in_flight_updates': in_flight['max'],
+        'max_checked_out': contention['max_checked_out'],
+    }
+    # Birden fazla sanal kullanıcı varken hem güncellemeler hem veritabanı bağlantıları gerçekten eşzamanlı olmalı
+    concurrency['reached'] = args.concurrency < 2 or (concurrency['max_in_flight_updates'] > 1 and concurrency['max_checked_out'] > 1)
+    return {
+        'config': {
+            'users': args.users,
+            'concurrency': args.concurrency,
+            'products_per_user': args.products,
+            'photo_ratio': args.photo_ratio,
+            'database': database.engine.url.render_as_string(hide_password=True),
+            'db_pool_size': database.DB_POOL_SIZE,
+            'db_threads': async_database.DB_THREADS,
+        },
+        'duration_s': round(elapsed, 3),
+        'updates': load.sent,
+        'updates_per_s': round(load.sent / elapsed, 1),
+        'latency': percentiles(all_latencies) if all_latencies else None,
+        'steps': {name: percentiles(values) for name, values in sorted(load.latencies.items())},
+        'timeouts': load.timeouts,
+        'errors': errors,
+        'concurrency': concurrency,
+        'db_contention': dict(contention, pool_wait=percentiles(pool_waits) if pool_waits else None),
+        'bot_api_calls': api.calls,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Konuşma akışları için yük testi (sahte Bot API ile)")
+    parser.add_argument('--users', type=int, default=100, help="toplam sanal kullanıcı sayısı")
+    parser.add_argument('--concurrency', type=int, default=20, help="aynı anda etkin kullanıcı sayısı")
+    parser.add_argument('--products', type=int, default=3, help="kullanıcı başına eklenecek ürün sayısı")
+    parser.add_argument('--photo-ratio', type=float, default=0.0, help="fotoğraf akışını da izleyen kullanıcı oranı")
+    parser.add_argument('--timeout', type=float, default=30.0, help="bir yanıt için en fazla bekleme (sn)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--database-url', help="varsayılan: geçici bir SQLite veritabanı")
+    parser.add_argument('--output', help="JSON raporun yazılacağı dosya (varsayılan: standart çıktı)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Ayarlar bot modülleri içe aktarılmadan önce yapılmalı
+        os.environ['DATABASE_URL'] = args.database_url or f"sqlite:///{os.path.join(tmp, 'loadtest.db')}"
+        os.environ.setdefault('TELEGRAM_BOT_TOKEN', '1:loadtest')
+        os.environ['OCR_PRELOAD'] = '1' if args.photo_ratio > 0 else '0'
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        report = asyncio.run(run(args))
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if not report['concurrency']['reached']:
+        print(f"Eşzamanlılığa ulaşılamadı: {report['concurrency']}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
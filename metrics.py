@@ -0,0 +1,301 @@
+import os
+import time
+import bisect
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Prometheus metin biçimindeki /metrics uç noktası. 0 uç noktayı kapatır; ölçümler yine
+# toplanır ve /stats komutuyla görülebilir. Varsayılan olarak yalnızca yerel adreste dinlenir.
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+METRICS_LISTEN = os.getenv('METRICS_LISTEN', '127.0.0.1')
+
+# Süre histogramlarının üst sınırları (saniye)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+STARTED_AT = time.time()
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for suffix, labels, value in metric.samples():
+                lines.append(f'{metric.name}{suffix}{labels} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+class Metric:
+    # Ölçümler hem event loop'tan hem veritabanı iş parçacıklarından güncellenir
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        registry.register(self)
+
+    def labels(self):
+        with self._lock:
+            return sorted(self._values)
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield '', _format_labels(self.labelnames, labels), value
+
+class Gauge(Metric):
+    # Değer ya set() ile verilir ya da her okumada func() çağrılarak hesaplanır
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), func=None, registry=REGISTRY):
+        super().__init__(name, documentation, labelnames, registry)
+        self.func = func
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def set_function(self, func):
+        self.func = func
+
+    def value(self, *labels):
+        if self.func is not None:
+            return self.func()
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        if self.func is not None:
+            yield '', '', self.func()
+            return
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield '', _format_labels(self.labelnames, labels), value
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(float(bound) for bound in buckets)
+
+    def observe(self, value, *labels):
+        # Kovalar birikimsiz tutulur; gözlem başına tek bir ikili arama ve kilit
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def snapshot(self, *labels):
+        # (kova sayıları, toplam, adet)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                return [0] * (len(self.buckets) + 1), 0.0, 0
+            return list(state[0]), state[1], state[2]
+
+    def quantile(self, q, *labels):
+        # Kovalardan yaklaşık yüzdelik (kova içinde doğrusal ara değer)
+        counts, _, count = self.snapshot(*labels)
+        if not count:
+            return None
+        rank = q * count
+        cumulative = 0
+        for index, bucket_count in enumerate(counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index == len(self.buckets):
+                    return lower
+                return lower + (self.buckets[index] - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+    def samples(self):
+        with self._lock:
+            items = sorted((labels, (list(s[0]), s[1], s[2])) for labels, s in self._values.items())
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = _format_value(bound)
+                yield '_bucket', _format_labels(self.labelnames, labels, [('le', le)]), cumulative
+            yield '_sum', _format_labels(self.labelnames, labels), total
+            yield '_count', _format_labels(self.labelnames, labels), count
+
+# Botun ölçümleri
+UPTIME = Gauge('bot_uptime_seconds', "Botun çalışma süresi", func=lambda: time.time() - STARTED_AT)
+HANDLER_SECONDS = Histogram('bot_handler_duration_seconds', "Handler çalışma süresi", ['handler'])
+HANDLER_ERRORS = Counter('bot_handler_errors_total', "Hata fırlatan handler çağrıları", ['handler'])
+OCR_STAGE_SECONDS = Histogram('ocr_stage_duration_seconds', "OCR aşama süreleri (OCR işçisinde ölçülür)", ['stage'])
+OCR_REQUESTS = Counter('ocr_requests_total', "Fotoğraf okuma istekleri", ['result'])
+DB_QUERY_SECONDS = Histogram('db_query_duration_seconds', "SQL sorgu süreleri", ['operation'], buckets=DB_BUCKETS)
+DB_ERRORS = Counter('db_errors_total', "Hatayla sonuçlanan SQL sorguları", ['error'])
+DB_POOL_CHECKED_OUT = Gauge('db_pool_checked_out', "Havuzdan alınmış veritabanı bağlantıları")
+REMINDER_RUNS = Counter('reminder_runs_total', "Tamamlanan hatırlatma taramaları")
+REMINDER_RUN_SECONDS = Histogram('reminder_run_duration_seconds', "Hatırlatma taraması süresi", buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800))
+REMINDER_PRODUCTS = Counter('reminder_products_total', "Hatırlatılan ürünler")
+REMINDER_MESSAGES = Counter('reminder_messages_total', "Hatırlatma mesajları", ['result'])
+ARCHIVE_PRODUCTS = Counter('archive_products_total', "Arşivlenen ya da silinen ürünler", ['mode'])
+ARCHIVE_RUN_SECONDS = Histogram('archive_run_duration_seconds', "Arşivleme süresi", buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800))
+
+SQL_OPERATIONS = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+
+def statement_operation(statement):
+    head = statement.lstrip()[:6].upper()
+    for operation in SQL_OPERATIONS:
+        if head.startswith(operation):
+            return operation
+    return 'OTHER'
+
+def instrument_engine(engine):
+    # Sorgu sayıları ve süreleri SQLAlchemy olaylarıyla toplanır
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['query_started'].pop()
+        DB_QUERY_SECONDS.observe(time.perf_counter() - started, statement_operation(statement))
+
+    @event.listens_for(engine, 'handle_error')
+    def handle_error(context):
+        if context.connection is not None and context.connection.info.get('query_started'):
+            context.connection.info['query_started'].pop()
+        DB_ERRORS.inc(type(context.original_exception).__name__)
+
+    pool = engine.pool
+    if hasattr(pool, 'checkedout'):
+        DB_POOL_CHECKED_OUT.set_function(pool.checkedout)
+
+def instrument_handlers(application):
+    # Kayıtlı tüm handler'ların (konuşma durumları dahil) callback'lerini süre ölçen bir sarmalayıcıyla değiştirir
+    from telegram.ext import ConversationHandler
+
+    def wrap(handler):
+        if isinstance(handler, ConversationHandler):
+            for child in list(handler.entry_points) + list(handler.fallbacks):
+                wrap(child)
+            for handlers in handler.states.values():
+                for child in handlers:
+                    wrap(child)
+            return
+
+        callback = handler.callback
+        if getattr(callback, 'instrumented', False):
+            return
+        name = callback.__name__
+
+        async def timed(update, context):
+            started = time.perf_counter()
+            try:
+                return await callback(update, context)
+            except Exception:
+                HANDLER_ERRORS.inc(name)
+                raise
+            finally:
+                HANDLER_SECONDS.observe(time.perf_counter() - started, name)
+
+        timed.instrumented = True
+        timed.__name__ = name
+        handler.callback = timed
+
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            wrap(handler)
+
+def record_ocr_timings(timings):
+    for stage, seconds in timings:
+        OCR_STAGE_SECONDS.observe(seconds, stage)
+
+async def _handle_request(reader, writer):
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), 5)
+        # Başlıklar okunup atlanır
+        while (await asyncio.wait_for(reader.readline(), 5)) not in (b'\r\n', b'\n', b''):
+            pass
+        parts = request_line.decode('latin-1').split()
+        if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] in ('/', '/metrics'):
+            status, body = '200 OK', REGISTRY.render().encode()
+        else:
+            status, body = '404 Not Found', b'Not Found\n'
+        writer.write(
+            f"HTTP/1.1 {status}\r\n"
+            "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+async def start_metrics_server(port=METRICS_PORT, listen=METRICS_LISTEN):
+    # Botun kendi event loop'unda çalışan küçük bir HTTP sunucusu; port kullanılıyorsa bot yine de çalışır
+    if not port:
+        return None
+    try:
+        server = await asyncio.start_server(_handle_request, listen, port)
+    except OSError as e:
+        logger.warning(f"Ölçüm sunucusu başlatılamadı ({listen}:{port}): {str(e)}")
+        return None
+    logger.info(f"Ölçümler yayında: http://{listen}:{port}/metrics")
+    return server
@@ -0,0 +1,197 @@
+import os
+import asyncio
+import random
+import logging
+from dotenv import load_dotenv
+from telegram.error import RetryAfter, Forbidden, BadRequest, ChatMigrated, NetworkError, TelegramError
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Telegram sınırları: toplamda ~30 mesaj/sn, aynı sohbete ~1 mesaj/sn
+NOTIFY_GLOBAL_RATE = float(os.getenv('NOTIFY_GLOBAL_RATE', 25))
+NOTIFY_PER_CHAT_INTERVAL = float(os.getenv('NOTIFY_PER_CHAT_INTERVAL', 1.0))
+NOTIFY_CONCURRENCY = int(os.getenv('NOTIFY_CONCURRENCY', 8))
+NOTIFY_MAX_RETRIES = int(os.getenv('NOTIFY_MAX_RETRIES', 5))
+NOTIFY_QUEUE_SIZE = int(os.getenv('NOTIFY_QUEUE_SIZE', 1000))
+
+def loop_time():
+    return asyncio.get_running_loop().time()
+
+class TokenBucket:
+    # Saniyede `rate` jeton üreten, en fazla `capacity` jeton biriktiren kova.
+    # Varsayılan kapasite 1: ani patlama olmaz, herhangi bir 1 saniyelik pencerede en fazla ~rate+1 mesaj gider.
+    # clock/sleep testlerde sanal saatle değiştirilebilir.
+    def __init__(self, rate, capacity=1, clock=loop_time, sleep=asyncio.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = self.capacity
+        self._updated = None
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds):
+        # RetryAfter sonrası tüm gönderimleri belirtilen süre kadar durdur
+        self._paused_until = max(self._paused_until, self.clock() + seconds)
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = self.clock()
+                if now < self._paused_until:
+                    await self.sleep(self._paused_until - now)
+                    continue
+
+                if self._updated is not None:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await self.sleep((1 - self._tokens) / self.rate)
+
+class Notification:
+    __slots__ = ('chat_id', 'text', 'kwargs', 'attempts', 'tag')
+
+    def __init__(self, chat_id, text, kwargs=None, tag=None):
+        self.chat_id = chat_id
+        self.text = text
+        self.kwargs = kwargs or {}
+        self.attempts = 0
+        # Gönderenin bildirimi sonuç kancalarında tanıması için (Telegram'a gönderilmez)
+        self.tag = tag
+
+class NotificationDispatcher:
+    # Mesajları sınırlı sayıda eşzamanlı göndericiyle, genel ve sohbet bazlı hız
+    # sınırlarına uyarak gönderir. RetryAfter ve geçici ağ hatalarında bekleyip tekrar dener;
+    # kalıcı hatalar (bot engellendi, sohbet yok vb.) on_dead_letter ile bildirilir.
+    # İletilen her bildirim için on_sent çağrılır.
+    def __init__(self, bot, global_rate=NOTIFY_GLOBAL_RATE, per_chat_interval=NOTIFY_PER_CHAT_INTERVAL,
+                 concurrency=NOTIFY_CONCURRENCY, max_retries=NOTIFY_MAX_RETRIES,
+                 queue_size=NOTIFY_QUEUE_SIZE, on_dead_letter=None, on_sent=None, clock=loop_time, sleep=asyncio.sleep):
+        self.bot = bot
+        self.clock = clock
+        self.sleep = sleep
+        self.bucket = TokenBucket(global_rate, clock=clock, sleep=sleep)
+        self.per_chat_interval = per_chat_interval
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.on_dead_letter = on_dead_letter
+        self.on_sent = on_sent
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._chat_locks = {}
+        self._chat_next_send = {}
+        self._workers = []
+        self.stats = {'sent': 0, 'retried': 0, 'dead': 0}
+
+    async def start(self):
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def enqueue(self, chat_id, text, tag=None, **kwargs):
+        # Kuyruk doluysa bekler; üretici göndericilerden hızlı olamaz
+        await self._queue.put(Notification(chat_id, text, kwargs, tag))
+
+    async def join(self):
+        await self._queue.join()
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if exc_info[0] is None:
+            await self.join()
+        await self.stop()
+
+    async def _worker(self):
+        while True:
+            notification = await self._queue.get()
+            try:
+                await self._deliver(notification)
+            except Exception as e:
+                logger.error(f"Bildirim gönderiminde beklenmeyen hata ({notification.chat_id}): {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    async def _wait_for_chat(self, chat_id):
+        delay = self._chat_next_send.get(chat_id, 0) - self.clock()
+        if delay > 0:
+            await self.sleep(delay)
+
+    def _chat_lock(self, chat_id):
+        lock = self._chat_locks.get(chat_id)
+        if lock is None:
+            lock = self._chat_locks[chat_id] = asyncio.Lock()
+        return lock
+
+    def _forget_idle_chats(self):
+        # Süresi geçmiş sohbet kayıtlarını temizle, bellek sohbet sayısıyla büyümesin
+        if len(self._chat_next_send) < 10000:
+            return
+        now = self.clock()
+        for chat_id in [c for c, t in self._chat_next_send.items() if t <= now]:
+            del self._chat_next_send[chat_id]
+            lock = self._chat_locks.get(chat_id)
+            if lock is not None and not lock.locked():
+                del self._chat_locks[chat_id]
+
+    async def _deliver(self, notification):
+        while True:
+            notification.attempts += 1
+            try:
+                # Aynı sohbete aynı anda yalnızca bir mesaj gider
+                async with self._chat_lock(notification.chat_id):
+                    await self._wait_for_chat(notification.chat_id)
+                    await self.bucket.acquire()
+                    try:
+                        await self.bot.send_message(chat_id=notification.chat_id, text=notification.text, **notification.kwargs)
+                    finally:
+                        self._chat_next_send[notification.chat_id] = self.clock() + self.per_chat_interval
+                self.stats['sent'] += 1
+                self._forget_idle_chats()
+                if self.on_sent is not None:
+                    await self.on_sent(notification)
+                return
+            except RetryAfter as e:
+                retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, 'total_seconds') else e.retry_after
+                logger.warning(f"Telegram hız sınırı, {retry_after} sn bekleniyor")
+                self.bucket.pause(retry_after)
+                error = e
+            except ChatMigrated as e:
+                notification.chat_id = e.new_chat_id
+                error = e
+            except (Forbidden, BadRequest) as e:
+                # Kullanıcı botu engellemiş, sohbet bulunamadı vb.: tekrar denemek anlamsız
+                await self._dead_letter(notification, e)
+                return
+            except NetworkError as e:
+                # Geçici ağ hatası / zaman aşımı: üstel bekleme ile tekrar dene
+                await self.sleep(min(60, 2 ** notification.attempts) * (0.5 + random.random() / 2))
+                error = e
+            except TelegramError as e:
+                await self._dead_letter(notification, e)
+                return
+
+            if notification.attempts >= self.max_retries:
+                await self._dead_letter(notification, error)
+                return
+            self.stats['retried'] += 1
+
+    async def _dead_letter(self, notification, error):
+        self.stats['dead'] += 1
+        logger.warning(f"Bildirim gönderilemedi ({notification.chat_id}): {str(error)}")
+        if self.on_dead_letter is not None:
+            try:
+                await self.on_dead_letter(notification, error)
+            except Exception as e:
+                logger.error(f"Gönderilemeyen bildirim kaydedilemedi: {str(e)}")
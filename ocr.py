@@ -0,0 +1,245 @@
+import os
+import logging
+from time import perf_counter
+import cv2
+import numpy as np
+from dotenv import load_dotenv
+from date_extractor import date_extractor
+from ocr_engine import get_engine
+
+# Bu modül OpenCV/numpy/Tesseract yığınını yükler; bot.py onu yalnızca ilk fotoğrafta
+# (ya da başlangıçtan sonra arka planda) içe aktarır. OCR işçi süreçleri de buradaki
+# process_image_ocr fonksiyonunu çalıştırır.
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# OCR debug modu: açıkken ön işlenmiş görüntüler istek bazlı klasörlere kaydedilir
+OCR_DEBUG = os.getenv('OCR_DEBUG', '0').lower() in ('1', 'true', 'yes')
+OCR_DEBUG_DIR = os.getenv('OCR_DEBUG_DIR', 'ocr_debug')
+
+# Metin bölgesi tespiti: büyük fotoğraflar bu uzun kenar boyutuna küçültülür
+# ve yalnızca en büyük OCR_TOP_REGIONS metin bölgesi Tesseract'a gönderilir
+OCR_MAX_SIDE = int(os.getenv('OCR_MAX_SIDE', 1600))
+OCR_TOP_REGIONS = int(os.getenv('OCR_TOP_REGIONS', 3))
+OCR_FULL_IMAGE_FALLBACK = os.getenv('OCR_FULL_IMAGE_FALLBACK', '1').lower() in ('1', 'true', 'yes')
+
+# Telegram'dan inen bayt dizisini diske yazmadan çöz
+def decode_image(image_bytes):
+    # np.frombuffer kopya oluşturmaz, doğrudan bayt dizisinin üzerinde çalışır
+    buffer = np.frombuffer(image_bytes, dtype=np.uint8)
+    image = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Görüntü çözülemedi")
+    return image
+
+# Fazla büyük görüntüleri küçült, ölçek katsayısını da döndür
+def downscale_image(image, max_side=OCR_MAX_SIDE):
+    height, width = image.shape[:2]
+    scale = max_side / max(height, width)
+    if scale >= 1:
+        return image, 1.0
+    resized = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return resized, scale
+
+# Dikey metin kenarlarını öne çıkaran gradyan görüntüsü
+def compute_gradient(gray):
+    ddepth = cv2.CV_32F
+    gradX = cv2.Sobel(gray, ddepth=ddepth, dx=1, dy=0, ksize=-1)
+    gradY = cv2.Sobel(gray, ddepth=ddepth, dx=0, dy=1, ksize=-1)
+    gradient = cv2.subtract(gradX, gradY)
+    return cv2.convertScaleAbs(gradient)
+
+# Metin benzeri bölgeleri bul: (x, y, w, h) listesi, büyükten küçüğe
+def find_text_regions(image, top_n=OCR_TOP_REGIONS):
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    height, width = gray.shape
+    gray = cv2.GaussianBlur(gray, (3, 3), 0)
+    
+    # Açık zemindeki koyu metni (blackhat) ve koyu zemindeki açık metni (tophat) öne çıkar
+    kernel_width = max(13, width // 60)
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_width, max(5, kernel_width // 3)))
+    response = cv2.max(
+        cv2.morphologyEx(gray, cv2.MORPH_BLACKHAT, kernel),
+        cv2.morphologyEx(gray, cv2.MORPH_TOPHAT, kernel)
+    )
+    gradient = cv2.normalize(compute_gradient(response), None, 0, 255, cv2.NORM_MINMAX)
+    
+    # Karakterleri satırlar halinde birleştir, küçük gürültüyü temizle
+    line_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_width * 3, max(5, kernel_width // 3)))
+    closed = cv2.morphologyEx(gradient, cv2.MORPH_CLOSE, line_kernel)
+    closed = cv2.threshold(closed, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+    closed = cv2.erode(closed, None, iterations=2)
+    closed = cv2.dilate(closed, None, iterations=2)
+    
+    contours = cv2.findContours(closed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[0]
+    
+    min_area = height * width * 0.002
+    regions = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        # Metin satırları yataydır; çok küçük ya da tüm görüntüyü kaplayan bölgeleri atla
+        if w * h < min_area or w < h * 1.5 or w * h > height * width * 0.9:
+            continue
+        
+        # Kenarlardaki harfler kesilmesin diye biraz pay bırak
+        pad = max(4, h // 4)
+        x0, y0 = max(0, x - pad), max(0, y - pad)
+        x1, y1 = min(width, x + w + pad), min(height, y + h + pad)
+        regions.append((x0, y0, x1 - x0, y1 - y0))
+    
+    regions.sort(key=lambda r: r[2] * r[3], reverse=True)
+    return regions[:top_n]
+
+# Görüntü ön işleme fonksiyonları
+def preprocess_basic(img):
+    # Temel ön işleme
+    img = cv2.resize(img, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    denoised = cv2.fastNlMeansDenoising(gray)
+    return denoised
+
+def preprocess_adaptive(img):
+    # Adaptif işleme
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+    thresh = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+    return thresh
+
+def preprocess_advanced(img):
+    # Gelişmiş ön işleme
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    gradient = compute_gradient(gray)
+    blurred = cv2.blur(gradient, (9, 9))
+    (_, thresh) = cv2.threshold(blurred, 225, 255, cv2.THRESH_BINARY)
+    return thresh
+
+# OCR aşamaları: ucuzdan pahalıya doğru sıralı (ad, ön işleme, Tesseract PSM modu).
+# Aynı ön işleme birden fazla aşamada kullanılırsa yalnızca bir kez hesaplanır.
+OCR_STAGES = [
+    ('adaptive_psm6', preprocess_adaptive, 6),
+    ('advanced_psm6', preprocess_advanced, 6),
+    ('basic_psm6', preprocess_basic, 6),
+    ('basic_psm11', preprocess_basic, 11),
+]
+
+# Bu güven skoruna ulaşan bir aday bulununca kalan aşamalar atlanır
+# (1.3: SKT ibareli eşleşme, 1.5: üretim + SKT çifti)
+OCR_CONFIDENCE_THRESHOLD = float(os.getenv('OCR_CONFIDENCE_THRESHOLD', 1.3))
+
+# Fotoğraf başına en fazla Tesseract çağrısı (bölgeler ve tüm görüntü denemesi toplamı).
+# Bütçe aşamalara eşit bölünür, böylece her aşama en az en büyük bölgede çalışır; tüm görüntü
+# denemesi yapılacaksa her aşamaya birer çağrı ondan önce ayrılır.
+OCR_MAX_CALLS = int(os.getenv('OCR_MAX_CALLS', OCR_TOP_REGIONS * len(OCR_STAGES)))
+# Bölgeler görüntünün bu oranından fazlasını kaplıyorsa tüm görüntü ayrıca denenmez
+OCR_FALLBACK_MAX_COVERAGE = float(os.getenv('OCR_FALLBACK_MAX_COVERAGE', 0.6))
+
+# Aşamaları sırayla (her aşamada kırpıntılar büyükten küçüğe) dene, yeterince güvenilir sonuç bulununca dur.
+# timings verilirse her aşamanın süresi (aşama, saniye) olarak eklenir.
+# Her aşama en fazla max_calls / aşama sayısı (en az 1) kırpıntıda çalışır; (sonuçlar, çağrı sayısı) döner.
+def run_ocr_cascade(crops, scale, debug_dir=None, timings=None, max_calls=OCR_MAX_CALLS):
+    engine = get_engine()
+    all_results = []
+    processed_images = {}
+    calls = 0
+    stage_crops = crops[:max(1, max_calls // len(OCR_STAGES))]
+    if len(stage_crops) < len(crops):
+        logger.debug(f"OCR çağrı sınırı ({max_calls}): her aşamada {len(stage_crops)}/{len(crops)} bölge okunacak")
+    
+    for stage_name, preprocess_func, psm in OCR_STAGES:
+        for crop_name, crop, (x, y, w, h) in stage_crops:
+            # Görüntüyü ön işle (aynı fonksiyonun çıktısı tekrar kullanılır)
+            key = (crop_name, preprocess_func)
+            if key not in processed_images:
+                started = perf_counter()
+                processed_images[key] = preprocess_func(crop)
+                if timings is not None:
+                    timings.append((f'preprocess:{preprocess_func.__name__}', perf_counter() - started))
+                
+                # Debug için işlenmiş görüntüyü kaydet
+                if debug_dir:
+                    cv2.imwrite(os.path.join(debug_dir, f'{crop_name}_{preprocess_func.__name__}.png'), processed_images[key])
+            
+            # OCR işlemi
+            started = perf_counter()
+            text = engine.image_to_string(processed_images[key], psm)
+            calls += 1
+            extract_started = perf_counter()
+            logger.debug(f"OCR Sonucu ({crop_name}/{stage_name}): {text}")
+            
+            # Tarih adaylarını çıkar, bölgeyi orijinal görüntü koordinatlarına çevir
+            for candidate in date_extractor.extract(text):
+                candidate['stage'] = f'{crop_name}/{stage_name}'
+                candidate['region'] = tuple(round(v / scale) for v in (x, y, w, h))
+                all_results.append(candidate)
+            if timings is not None:
+                timings.append((f'tesseract:psm{psm}', extract_started - started))
+                timings.append(('extract', perf_counter() - extract_started))
+            
+            if all_results and max(r['confidence'] for r in all_results) >= OCR_CONFIDENCE_THRESHOLD:
+                logger.info(f"Yeterli güven skoruna ulaşıldı, kalan aşamalar atlandı ({crop_name}/{stage_name})")
+                return all_results, calls
+    
+    return all_results, calls
+
+# OCR işlevi (ocr_executor üzerinden ayrı bir süreçte çalışır).
+# Güven skoruna göre sıralı aday listesi döner; her aday onu bulan aşamayı 'stage',
+# okunduğu bölgeyi de orijinal görüntü koordinatlarında 'region' alanında taşır.
+def process_image_ocr(image_bytes, request_id=None, timings=None):
+    started = perf_counter()
+    try:
+        # Görüntüyü bellekte çöz, gerekirse küçült
+        image, scale = downscale_image(decode_image(image_bytes))
+        if timings is not None:
+            timings.append(('decode', perf_counter() - started))
+
+        # Debug modu açıksa bu isteğe özel klasör hazırla
+        debug_dir = None
+        if OCR_DEBUG and request_id:
+            debug_dir = os.path.join(OCR_DEBUG_DIR, request_id)
+            os.makedirs(debug_dir, exist_ok=True)
+        
+        # Metin bölgelerini bul ve kırp
+        regions_started = perf_counter()
+        regions = find_text_regions(image)
+        if timings is not None:
+            timings.append(('regions', perf_counter() - regions_started))
+        crops = [(f'region{i}', image[y:y + h, x:x + w], (x, y, w, h)) for i, (x, y, w, h) in enumerate(regions)]
+        logger.debug(f"{len(regions)} metin bölgesi bulundu: {regions}")
+        
+        if debug_dir:
+            for crop_name, crop, _ in crops:
+                cv2.imwrite(os.path.join(debug_dir, f'{crop_name}.png'), crop)
+        
+        # Bölgeler görüntünün çoğunu kaplıyorsa tüm görüntüyü ayrıca okumaya gerek yok;
+        # aksi halde tüm görüntü denemesinin her aşaması için bütçeden pay ayrılır
+        height, width = image.shape[:2]
+        coverage = sum(w * h for _, _, (_, _, w, h) in crops) / float(width * height)
+        fallback = OCR_FULL_IMAGE_FALLBACK and coverage < OCR_FALLBACK_MAX_COVERAGE
+        reserved = len(OCR_STAGES) if fallback else 0
+        all_results, calls = run_ocr_cascade(crops, scale, debug_dir, timings, OCR_MAX_CALLS - reserved)
+        
+        # Bölgelerde hiç tarih bulunamazsa tüm görüntüyü dene
+        if not all_results and fallback:
+            all_results, _ = run_ocr_cascade([('full', image, (0, 0, width, height))], scale, debug_dir, timings,
+                                             max(reserved, OCR_MAX_CALLS - calls))
+        
+        # Güven skoruna göre sırala (eşitlikte önceki aşamanın sonucu önde kalır)
+        all_results.sort(key=lambda x: x['confidence'], reverse=True)
+        if all_results:
+            logger.info(f"Tespit edilen en iyi sonuç: {all_results[0]}")
+        return all_results
+        
+    except Exception as e:
+        logger.error(f"OCR işlemi sırasında hata: {str(e)}")
+        return []
+    finally:
+        if timings is not None:
+            timings.append(('total', perf_counter() - started))
+
+# Süreler işçi süreçte ölçülür ve sonuçlarla birlikte ana sürece döner: (sonuçlar, [(aşama, saniye), ...])
+def process_image_ocr_timed(image_bytes, request_id=None):
+    timings = []
+    results = process_image_ocr(image_bytes, request_id, timings)
+    return results, timings
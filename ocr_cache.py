@@ -0,0 +1,130 @@
+import os
+import json
+import time
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from database import SessionLocal, get_ocr_cache_entries, save_ocr_cache_entry, delete_ocr_cache_entry, delete_expired_ocr_cache_entries
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+OCR_CACHE_SIZE = int(os.getenv('OCR_CACHE_SIZE', 1024))
+OCR_CACHE_TTL = int(os.getenv('OCR_CACHE_TTL', 24 * 3600))
+# dHash boyutu (hash_size x hash_size bit) ve "aynı fotoğraf" sayılacak en fazla farklı bit sayısı
+OCR_CACHE_HASH_SIZE = int(os.getenv('OCR_CACHE_HASH_SIZE', 16))
+OCR_CACHE_MAX_DISTANCE = int(os.getenv('OCR_CACHE_MAX_DISTANCE', 4))
+# Önbelleği yeniden başlatmalarda korumak için veritabanına da yaz
+OCR_CACHE_PERSIST = os.getenv('OCR_CACHE_PERSIST', '0').lower() in ('1', 'true', 'yes')
+
+def compute_dhash(image_bytes, hash_size=OCR_CACHE_HASH_SIZE):
+    # Fark hash'i (dHash): küçültülmüş gri görüntüde yan yana piksellerin karşılaştırması.
+    # JPEG 1/8 ölçekte çözülür, bu yüzden tam çözmeden çok daha ucuzdur.
+    # OpenCV ilk fotoğrafta yüklenir; fotoğraf işlemeyen süreçler bu bedeli ödemez.
+    import cv2
+    import numpy as np
+    buffer = np.frombuffer(image_bytes, dtype=np.uint8)
+    gray = cv2.imdecode(buffer, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if gray is None:
+        raise ValueError("Görüntü çözülemedi")
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(''.join('1' if bit else '0' for bit in bits), 2)
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+class OCRCache:
+    # Algısal hash ile anahtarlanan, boyut ve süre sınırlı LRU OCR sonuç önbelleği.
+    # Yalnızca event loop üzerinden kullanılır, kilit gerekmez.
+    def __init__(self, max_size=OCR_CACHE_SIZE, ttl=OCR_CACHE_TTL, max_distance=OCR_CACHE_MAX_DISTANCE):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _find(self, image_hash, now):
+        if image_hash in self._entries:
+            return image_hash
+
+        # Birebir eşleşme yoksa en yakın benzer fotoğrafı ara
+        best_key, best_distance = None, self.max_distance + 1
+        for key, (stored_at, _) in self._entries.items():
+            if now - stored_at > self.ttl:
+                continue
+            distance = hamming_distance(key, image_hash)
+            if distance < best_distance:
+                best_key, best_distance = key, distance
+        return best_key
+
+    def get(self, image_hash):
+        now = time.time()
+        key = self._find(image_hash, now)
+
+        if key is not None:
+            stored_at, results = self._entries[key]
+            if now - stored_at <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return results
+            del self._entries[key]
+
+        self.misses += 1
+        return None
+
+    def put(self, image_hash, results, stored_at=None):
+        self._entries[image_hash] = (stored_at or time.time(), results)
+        self._entries.move_to_end(image_hash)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, image_hash):
+        key = self._find(image_hash, time.time())
+        if key is not None:
+            del self._entries[key]
+        return key
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+    # Veritabanı işlemleri: event loop'u bloklamamak için ayrı iş parçacığında çağrılmalı
+    def load_persisted(self):
+        db = SessionLocal()
+        try:
+            since = datetime.now() - timedelta(seconds=self.ttl)
+            delete_expired_ocr_cache_entries(db, since)
+            entries = get_ocr_cache_entries(db, since, self.max_size)
+            # En eskiden yeniye ekle ki LRU sırası korunsun
+            loaded = []
+            for entry in reversed(entries):
+                loaded.append((int(entry.image_hash, 16), json.loads(entry.results), entry.created_at.timestamp()))
+            return loaded
+        finally:
+            db.close()
+
+    def persist(self, image_hash, results):
+        db = SessionLocal()
+        try:
+            save_ocr_cache_entry(db, format(image_hash, 'x'), json.dumps(results, ensure_ascii=False))
+        finally:
+            db.close()
+
+    def delete_persisted(self, image_hash):
+        db = SessionLocal()
+        try:
+            delete_ocr_cache_entry(db, format(image_hash, 'x'))
+        finally:
+            db.close()
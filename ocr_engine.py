@@ -0,0 +1,98 @@
+import os
+import shutil
+import logging
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# auto: tesserocr kuruluysa onu, değilse pytesseract'ı kullan
+OCR_BACKEND = os.getenv('OCR_BACKEND', 'auto').lower()
+OCR_LANG = os.getenv('OCR_LANG', 'tur')
+OCR_OEM = int(os.getenv('OCR_OEM', 3))
+TESSERACT_CMD = os.getenv('TESSERACT_CMD')
+
+WINDOWS_TESSERACT_CMD = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+
+def find_tesseract_cmd():
+    # Öncelik: .env'deki TESSERACT_CMD, sonra PATH, en son Windows varsayılan kurulum yolu
+    if TESSERACT_CMD:
+        return TESSERACT_CMD
+    cmd = shutil.which('tesseract')
+    if cmd:
+        return cmd
+    if os.path.exists(WINDOWS_TESSERACT_CMD):
+        return WINDOWS_TESSERACT_CMD
+    return 'tesseract'
+
+class PytesseractEngine:
+    # Her çağrıda tesseract sürecini başlatan yedek motor
+    name = 'pytesseract'
+
+    def __init__(self, lang=OCR_LANG, oem=OCR_OEM):
+        import pytesseract
+        self._pytesseract = pytesseract
+        self._pytesseract.pytesseract.tesseract_cmd = find_tesseract_cmd()
+        self.lang = lang
+        self.oem = oem
+
+    def image_to_string(self, image, psm):
+        config = f'--oem {self.oem} --psm {psm} -l {self.lang}'
+        return self._pytesseract.image_to_string(image, config=config)
+
+    def close(self):
+        pass
+
+class TesserocrEngine:
+    # libtesseract'a doğrudan bağlanan kalıcı motor: dil modeli bir kez yüklenir
+    name = 'tesserocr'
+
+    def __init__(self, lang=OCR_LANG, oem=OCR_OEM):
+        import tesserocr
+        self._api = tesserocr.PyTessBaseAPI(lang=lang, oem=oem)
+        self.lang = lang
+        self.oem = oem
+
+    def image_to_string(self, image, psm):
+        import cv2
+        import numpy as np
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        image = np.ascontiguousarray(image)
+        height, width = image.shape[:2]
+        bytes_per_pixel = 1 if image.ndim == 2 else image.shape[2]
+
+        self._api.SetPageSegMode(psm)
+        self._api.SetImageBytes(image.tobytes(), width, height, bytes_per_pixel, width * bytes_per_pixel)
+        return self._api.GetUTF8Text()
+
+    def close(self):
+        self._api.End()
+
+ENGINES = {
+    'tesserocr': TesserocrEngine,
+    'pytesseract': PytesseractEngine,
+}
+
+# Her süreçte (OCR işçisinde) tek bir motor örneği tutulur
+_engine = None
+
+def create_engine(backend=OCR_BACKEND):
+    if backend != 'auto':
+        return ENGINES[backend]()
+
+    try:
+        return TesserocrEngine()
+    except ImportError:
+        logger.info("tesserocr bulunamadı, pytesseract kullanılacak")
+    except RuntimeError as e:
+        logger.warning(f"tesserocr başlatılamadı, pytesseract kullanılacak: {str(e)}")
+    return PytesseractEngine()
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        _engine = create_engine()
+        logger.info(f"OCR motoru hazır: {_engine.name} (pid: {os.getpid()})")
+    return _engine
@@ -0,0 +1,65 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+OCR_QUEUE_SIZE = int(os.getenv("OCR_QUEUE_SIZE", 8))
+
+class OCRQueueFull(Exception):
+    pass
+
+class OCRExecutor:
+    # OCR işlerini event loop dışında, sınırlı bir süreç havuzunda çalıştırır.
+    # Çalışan + bekleyen iş sayısı (workers + queue_size) sınırını aşarsa
+    # yeni iş kabul edilmez ve OCRQueueFull fırlatılır.
+    def __init__(self, max_workers=OCR_WORKERS, max_queue=OCR_QUEUE_SIZE, initializer=None):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.initializer = initializer
+        self._pool = None
+        self._pending = 0
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def _get_pool(self):
+        # Havuz ilk fotoğrafta oluşturulur, böylece bot açılışı yavaşlamaz
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=self.initializer)
+            logger.info(f"OCR havuzu başlatıldı ({self.max_workers} işçi, kuyruk: {self.max_queue})")
+        return self._pool
+
+    async def submit(self, func, *args):
+        if self._pending >= self.max_workers + self.max_queue:
+            raise OCRQueueFull()
+
+        # Sayaç yalnızca event loop üzerinde değiştiği için kilit gerekmez
+        self._pending += 1
+        pool = None
+        try:
+            loop = asyncio.get_running_loop()
+            pool = self._get_pool()
+            return await loop.run_in_executor(pool, func, *args)
+        except BrokenProcessPool:
+            # Bir işçi süreç beklenmedik şekilde öldüyse (ör. bellek yetersizliği) havuz kullanılamaz
+            # hale gelir; atılır ve sonraki istekte yeniden oluşturulur
+            if pool is not None and self._pool is pool:
+                logger.error("OCR havuzu bozuldu, yeniden oluşturulacak")
+                self._pool = None
+                pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            self._pending -= 1
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
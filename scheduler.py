@@ -1,34 +1,296 @@
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.cron import CronTrigger
-from database import SessionLocal, get_expiring_products
-from datetime import date
-
-async def check_expiring_products(bot):
-    db = SessionLocal()
-    try:
-        expiring_products = get_expiring_products(db)
-        for product in expiring_products:
-            days_left = (product.expiry_date - date.today()).days
-            message = (
-                f"⚠️ UYARI: {product.name} ürününün son kullanma tarihine {days_left} gün kaldı!\n"
-                f"Son Kullanma Tarihi: {product.expiry_date}\n"
-                f"Kategori: {product.category or 'Belirtilmemiş'}"
-            )
-            await bot.send_message(chat_id=product.user.telegram_id, text=message)
-    finally:
-        db.close()
-
-def setup_scheduler(bot):
-    scheduler = BackgroundScheduler()
-    
-    # Her gün sabah 9'da kontrol et
-    scheduler.add_job(
-        lambda: check_expiring_products(bot),
-        trigger=CronTrigger(hour=9, minute=0),
-        id='check_expiring_products',
-        name='Check products expiring soon',
-        replace_existing=True
-    )
-    
-    scheduler.start()
-    return scheduler 
\ No newline at end of file
+import os
+import logging
+from time import perf_counter
+from datetime import date, datetime, time, timedelta
+from itertools import groupby
+from zoneinfo import ZoneInfo
+from dotenv import load_dotenv
+from database import iter_due_reminders, mark_products_notified, add_failed_notification, archive_expired_products, get_unscheduled_users, get_due_users, set_next_reminders, claim_due_users
+from async_database import run_db, stream_db
+from notifier import NotificationDispatcher
+from leases import ShardLeases
+import metrics
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Varsayılan günlük hatırlatma saati (HH:MM) ve saat dilimi; kullanıcılar /saat ile kendi saatlerini seçebilir
+REMINDER_TIME = os.getenv('REMINDER_TIME', '09:00')
+REMINDER_TIMEZONE = os.getenv('REMINDER_TIMEZONE', 'Europe/Istanbul')
+# Saat seçmemiş kullanıcılar REMINDER_TIME'dan başlayan bu uzunluktaki (dakika) pencereye
+# kullanıcı id'sine göre dağıtılır; böylece herkes aynı dakikada taranmaz. 0 dağıtmayı kapatır.
+REMINDER_SPREAD_MINUTES = int(os.getenv('REMINDER_SPREAD_MINUTES', 120))
+# Zamanlayıcı her REMINDER_TICK_SECONDS saniyede bir zamanı gelen kullanıcıları
+# REMINDER_TICK_USERS'lık gruplar halinde işler
+REMINDER_TICK_SECONDS = int(os.getenv('REMINDER_TICK_SECONDS', 60))
+REMINDER_TICK_USERS = int(os.getenv('REMINDER_TICK_USERS', 200))
+REMINDER_DAYS = int(os.getenv('REMINDER_DAYS', 7))
+REMINDER_BATCH_SIZE = int(os.getenv('REMINDER_BATCH_SIZE', 500))
+# Geçmiş ürünlerin kaç gün geriye kadar taranacağı (bot bu kadar gün kapalı kalsa da bildirim kaçmaz)
+REMINDER_EXPIRED_LOOKBACK_DAYS = int(os.getenv('REMINDER_EXPIRED_LOOKBACK_DAYS', 3))
+# Deftere tek sorguda yazılan en fazla kayıt sayısı
+REMINDER_MARK_CHUNK = 500
+
+# Arşivleme: SKT'si ARCHIVE_AFTER_DAYS günden uzun süre önce geçmiş ürünler her gün ARCHIVE_TIME'da
+# products_archive tablosuna taşınır (ARCHIVE_MODE=purge ise silinir). 0 arşivlemeyi kapatır.
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', 30))
+ARCHIVE_MODE = os.getenv('ARCHIVE_MODE', 'archive').lower()
+ARCHIVE_TIME = os.getenv('ARCHIVE_TIME', '03:30')
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', 500))
+
+# Telegram mesaj uzunluğu sınırı
+MAX_MESSAGE_LENGTH = 4096
+
+UTC = ZoneInfo('UTC')
+
+def utcnow():
+    # next_reminder_at saat dilimi bilgisi olmadan UTC olarak saklanır
+    return datetime.now(UTC).replace(tzinfo=None)
+
+def parse_reminder_time(value):
+    # 'HH:MM' ya da 'H.MM' -> 'HH:MM'; geçersizse ValueError
+    hour, minute = (int(part) for part in value.strip().replace('.', ':').split(':'))
+    return time(hour=hour, minute=minute).strftime('%H:%M')
+
+def next_reminder_at(user_id, reminder_time=None, timezone=None, after=None):
+    # after (UTC) anından sonraki ilk hatırlatma zamanı, UTC olarak
+    zone = ZoneInfo(timezone or REMINDER_TIMEZONE)
+    offset = 0
+    if not reminder_time:
+        reminder_time = REMINDER_TIME
+        offset = user_id % REMINDER_SPREAD_MINUTES if REMINDER_SPREAD_MINUTES > 0 else 0
+    hour, minute = (int(part) for part in reminder_time.split(':'))
+    local_after = (after or utcnow()).replace(tzinfo=UTC).astimezone(zone)
+    day = local_after.date()
+    while True:
+        candidate = datetime.combine(day, time(hour=hour, minute=minute), tzinfo=zone) + timedelta(minutes=offset)
+        if candidate > local_after:
+            return candidate.astimezone(UTC).replace(tzinfo=None)
+        day += timedelta(days=1)
+
+def format_reminder_line(row, today):
+    days_left = (row.expiry_date - today).days
+    if days_left < 0:
+        durum = "SKT GEÇMİŞ!"
+    elif days_left == 0:
+        durum = "SKT bugün!"
+    else:
+        durum = f"{days_left} gün kaldı"
+    status = "🟡" if days_left > 0 else "🔴"
+    category = f" [{row.category}]" if row.category else ""
+    return f"{status} {row.name}{category}\nSKT: {row.expiry_date.strftime('%d.%m.%Y')} ({durum})"
+
+def split_message(header, lines, limit=MAX_MESSAGE_LENGTH):
+    # Satırları bölmeden, her biri limit'i aşmayan mesajlara paylaştır
+    messages = []
+    current = header
+    for line in lines:
+        line = line[:limit - len(header) - 2]
+        if len(current) + len(line) + 2 > limit:
+            messages.append(current.rstrip())
+            current = header
+        current += line + "\n\n"
+    messages.append(current.rstrip())
+    return messages
+
+def iter_reminder_digests(db, days=REMINDER_DAYS, today=None, batch_size=REMINDER_BATCH_SIZE,
+                          lookback_days=REMINDER_EXPIRED_LOOKBACK_DAYS, user_ids=None):
+    # Kullanıcı başına tek özet: (telegram_id, mesaj parçaları, [(ürün id, aşama), ...]).
+    # Yalnızca yeni bir aşamaya geçen ürünler okunur; bellekte yalnızca o anki kullanıcının ürünleri tutulur.
+    today = today or date.today()
+    rows = iter_due_reminders(db, days, today, lookback_days, batch_size, user_ids)
+    for telegram_id, user_rows in groupby(rows, key=lambda row: row.telegram_id):
+        user_rows = list(user_rows)
+        lines = [format_reminder_line(row, today) for row in user_rows]
+        header = f"⚠️ SKT Hatırlatması: {len(lines)} ürününüzün son kullanma tarihi yaklaştı\n\n"
+        yield telegram_id, split_message(header, lines), [(row.id, row.stage) for row in user_rows]
+
+async def record_dead_letter(notification, error):
+    await run_db(add_failed_notification, notification.chat_id, notification.text, str(error), notification.attempts)
+
+async def check_expiring_products(bot, today=None, days=REMINDER_DAYS, user_ids=None):
+    # bot: send_message metodu olan herhangi bir nesne (testlerde sahte bot kullanılabilir)
+    # today: sabit tarih vererek saat dondurulabilir
+    # user_ids: yalnızca bu kullanıcılar taranır (None: tüm kullanıcılar)
+    started_at = datetime.now()
+    started = perf_counter()
+    scanned = users = 0
+    # chat_id -> [gönderilmeyi bekleyen parça sayısı, [(ürün id, aşama), ...]]
+    pending = {}
+    notified = []
+
+    async def on_sent(notification):
+        # Ürünler ancak özetin tüm parçaları iletildiğinde deftere işlenir
+        digest = pending.get(notification.tag)
+        if digest is None:
+            return
+        digest[0] -= 1
+        if digest[0] == 0:
+            notified.extend(pending.pop(notification.tag)[1])
+
+    async def on_dead_letter(notification, error):
+        # İletilemeyen özetin ürünleri işaretlenmez; sonraki hatırlatmada tekrar gönderilir
+        pending.pop(notification.tag, None)
+        await record_dead_letter(notification, error)
+
+    # Mesajlar hız sınırlarına uyan eşzamanlı göndericilerle iletilir;
+    # dolu kuyruk okumayı da yavaşlattığı için bellek kullanımı sabit kalır
+    dispatcher = NotificationDispatcher(bot, on_dead_letter=on_dead_letter, on_sent=on_sent)
+    async with dispatcher:
+        async for chat_id, messages, product_stages in stream_db(iter_reminder_digests, days, today, user_ids=user_ids):
+            scanned += len(product_stages)
+            users += 1
+            pending[chat_id] = [len(messages), product_stages]
+            for message in messages:
+                await dispatcher.enqueue(chat_id, message, tag=chat_id)
+
+    # Defter okuma akışı kapandıktan sonra yazılır (SQLite okurken yazmaya izin vermez).
+    # Yalnızca iletildiği doğrulanan bildirimler işaretlenir.
+    for i in range(0, len(notified), REMINDER_MARK_CHUNK):
+        await run_db(mark_products_notified, notified[i:i + REMINDER_MARK_CHUNK])
+
+    stats = {
+        'started_at': started_at.isoformat(timespec='seconds'),
+        'duration': round(perf_counter() - started, 3),
+        'scanned': scanned,
+        'users': users,
+        'sent': dispatcher.stats['sent'],
+        'retried': dispatcher.stats['retried'],
+        'failed': dispatcher.stats['dead'],
+    }
+    metrics.REMINDER_RUNS.inc()
+    metrics.REMINDER_RUN_SECONDS.observe(stats['duration'])
+    metrics.REMINDER_PRODUCTS.inc(amount=scanned)
+    for result in ('sent', 'retried', 'failed'):
+        metrics.REMINDER_MESSAGES.inc(result, amount=stats[result])
+    logger.info(f"Hatırlatma taraması tamamlandı: {stats}")
+    return stats
+
+async def schedule_new_users(now, batch_size=REMINDER_TICK_USERS, shard_count=1, shards=None):
+    # Hatırlatma zamanı boş olan kullanıcılara (yeni kayıtlar, sütun sonradan eklendiyse eski kullanıcılar) zaman ata
+    scheduled = 0
+    while True:
+        users = await run_db(get_unscheduled_users, batch_size, shard_count, shards)
+        if not users:
+            return scheduled
+        scheduled += await run_db(set_next_reminders, [
+            (user.id, next_reminder_at(user.id, user.reminder_time, user.timezone, now)) for user in users
+        ])
+
+async def send_due_reminders(bot, now=None, batch_size=REMINDER_TICK_USERS, leases=None):
+    # Her turda yalnızca next_reminder_at'i gelmiş kullanıcılar batch_size'lık gruplarla taranır.
+    # SKT aşamaları kullanıcının kendi saat dilimindeki tarihe göre hesaplanır.
+    # leases verilirse yalnızca bu sürecin kiraladığı parçalardaki kullanıcılar işlenir.
+    now = now or utcnow()
+    started_at = datetime.now()
+    started = perf_counter()
+    stats = {'scheduled': 0, 'users': 0, 'scanned': 0, 'sent': 0, 'retried': 0, 'failed': 0}
+    shard_count, shards = 1, None
+    if leases is not None:
+        shard_count, shards = leases.shard_count, list(leases.owned)
+        stats['shards'] = shards
+        if not shards:
+            return stats
+
+    stats['scheduled'] = await schedule_new_users(now, batch_size, shard_count, shards)
+    while True:
+        users = await run_db(get_due_users, now, batch_size, shard_count, shards)
+        if not users:
+            break
+
+        # Kullanıcılar göndermeden önce bir sonraki zamana ilerletilerek sahiplenilir; kira el
+        # değiştirdiyse aynı kullanıcıyı okuyan diğer süreç onu alamaz. Yarıda kalan turun
+        # kullanıcıları ertesi gün, bildirilmemiş aşamalarıyla birlikte hatırlatılır.
+        claimed = set(await run_db(claim_due_users, [
+            (user.id, user.next_reminder_at, next_reminder_at(user.id, user.reminder_time, user.timezone, now))
+            for user in users
+        ]))
+
+        zones = {}
+        for user in users:
+            if user.id in claimed:
+                zones.setdefault(user.timezone or REMINDER_TIMEZONE, []).append(user.id)
+        for zone, user_ids in zones.items():
+            today = now.replace(tzinfo=UTC).astimezone(ZoneInfo(zone)).date()
+            run = await check_expiring_products(bot, today=today, user_ids=user_ids)
+            for key in ('scanned', 'sent', 'retried', 'failed'):
+                stats[key] += run[key]
+
+        stats['users'] += len(claimed)
+        if len(users) < batch_size:
+            break
+
+    stats['started_at'] = started_at.isoformat(timespec='seconds')
+    stats['duration'] = round(perf_counter() - started, 3)
+    return stats
+
+async def lease_job(context):
+    leases = context.bot_data['shard_leases']
+    previous = leases.owned
+    owned = await leases.refresh()
+    if owned != previous:
+        logger.info(f"Hatırlatma parçaları: {owned} / {leases.shard_count} ({leases.replica_id})")
+
+async def reminder_job(context):
+    stats = await send_due_reminders(context.bot, leases=context.bot_data['shard_leases'])
+    if stats['users']:
+        context.bot_data['last_reminder_run'] = stats
+
+async def archive_expired_products_job(today=None, after_days=ARCHIVE_AFTER_DAYS, batch_size=ARCHIVE_BATCH_SIZE,
+                                      purge=ARCHIVE_MODE == 'purge'):
+    # Her parça ayrı bir kısa işlemdir; tablo uzun süre kilitli kalmaz ve
+    # parçalar arasında botun diğer veritabanı işleri araya girebilir
+    started_at = datetime.now()
+    started = perf_counter()
+    before = (today or date.today()) - timedelta(days=after_days)
+    moved = chunks = 0
+    while True:
+        count = await run_db(archive_expired_products, before, batch_size, purge)
+        moved += count
+        chunks += 1
+        if count < batch_size:
+            break
+
+    stats = {
+        'started_at': started_at.isoformat(timespec='seconds'),
+        'duration': round(perf_counter() - started, 3),
+        'mode': 'purge' if purge else 'archive',
+        'before': before.isoformat(),
+        'moved': moved,
+        'chunks': chunks,
+    }
+    metrics.ARCHIVE_PRODUCTS.inc(stats['mode'], amount=moved)
+    metrics.ARCHIVE_RUN_SECONDS.observe(stats['duration'])
+    logger.info(f"Arşivleme tamamlandı: {stats}")
+    return stats
+
+async def archive_job(context):
+    # Birden fazla süreç varsa arşivlemeyi yalnızca 0. parçanın sahibi yapar
+    if 0 not in context.bot_data['shard_leases'].owned:
+        return
+    context.bot_data['last_archive_run'] = await archive_expired_products_job()
+
+def parse_time(value, timezone=REMINDER_TIMEZONE):
+    hour, minute = (int(part) for part in value.split(':'))
+    return time(hour=hour, minute=minute, tzinfo=ZoneInfo(timezone))
+
+def setup_scheduler(application):
+    # Zamanlanmış görevler botun kendi event loop'unda ve HTTP bağlantı havuzunda çalışır.
+    # Hatırlatmalar gün içine yayılır: her turda yalnızca zamanı gelen kullanıcılar işlenir.
+    # Kullanıcılar parçalara bölünür; her süreç yalnızca kiraladığı parçaları işler.
+    leases = application.bot_data['shard_leases'] = ShardLeases()
+    lease_interval = max(1, leases.lease_seconds // 3)
+    application.job_queue.run_once(lease_job, 0, name='claim_shard_leases')
+    application.job_queue.run_repeating(lease_job, interval=lease_interval, first=lease_interval, name='renew_shard_leases')
+    job = application.job_queue.run_repeating(
+        reminder_job,
+        interval=REMINDER_TICK_SECONDS,
+        first=REMINDER_TICK_SECONDS,
+        name='send_due_reminders'
+    )
+
+    # Hatırlatmalardan ayrı, yoğun olmayan bir saatte eski ürünleri arşivle
+    if ARCHIVE_AFTER_DAYS > 0:
+        application.job_queue.run_daily(archive_job, time=parse_time(ARCHIVE_TIME), name='archive_expired_products')
+    return job
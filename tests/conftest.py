@@ -0,0 +1,46 @@
+import os
+import sys
+import tempfile
+
+# Modüller depo kökünde; testler geçici bir SQLite veritabanı kullanır.
+# Ayarlar modüller içe aktarılmadan önce yapılmalı.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', '1:test')
+
+import pytest
+
+@pytest.fixture
+def db():
+    # Her test boş tablolarla başlar
+    import database
+    database.init_db()
+    session = database.SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        with database.engine.begin() as conn:
+            for table in reversed(database.Base.metadata.sorted_tables):
+                conn.execute(table.delete())
+
+class FakeBot:
+    # send_message'ı kaydeden sahte bot; blocked'taki sohbetler botu engellemiş gibi davranır
+    def __init__(self, blocked=()):
+        self.sent = []
+        self.blocked = set(blocked)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        from telegram.error import Forbidden
+        if chat_id in self.blocked:
+            raise Forbidden("bot was blocked by the user")
+        self.sent.append((chat_id, text))
+
+def add_user(db, telegram_id):
+    import database
+    return database.get_or_create_user(db, telegram_id, f'user{telegram_id}')
+
+def add_product(db, user_id, name, expiry_date):
+    import database
+    return database.add_product(db, user_id, name, expiry_date).id
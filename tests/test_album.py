@@ -0,0 +1,53 @@
+import asyncio
+import logging
+from concurrent.futures.process import BrokenProcessPool
+from types import SimpleNamespace
+
+import bot
+from ocr_executor import OCRQueueFull
+
+class FakeFile:
+    async def download_as_bytearray(self):
+        return bytearray(b'photo')
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def get_file(self, file_id):
+        if file_id == 'missing':
+            raise OSError("download failed")
+        return FakeFile()
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append(text)
+
+def test_album_reports_busy_and_failed_photos(monkeypatch, caplog):
+    async def recognize_photo(image_bytes, request_id):
+        message_id = int(request_id.split('_')[1])
+        if message_id == 3:
+            raise OCRQueueFull()
+        if message_id == 4:
+            raise BrokenProcessPool("worker died")
+        return 'hash', [{'date_str': '01.02.2027'}] if message_id == 1 else []
+    monkeypatch.setattr(bot, 'recognize_photo', recognize_photo)
+
+    photos = [(1, 'a'), (2, 'b'), (3, 'c'), (4, 'd'), (5, 'missing')]
+    context = SimpleNamespace(
+        bot=FakeBot(),
+        user_data={'album': {'media_group_id': 'g', 'photos': photos}},
+        job=SimpleNamespace(data='g', chat_id=42),
+    )
+    with caplog.at_level(logging.ERROR, logger='bot'):
+        asyncio.run(bot.process_album(context))
+
+    [text] = context.bot.sent
+    assert "1. 01.02.2027" in text
+    assert "2. ❓ tarih bulunamadı" in text
+    assert "3. ⏳ yoğunluk nedeniyle okunamadı" in text
+    assert "4. ⚠️ fotoğraf işlenemedi" in text
+    assert "5. ⚠️ fotoğraf işlenemedi" in text
+    assert context.user_data['album']['items'] == ['01.02.2027', None, None, None, None]
+    # Hatalar ayrıntılarıyla kaydedilir
+    errors = [record for record in caplog.records if record.levelno == logging.ERROR]
+    assert [record.exc_info[0] for record in errors] == [BrokenProcessPool, OSError]
@@ -0,0 +1,40 @@
+import asyncio
+from datetime import date
+
+import database
+import scheduler
+from conftest import add_user, add_product
+
+TODAY = date(2026, 3, 10)
+
+def test_archive_survives_reused_product_ids(db):
+    user_id = add_user(db, 100)
+    first = add_product(db, user_id, 'Süt', date(2026, 1, 1))
+    assert asyncio.run(scheduler.archive_expired_products_job(today=TODAY))['moved'] == 1
+
+    # products boşalınca SQLite aynı id'yi tekrar verir
+    second = add_product(db, user_id, 'Yoğurt', date(2026, 1, 2))
+    assert second == first
+    assert asyncio.run(scheduler.archive_expired_products_job(today=TODAY))['moved'] == 1
+
+    archived = database.get_user_archive(db, user_id)
+    assert [(row.name, row.product_id) for row in archived] == [('Yoğurt', first), ('Süt', first)]
+    assert len({row.id for row in archived}) == 2
+
+def test_migrate_old_archive_table(db):
+    with database.engine.begin() as conn:
+        conn.execute(database.text("DROP TABLE products_archive"))
+        conn.execute(database.text(
+            "CREATE TABLE products_archive (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL, expiry_date DATE NOT NULL, "
+            "category VARCHAR, description VARCHAR, created_at DATETIME, user_id INTEGER, archived_at DATETIME)"
+        ))
+        conn.execute(database.text(
+            "INSERT INTO products_archive (id, name, expiry_date) VALUES (7, 'Eski', '2025-01-01')"
+        ))
+    database.migrate_db()
+
+    user_id = add_user(db, 100)
+    product_id = add_product(db, user_id, 'Süt', date(2026, 1, 1))
+    database.archive_expired_products(db, TODAY)
+    rows = db.query(database.ProductArchive).order_by(database.ProductArchive.id).all()
+    assert [(row.id, row.product_id, row.name) for row in rows] == [(7, 7, 'Eski'), (8, product_id, 'Süt')]
@@ -0,0 +1,65 @@
+from date_extractor import DateExtractor, date_extractor
+
+def kinds(text):
+    return [(c['kind'], c['date_str']) for c in date_extractor.extract(text)]
+
+def test_production_group():
+    [candidate] = date_extractor.extract("Üretim: 01.02.2024 Parti 12 SKT: 01.02.2026")
+    assert candidate['kind'] == 'production'
+    assert candidate['date_str'] == '01.02.2026'
+    assert candidate['production_date'] == '01.02.2024'
+    assert candidate['confidence'] == 1.5
+
+def test_production_accepts_ascii_ocr_output():
+    assert kinds("URETIM: 01.02.2024 S.K.T. 01/02/26") == [('production', '01.02.2026')]
+
+def test_anchored_group():
+    assert kinds("SKT: 15.03.2026") == [('anchored', '15.03.2026')]
+    assert kinds("S.K.T 15/03/26") == [('anchored', '15.03.2026')]
+    assert kinds("Son Kullanma Tarihi: 15 . 03 . 2026") == [('anchored', '15.03.2026')]
+
+def test_month_name_group():
+    assert kinds("TETT 12 OCAK 2026") == [('month_name', '12.01.2026')]
+    assert kinds("5 ŞUB. 27") == [('month_name', '05.02.2027')]
+    # OCR Türkçe karakterleri ASCII okuyabilir
+    assert kinds("3 AGUSTOS 2026") == [('month_name', '03.08.2026')]
+    assert kinds("3 nisan 2026") == [('month_name', '03.04.2026')]
+
+def test_generic_group():
+    assert kinds("01.01.2026") == [('generic', '01.01.2026')]
+    assert kinds("01/01/26") == [('generic', '01.01.2026')]
+    assert kinds("01 / 01 / 2026") == [('generic', '01.01.2026')]
+
+def test_priority_between_groups():
+    # Aynı tarih farklı biçimlerde geçerse en güvenilir biçim tutulur
+    [candidate] = date_extractor.extract("01.05.2026\nSKT: 01.05.2026")
+    assert candidate['kind'] == 'anchored'
+    # Farklı tarihler güven skoruna göre sıralanır
+    text = "Parti 10.10.2025\n12 MAYIS 2026\nSKT: 01.06.2026"
+    assert kinds(text) == [('anchored', '01.06.2026'), ('month_name', '12.05.2026'), ('generic', '10.10.2025')]
+
+def test_matches_stay_on_one_line():
+    assert kinds("01.\n02.2026") == []
+
+def test_invalid_dates_are_rejected():
+    assert date_extractor.extract("SKT: 31.02.2026") == []
+    assert date_extractor.extract("32.01.2026") == []
+    assert date_extractor.extract("01.13.2026") == []
+    assert date_extractor.extract("30 OCAKK 2026 10 XYZ 2026") == []
+
+def test_year_bounds():
+    assert date_extractor.extract("01.01.1999") == []
+    extractor = DateExtractor(min_year=2020, max_year=2030)
+    assert extractor.extract("01.01.2031") == []
+    assert extractor.best("01.01.2025")['date_str'] == '01.01.2025'
+
+def test_candidate_keeps_source_line():
+    [candidate] = date_extractor.extract("MARKA\n  SKT: 15.03.2026 LOT 4  \nTR")
+    assert candidate['line'] == 'SKT: 15.03.2026 LOT 4'
+
+def test_best_selection():
+    assert date_extractor.best("") is None
+    assert date_extractor.best("metin yok") is None
+    assert date_extractor.best("10.10.2025 ve 12 MAYIS 2026")['date_str'] == '12.05.2026'
+    # Eşit güvende metinde önce geçen seçilir
+    assert date_extractor.best("10.10.2025 11.11.2026")['date_str'] == '10.10.2025'
@@ -0,0 +1,105 @@
+from datetime import date
+
+import pytest
+
+import importer
+from conftest import add_user
+from database import Product
+from importer import ImportFileError, import_products
+
+def products(db, user_id):
+    db.expire_all()
+    return [(p.name, p.expiry_date, p.category, p.description)
+            for p in db.query(Product).filter(Product.user_id == user_id).order_by(Product.id)]
+
+def test_header_aliases_in_any_order(db):
+    user_id = add_user(db, 100)
+    data = "Kategori,SKT,Ürün Adı,Açıklama\nSüt ürünü,01.02.2027,Süt,1 litre\n".encode()
+
+    assert import_products(db, user_id, data, 'urunler.csv') == (1, [])
+    assert products(db, user_id) == [('Süt', date(2027, 2, 1), 'Süt ürünü', '1 litre')]
+
+def test_default_columns_without_header(db):
+    user_id = add_user(db, 100)
+    data = b"Peynir,2027-03-04\nYogurt,05/06/27,Sut\n"
+
+    imported, rejected = import_products(db, user_id, data, 'urunler.csv')
+
+    assert (imported, rejected) == (1, [(2, "geçersiz tarih '05/06/27'")])
+    assert products(db, user_id) == [('Peynir', date(2027, 3, 4), None, None)]
+
+def test_semicolon_delimiter_and_cp1254(db):
+    user_id = add_user(db, 100)
+    # Türkçe Excel'in CSV çıktısı
+    data = "Ürün;SKT;Kategori\nŞeker;01.01.2027;Kuru gıda\nÇay;02.01.2027;İçecek\n".encode('cp1254')
+
+    assert import_products(db, user_id, data, 'excel.csv') == (2, [])
+    assert [row[0] for row in products(db, user_id)] == ['Şeker', 'Çay']
+    assert products(db, user_id)[1][2] == 'İçecek'
+
+def test_rejected_rows_are_reported_with_line_numbers(db):
+    user_id = add_user(db, 100)
+    data = (
+        "ad,skt\n"
+        "Süt,01.02.2027\n"
+        ",01.02.2027\n"
+        "Peynir,\n"
+        "\n"
+        "Yoğurt,31.02.2027\n"
+        + "x" * 201 + ",01.02.2027\n"
+    ).encode()
+
+    imported, rejected = import_products(db, user_id, data, 'urunler.csv')
+
+    assert imported == 1
+    assert rejected == [
+        (3, "ürün adı boş"),
+        (4, "SKT boş"),
+        (6, "geçersiz tarih '31.02.2027'"),
+        (7, "ürün adı 200 karakterden uzun"),
+    ]
+
+def test_batch_boundary(db, monkeypatch):
+    user_id = add_user(db, 100)
+    batches = []
+    bulk_add_products = importer.bulk_add_products
+    def recording_bulk_add(db, user_id, batch, commit=True):
+        batches.append(len(batch))
+        return bulk_add_products(db, user_id, batch, commit)
+    monkeypatch.setattr(importer, 'bulk_add_products', recording_bulk_add)
+    data = "".join(f"Ürün {i},01.02.2027\n" for i in range(7)).encode()
+
+    assert import_products(db, user_id, data, 'urunler.csv', batch_size=3) == (7, [])
+    assert batches == [3, 3, 1]
+    assert len(products(db, user_id)) == 7
+
+def test_max_rows(db):
+    user_id = add_user(db, 100)
+    data = ("ad,skt\n" + "".join(f"Ürün {i},01.02.2027\n" for i in range(5))).encode()
+
+    imported, rejected = import_products(db, user_id, data, 'urunler.csv', max_rows=3)
+
+    assert imported == 3
+    assert rejected == [(5, "satır sınırı (3) aşıldı, kalan satırlar okunmadı")]
+
+def test_failure_rolls_back_earlier_batches(db, monkeypatch):
+    user_id = add_user(db, 100)
+    bulk_add_products = importer.bulk_add_products
+    calls = []
+    def failing_bulk_add(db, user_id, batch, commit=True):
+        calls.append(len(batch))
+        if len(calls) == 2:
+            raise RuntimeError("disk full")
+        return bulk_add_products(db, user_id, batch, commit)
+    monkeypatch.setattr(importer, 'bulk_add_products', failing_bulk_add)
+    data = "".join(f"Ürün {i},01.02.2027\n" for i in range(5)).encode()
+
+    with pytest.raises(RuntimeError):
+        import_products(db, user_id, data, 'urunler.csv', batch_size=2)
+
+    # İlk parça da geri alınır; dosya tekrar gönderildiğinde ürünler çiftlenmez
+    assert products(db, user_id) == []
+
+def test_unsupported_file_type(db):
+    with pytest.raises(ImportFileError):
+        import_products(db, add_user(db, 100), b"...", 'urunler.pdf')
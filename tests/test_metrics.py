@@ -0,0 +1,171 @@
+import socket
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from telegram.ext import CommandHandler, ConversationHandler, MessageHandler, filters
+
+import metrics
+from metrics import Registry, Counter, Gauge, Histogram
+
+def test_counter_and_gauge():
+    registry = Registry()
+    counter = Counter('c_total', "Sayaç", ['result'], registry=registry)
+    counter.inc('ok')
+    counter.inc('ok', amount=2)
+    counter.inc('error')
+    assert counter.value('ok') == 3
+    assert counter.value('error') == 1
+    assert counter.value('missing') == 0
+    assert counter.labels() == [('error',), ('ok',)]
+
+    gauge = Gauge('g', "Gösterge", registry=registry)
+    gauge.set(5)
+    assert gauge.value() == 5
+    gauge.set_function(lambda: 7)
+    assert gauge.value() == 7
+
+def test_histogram_buckets():
+    histogram = Histogram('h_seconds', "Süre", buckets=(1, 2, 5), registry=Registry())
+    for value in (0.5, 1, 1.5, 3, 10):
+        histogram.observe(value)
+    counts, total, count = histogram.snapshot()
+    # Üst sınıra eşit değer o kovaya düşer; sınırın üstündekiler +Inf kovasına
+    assert counts == [2, 1, 1, 1]
+    assert total == 16.0
+    assert count == 5
+    assert histogram.snapshot('yok') == ([0, 0, 0, 0], 0.0, 0)
+
+def test_histogram_quantile():
+    histogram = Histogram('h_seconds', "Süre", buckets=(1, 2, 4), registry=Registry())
+    assert histogram.quantile(0.5) is None
+    for value in (0.5, 0.5, 1.5, 1.5):
+        histogram.observe(value)
+    # Kova içinde doğrusal ara değer
+    assert histogram.quantile(0.5) == pytest.approx(1.0)
+    assert histogram.quantile(0.75) == pytest.approx(1.5)
+    assert histogram.quantile(0.25) == pytest.approx(0.5)
+
+    histogram.observe(100)
+    # +Inf kovasındaki değerler için son sınır döner
+    assert histogram.quantile(1.0) == 4.0
+
+def test_histogram_time():
+    histogram = Histogram('h_seconds', "Süre", registry=Registry())
+    with pytest.raises(RuntimeError):
+        with histogram.time('op'):
+            raise RuntimeError
+    assert histogram.snapshot('op')[2] == 1
+
+def test_render_exposition_format():
+    registry = Registry()
+    counter = Counter('requests_total', "İstekler", ['path'], registry=registry)
+    counter.inc('a"b\\c\nd')
+    Gauge('uptime_seconds', "Çalışma süresi", func=lambda: 1.5, registry=registry)
+    histogram = Histogram('duration_seconds', "Süre", ['op'], buckets=(0.1, 1), registry=registry)
+    histogram.observe(0.05, 'read')
+    histogram.observe(2, 'read')
+
+    assert registry.render() == (
+        '# HELP requests_total İstekler\n'
+        '# TYPE requests_total counter\n'
+        'requests_total{path="a\\"b\\\\c\\nd"} 1\n'
+        '# HELP uptime_seconds Çalışma süresi\n'
+        '# TYPE uptime_seconds gauge\n'
+        'uptime_seconds 1.5\n'
+        '# HELP duration_seconds Süre\n'
+        '# TYPE duration_seconds histogram\n'
+        'duration_seconds_bucket{op="read",le="0.1"} 1\n'
+        'duration_seconds_bucket{op="read",le="1.0"} 1\n'
+        'duration_seconds_bucket{op="read",le="+Inf"} 2\n'
+        'duration_seconds_sum{op="read"} 2.05\n'
+        'duration_seconds_count{op="read"} 2\n'
+    )
+
+def test_statement_operation():
+    assert metrics.statement_operation('  select 1') == 'SELECT'
+    assert metrics.statement_operation('WITH x AS (SELECT 1) SELECT * FROM x') == 'WITH'
+    assert metrics.statement_operation('PRAGMA foreign_keys=ON') == 'OTHER'
+
+def test_instrument_engine():
+    engine = create_engine('sqlite://')
+    metrics.instrument_engine(engine)
+    selects = metrics.DB_QUERY_SECONDS.snapshot('SELECT')[2]
+    errors = metrics.DB_ERRORS.value('OperationalError')
+
+    with engine.connect() as conn:
+        conn.execute(text('SELECT 1'))
+        with pytest.raises(OperationalError):
+            conn.execute(text('SELECT * FROM yok'))
+        # Hatalı sorgunun başlangıç zamanı yığında kalmaz
+        assert conn.info['query_started'] == []
+
+    assert metrics.DB_QUERY_SECONDS.snapshot('SELECT')[2] == selects + 1
+    assert metrics.DB_ERRORS.value('OperationalError') == errors + 1
+
+def test_instrument_handlers():
+    async def ok_command(update, context):
+        return 'ok'
+
+    async def broken_command(update, context):
+        raise ValueError
+
+    conversation = ConversationHandler(
+        entry_points=[CommandHandler('ok', ok_command)],
+        states={0: [MessageHandler(filters.TEXT, broken_command)]},
+        fallbacks=[],
+    )
+    application = SimpleNamespace(handlers={0: [conversation]})
+    metrics.instrument_handlers(application)
+    # İkinci çağrı callback'i yeniden sarmaz
+    metrics.instrument_handlers(application)
+
+    ok_handler = conversation.entry_points[0]
+    broken_handler = conversation.states[0][0]
+    assert ok_handler.callback.instrumented
+
+    ok_calls = metrics.HANDLER_SECONDS.snapshot('ok_command')[2]
+    broken_calls = metrics.HANDLER_SECONDS.snapshot('broken_command')[2]
+    broken_errors = metrics.HANDLER_ERRORS.value('broken_command')
+
+    assert asyncio.run(ok_handler.callback(None, None)) == 'ok'
+    with pytest.raises(ValueError):
+        asyncio.run(broken_handler.callback(None, None))
+
+    assert metrics.HANDLER_SECONDS.snapshot('ok_command')[2] == ok_calls + 1
+    assert metrics.HANDLER_SECONDS.snapshot('broken_command')[2] == broken_calls + 1
+    assert metrics.HANDLER_ERRORS.value('broken_command') == broken_errors + 1
+    assert metrics.HANDLER_ERRORS.value('ok_command') == 0
+
+def unused_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+async def fetch(port, path):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    return head.decode().split('\r\n')[0], body.decode()
+
+def test_metrics_server():
+    async def run():
+        assert await metrics.start_metrics_server(0) is None
+        port = unused_port()
+        server = await metrics.start_metrics_server(port, '127.0.0.1')
+        try:
+            return await fetch(port, '/metrics'), await fetch(port, '/yok')
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    (status, body), (missing_status, _) = asyncio.run(run())
+    assert status == 'HTTP/1.1 200 OK'
+    assert '# TYPE bot_uptime_seconds gauge' in body
+    assert '# TYPE bot_handler_duration_seconds histogram' in body
+    assert missing_status == 'HTTP/1.1 404 Not Found'
@@ -0,0 +1,132 @@
+import asyncio
+import heapq
+import itertools
+
+from telegram.error import RetryAfter, ChatMigrated, Forbidden, NetworkError
+
+from notifier import NotificationDispatcher
+
+class FakeClock:
+    # Sanal saat: sleep() beklemeleri sıraya koyar, run() tüm görevler beklemeye geçince
+    # saati en yakın uyanma anına ilerletir. Gerçek saat gibi her bekleme en az 1 µs sürer;
+    # yoksa kayan nokta yuvarlaması TokenBucket'ı aynı anda sonsuza kadar bekletebilir.
+    def __init__(self):
+        self.now = 0.0
+        self._sleepers = []
+        self._order = itertools.count()
+
+    def time(self):
+        return self.now
+
+    async def sleep(self, delay):
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._sleepers, (self.now + max(1e-6, delay), next(self._order), future))
+        await future
+
+    async def _settle(self):
+        for _ in range(100):
+            await asyncio.sleep(0)
+
+    def run(self, coro):
+        async def main():
+            task = asyncio.ensure_future(coro)
+            while True:
+                await self._settle()
+                if task.done():
+                    return task.result()
+                assert self._sleepers, "görevler sanal saat dışında bir şey bekliyor"
+                wake, _, future = heapq.heappop(self._sleepers)
+                self.now = max(self.now, wake)
+                future.set_result(None)
+        return asyncio.run(main())
+
+class FakeBot:
+    # Gönderimleri sanal zamanla kaydeder; errors[chat_id] sırayla fırlatılacak hatalar
+    def __init__(self, clock, errors=None):
+        self.clock = clock
+        self.errors = errors or {}
+        self.sent = []
+        self.calls = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.calls.append((self.clock.time(), chat_id))
+        pending = self.errors.get(chat_id)
+        if pending:
+            raise pending.pop(0)
+        self.sent.append((self.clock.time(), chat_id, text))
+
+def dispatch(clock, bot, messages, **kwargs):
+    dead = []
+
+    async def on_dead_letter(notification, error):
+        dead.append((notification.chat_id, type(error).__name__, notification.attempts))
+
+    async def main():
+        dispatcher = NotificationDispatcher(bot, on_dead_letter=on_dead_letter, clock=clock.time, sleep=clock.sleep, **kwargs)
+        async with dispatcher:
+            for chat_id, text in messages:
+                await dispatcher.enqueue(chat_id, text)
+        return dispatcher.stats
+
+    return clock.run(main()), dead
+
+def test_global_rate_limit():
+    clock = FakeClock()
+    bot = FakeBot(clock)
+    stats, dead = dispatch(clock, bot, [(chat_id, 'x') for chat_id in range(100)], global_rate=10, concurrency=8)
+
+    assert stats == {'sent': 100, 'retried': 0, 'dead': 0}
+    times = [t for t, _, _ in bot.sent]
+    # Kapasite 1: herhangi bir 1 saniyelik pencerede en fazla rate + 1 mesaj
+    for start in times:
+        assert sum(1 for t in times if start <= t < start + 1) <= 11
+    assert times[-1] >= 9.8
+
+def test_per_chat_interval():
+    clock = FakeClock()
+    bot = FakeBot(clock)
+    messages = [(chat_id, f'{chat_id}-{i}') for i in range(5) for chat_id in (1, 2)]
+    stats, _ = dispatch(clock, bot, messages, global_rate=1000, per_chat_interval=1.0, concurrency=4)
+
+    assert stats['sent'] == 10
+    for chat_id in (1, 2):
+        times = [t for t, c, _ in bot.sent if c == chat_id]
+        assert all(b - a >= 1.0 - 1e-9 for a, b in zip(times, times[1:]))
+    # Farklı sohbetler birbirini beklemez
+    assert max(t for t, _, _ in bot.sent) < 4.1
+
+def test_retry_after_pauses_all_sends():
+    clock = FakeClock()
+    bot = FakeBot(clock, {1: [RetryAfter(5)]})
+    stats, dead = dispatch(clock, bot, [(1, 'a'), (2, 'b')], global_rate=1000, concurrency=1)
+
+    assert stats == {'sent': 2, 'retried': 1, 'dead': 0}
+    assert dead == []
+    # Tekrar deneme ve sıradaki diğer sohbet bekleme süresi dolmadan gönderilmez
+    assert [c for _, c, _ in bot.sent] == [1, 2]
+    assert all(t >= 5 for t, _, _ in bot.sent)
+
+def test_chat_migrated_resends_to_new_chat():
+    clock = FakeClock()
+    bot = FakeBot(clock, {1: [ChatMigrated(42)]})
+    stats, dead = dispatch(clock, bot, [(1, 'a')])
+
+    assert stats == {'sent': 1, 'retried': 1, 'dead': 0}
+    assert [(c, text) for _, c, text in bot.sent] == [(42, 'a')]
+
+def test_forbidden_is_dead_lettered_without_retry():
+    clock = FakeClock()
+    bot = FakeBot(clock, {1: [Forbidden("bot was blocked by the user")]})
+    stats, dead = dispatch(clock, bot, [(1, 'a'), (2, 'b')])
+
+    assert stats == {'sent': 1, 'retried': 0, 'dead': 1}
+    assert dead == [(1, 'Forbidden', 1)]
+    assert [c for _, c in bot.calls].count(1) == 1
+
+def test_network_errors_retry_until_max_retries():
+    clock = FakeClock()
+    bot = FakeBot(clock, {1: [NetworkError("timeout") for _ in range(10)]})
+    stats, dead = dispatch(clock, bot, [(1, 'a')], max_retries=3)
+
+    assert stats == {'sent': 0, 'retried': 2, 'dead': 1}
+    assert dead == [(1, 'NetworkError', 3)]
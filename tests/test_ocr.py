@@ -0,0 +1,84 @@
+import cv2
+import numpy as np
+import pytest
+
+import ocr
+
+class StubEngine:
+    # Hiçbir şey okumayan motor: her çağrıyı (aşama, kırpıntı) olarak kaydeder
+    def __init__(self, text=''):
+        self.text = text
+        self.calls = []
+
+    def image_to_string(self, image, psm):
+        self.calls.append(image)
+        return self.text
+
+def recording_stages(log):
+    def make(name):
+        def preprocess(crop):
+            marker = (name, crop.shape[:2])
+            log.append(marker)
+            return marker
+        preprocess.__name__ = name
+        return preprocess
+    return [(f'{name}_psm6', make(name), 6) for name in ('s1', 's2', 's3', 's4')]
+
+@pytest.fixture
+def photo(monkeypatch):
+    image = np.full((400, 400, 3), 255, np.uint8)
+    engine = StubEngine()
+    preprocessed = []
+    monkeypatch.setattr(ocr, 'get_engine', lambda: engine)
+    monkeypatch.setattr(ocr, 'OCR_STAGES', recording_stages(preprocessed))
+    monkeypatch.setattr(ocr, 'OCR_MAX_CALLS', 12)
+    monkeypatch.setattr(ocr, 'OCR_FULL_IMAGE_FALLBACK', True)
+    return cv2.imencode('.png', image)[1].tobytes(), engine, preprocessed
+
+def stages_on(calls, shape):
+    return [name for name, crop_shape in calls if crop_shape == shape]
+
+def test_every_stage_and_fallback_run_when_nothing_matches(photo, monkeypatch):
+    image_bytes, engine, _ = photo
+    # Üç küçük bölge: görüntünün küçük bir kısmını kaplar
+    monkeypatch.setattr(ocr, 'find_text_regions', lambda image: [(0, 0, 100, 40), (0, 100, 90, 30), (0, 200, 80, 20)])
+
+    assert ocr.process_image_ocr(image_bytes) == []
+
+    stages = ['s1', 's2', 's3', 's4']
+    assert stages_on(engine.calls, (40, 100)) == stages
+    assert stages_on(engine.calls, (400, 400)) == stages
+    assert len(engine.calls) <= 12
+
+def test_fallback_skipped_when_regions_cover_image(photo, monkeypatch):
+    image_bytes, engine, _ = photo
+    monkeypatch.setattr(ocr, 'find_text_regions', lambda image: [(0, 0, 400, 150), (0, 150, 400, 140), (0, 300, 400, 90)])
+
+    assert ocr.process_image_ocr(image_bytes) == []
+
+    # Bütçe yalnızca bölgelere gider: her aşama her bölgede çalışır, tüm görüntü okunmaz
+    assert len(engine.calls) == 12
+    assert stages_on(engine.calls, (400, 400)) == []
+    for shape in ((150, 400), (140, 400), (90, 400)):
+        assert stages_on(engine.calls, shape) == ['s1', 's2', 's3', 's4']
+
+def test_small_budget_still_reaches_every_stage(photo, monkeypatch):
+    image_bytes, engine, _ = photo
+    monkeypatch.setattr(ocr, 'OCR_MAX_CALLS', 6)
+    monkeypatch.setattr(ocr, 'find_text_regions', lambda image: [(0, 0, 100, 40), (0, 100, 90, 30)])
+
+    ocr.process_image_ocr(image_bytes)
+
+    assert stages_on(engine.calls, (40, 100)) == ['s1', 's2', 's3', 's4']
+    assert stages_on(engine.calls, (400, 400)) == ['s1', 's2', 's3', 's4']
+
+def test_confident_match_stops_cascade(photo, monkeypatch):
+    image_bytes, engine, _ = photo
+    engine.text = 'SKT: 01.02.2027'
+    monkeypatch.setattr(ocr, 'find_text_regions', lambda image: [(0, 0, 100, 40), (0, 100, 90, 30)])
+
+    [result] = ocr.process_image_ocr(image_bytes)
+
+    assert result['date_str'] == '01.02.2027'
+    assert result['stage'] == 'region0/s1_psm6'
+    assert len(engine.calls) == 1
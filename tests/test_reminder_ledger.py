@@ -0,0 +1,75 @@
+import asyncio
+from datetime import date
+
+import scheduler
+from conftest import FakeBot, add_user, add_product
+from database import FailedNotification, ProductReminder, REMINDER_STAGE_WEEK, REMINDER_STAGE_DAY, REMINDER_STAGE_EXPIRED
+
+TODAY = date(2026, 3, 10)
+
+def ledger(db):
+    db.expire_all()
+    return {row.product_id: row.stage for row in db.query(ProductReminder)}
+
+def test_stage_selection(db):
+    user_id = add_user(db, 100)
+    week = add_product(db, user_id, 'Süt', date(2026, 3, 15))
+    tomorrow = add_product(db, user_id, 'Yoğurt', date(2026, 3, 11))
+    expired = add_product(db, user_id, 'Peynir', date(2026, 3, 8))
+    # Pencere dışındakiler: REMINDER_DAYS'den uzak ve lookback'ten eski
+    add_product(db, user_id, 'Makarna', date(2026, 4, 30))
+    add_product(db, user_id, 'Un', date(2026, 1, 1))
+
+    bot = FakeBot()
+    stats = asyncio.run(scheduler.check_expiring_products(bot, today=TODAY))
+
+    assert stats['scanned'] == 3
+    assert stats['sent'] == 1
+    [(chat_id, text)] = bot.sent
+    assert chat_id == 100
+    assert "3 ürününüzün" in text
+    assert "Peynir\nSKT: 08.03.2026 (SKT GEÇMİŞ!)" in text
+    assert "Yoğurt\nSKT: 11.03.2026 (1 gün kaldı)" in text
+    assert "Makarna" not in text and "Un\n" not in text
+    assert ledger(db) == {week: REMINDER_STAGE_WEEK, tomorrow: REMINDER_STAGE_DAY, expired: REMINDER_STAGE_EXPIRED}
+
+def test_ledger_dedupe(db):
+    user_id = add_user(db, 100)
+    week = add_product(db, user_id, 'Süt', date(2026, 3, 15))
+    tomorrow = add_product(db, user_id, 'Yoğurt', date(2026, 3, 11))
+
+    bot = FakeBot()
+    asyncio.run(scheduler.check_expiring_products(bot, today=TODAY))
+    assert len(bot.sent) == 1
+
+    # Aynı gün tekrar taramak yeni bildirim göndermez
+    stats = asyncio.run(scheduler.check_expiring_products(bot, today=TODAY))
+    assert stats['scanned'] == 0
+    assert len(bot.sent) == 1
+
+    # Ertesi gün aşaması değişmeyen ürünler de tekrar bildirilmez (yarın -> bugün aynı aşama)
+    stats = asyncio.run(scheduler.check_expiring_products(bot, today=date(2026, 3, 11)))
+    assert stats['scanned'] == 0
+
+    # Yalnızca yeni aşamaya geçen ürün tekrar bildirilir
+    stats = asyncio.run(scheduler.check_expiring_products(bot, today=date(2026, 3, 13)))
+    assert stats['scanned'] == 1
+    assert "1 ürününüzün" in bot.sent[-1][1] and "Yoğurt" in bot.sent[-1][1]
+    assert ledger(db) == {week: REMINDER_STAGE_WEEK, tomorrow: REMINDER_STAGE_EXPIRED}
+
+def test_failed_deliveries_are_not_marked(db):
+    delivered = add_product(db, add_user(db, 100), 'Süt', date(2026, 3, 12))
+    blocked = add_product(db, add_user(db, 200), 'Yoğurt', date(2026, 3, 12))
+
+    bot = FakeBot(blocked={200})
+    stats = asyncio.run(scheduler.check_expiring_products(bot, today=TODAY))
+
+    assert (stats['sent'], stats['failed']) == (1, 1)
+    assert ledger(db) == {delivered: REMINDER_STAGE_WEEK}
+    assert [row.chat_id for row in db.query(FailedNotification)] == [200]
+
+    # Gönderilemeyen özet sonraki taramada tekrar denenir
+    bot.blocked.clear()
+    stats = asyncio.run(scheduler.check_expiring_products(bot, today=TODAY))
+    assert [chat_id for chat_id, _ in bot.sent] == [100, 200]
+    assert ledger(db) == {delivered: REMINDER_STAGE_WEEK, blocked: REMINDER_STAGE_WEEK}
@@ -0,0 +1,41 @@
+import asyncio
+from datetime import date, datetime
+
+import database
+import scheduler
+from conftest import FakeBot, add_user, add_product
+from database import User
+
+def test_next_reminder_at_advances(db):
+    user_id = add_user(db, 100)
+    add_product(db, user_id, 'Süt', date(2026, 3, 12))
+    database.set_reminder_settings(db, user_id, '09:00', 'Europe/Istanbul', datetime(2026, 3, 10, 6, 0))
+    other_id = add_user(db, 200)
+    add_product(db, other_id, 'Yoğurt', date(2026, 3, 12))
+    database.set_reminder_settings(db, other_id, '18:00', 'Europe/Istanbul', datetime(2026, 3, 10, 15, 0))
+
+    bot = FakeBot()
+    now = datetime(2026, 3, 10, 6, 1)
+    stats = asyncio.run(scheduler.send_due_reminders(bot, now))
+
+    # Yalnızca zamanı gelen kullanıcı işlenir ve ertesi güne ilerletilir (09:00 İstanbul = 06:00 UTC)
+    assert stats['users'] == 1
+    assert [chat_id for chat_id, _ in bot.sent] == [100]
+    db.expire_all()
+    assert db.get(User, user_id).next_reminder_at == datetime(2026, 3, 11, 6, 0)
+    assert db.get(User, other_id).next_reminder_at == datetime(2026, 3, 10, 15, 0)
+
+    # Aynı turda tekrar çalışmak aynı kullanıcıyı yeniden almaz
+    stats = asyncio.run(scheduler.send_due_reminders(bot, now))
+    assert stats['users'] == 0
+    assert len(bot.sent) == 1
+
+def test_unscheduled_users_get_a_time(db):
+    user_id = add_user(db, 100)
+    bot = FakeBot()
+    stats = asyncio.run(scheduler.send_due_reminders(bot, datetime(2026, 3, 10, 12, 0)))
+
+    assert stats['scheduled'] == 1
+    db.expire_all()
+    expected = scheduler.next_reminder_at(user_id, None, None, datetime(2026, 3, 10, 12, 0))
+    assert db.get(User, user_id).next_reminder_at == expected > datetime(2026, 3, 10, 12, 0)
@@ -0,0 +1,59 @@
+import asyncio
+import inspect
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from telegram.ext import Application
+
+import bot
+import database
+import scheduler
+from conftest import FakeBot, add_user, add_product
+
+def jobs_by_name(application):
+    return {job.name: job for job in application.job_queue.jobs()}
+
+def test_setup_scheduler_registers_jobs():
+    application = Application.builder().token('1:test').build()
+    scheduler.setup_scheduler(application)
+    jobs = jobs_by_name(application)
+
+    assert set(jobs) == {'claim_shard_leases', 'renew_shard_leases', 'send_due_reminders', 'archive_expired_products'}
+    # Geri çağrılar coroutine fonksiyonlarıdır; iş kuyruğu onları bekler
+    assert all(inspect.iscoroutinefunction(job.callback) for job in jobs.values())
+    assert jobs['send_due_reminders'].callback is scheduler.reminder_job
+    assert jobs['send_due_reminders'].job.trigger.interval == timedelta(seconds=scheduler.REMINDER_TICK_SECONDS)
+    lease_interval = application.bot_data['shard_leases'].lease_seconds // 3
+    assert jobs['renew_shard_leases'].job.trigger.interval == timedelta(seconds=lease_interval)
+
+    archive = jobs['archive_expired_products'].job.trigger
+    hour, minute = scheduler.ARCHIVE_TIME.split(':')
+    fields = {field.name: str(field) for field in archive.fields}
+    assert (fields['hour'], fields['minute']) == (str(int(hour)), str(int(minute)))
+    assert str(archive.timezone) == scheduler.REMINDER_TIMEZONE
+
+def test_main_schedules_reminders(monkeypatch):
+    captured = {}
+    monkeypatch.setattr(bot, 'BOT_MODE', 'polling')
+    monkeypatch.setattr(Application, 'run_polling', lambda self, **kwargs: captured.setdefault('application', self))
+    bot.main()
+
+    jobs = jobs_by_name(captured['application'])
+    assert jobs['send_due_reminders'].callback is scheduler.reminder_job
+    assert 'archive_expired_products' in jobs
+
+def test_reminder_job_sends_due_reminders(db):
+    user_id = add_user(db, 100)
+    add_product(db, user_id, 'Süt', datetime.now().date() + timedelta(days=2))
+    database.set_reminder_settings(db, user_id, None, None, datetime(2000, 1, 1))
+
+    application = Application.builder().token('1:test').build()
+    scheduler.setup_scheduler(application)
+    leases = application.bot_data['shard_leases']
+    leases.owned = [0]
+    context = SimpleNamespace(bot=FakeBot(), bot_data=application.bot_data)
+
+    asyncio.run(jobs_by_name(application)['send_due_reminders'].callback(context))
+
+    assert [chat_id for chat_id, _ in context.bot.sent] == [100]
+    assert application.bot_data['last_reminder_run']['users'] == 1
@@ -0,0 +1,92 @@
+import json
+import asyncio
+
+import pytest
+from telegram import Bot
+from tornado.httpclient import AsyncHTTPClient
+from tornado.httpserver import HTTPServer
+from tornado.testing import bind_unused_port
+
+import webhook
+
+class FakeApplication:
+    def __init__(self):
+        self.initialized = False
+
+    async def initialize(self):
+        self.initialized = True
+
+def test_webhook_url_requires_secret_token():
+    application = FakeApplication()
+    with pytest.raises(RuntimeError, match="WEBHOOK_SECRET_TOKEN"):
+        asyncio.run(webhook.serve_webhook(application, url='https://bot.example.com', secret_token=''))
+    # Hiçbir şey başlatılmadan durur
+    assert not application.initialized
+
+def test_web_app_rejects_empty_secret_token():
+    with pytest.raises(ValueError):
+        webhook.make_web_app(FakeApplication(), secret_token='')
+
+# Kaydedilmiş bir Telegram güncellemesi
+UPDATE_JSON = {
+    'update_id': 1001,
+    'message': {
+        'message_id': 7,
+        'date': 1767225600,
+        'chat': {'id': 42, 'type': 'private'},
+        'from': {'id': 42, 'is_bot': False, 'first_name': 'Ayşe'},
+        'text': '/start',
+    },
+}
+
+class QueueApplication:
+    def __init__(self):
+        self.bot = Bot('1:test')
+        self.update_queue = asyncio.Queue()
+        self.running = True
+
+async def request(application, method, path, body=None, headers=None):
+    sock, port = bind_unused_port()
+    server = HTTPServer(webhook.make_web_app(application, 'telegram', 's3cret'))
+    server.add_sockets([sock])
+    try:
+        response = await AsyncHTTPClient().fetch(
+            f'http://127.0.0.1:{port}{path}', method=method, body=body,
+            headers=headers or {}, raise_error=False)
+    finally:
+        server.stop()
+    return response
+
+def post_update(application, headers):
+    return asyncio.run(request(application, 'POST', '/telegram', json.dumps(UPDATE_JSON), headers))
+
+def test_update_with_secret_is_queued():
+    application = QueueApplication()
+    response = post_update(application, {webhook.SECRET_HEADER: 's3cret'})
+    assert response.code == 200
+    update = application.update_queue.get_nowait()
+    assert update.update_id == 1001
+    assert update.message.text == '/start'
+
+@pytest.mark.parametrize('headers', [{webhook.SECRET_HEADER: 'yanlis'}, {}])
+def test_update_without_valid_secret_is_rejected(headers):
+    application = QueueApplication()
+    response = post_update(application, headers)
+    assert response.code == 403
+    assert application.update_queue.empty()
+
+def test_invalid_json_is_rejected():
+    application = QueueApplication()
+    response = asyncio.run(request(application, 'POST', '/telegram', 'bozuk', {webhook.SECRET_HEADER: 's3cret'}))
+    assert response.code == 400
+
+def test_healthz_reports_status():
+    application = QueueApplication()
+    response = asyncio.run(request(application, 'GET', '/healthz'))
+    assert response.code == 200
+    assert json.loads(response.body) == {'status': 'ok', 'update_queue': 0}
+
+    application.running = False
+    response = asyncio.run(request(application, 'GET', '/healthz'))
+    assert response.code == 503
+    assert json.loads(response.body)['status'] == 'stopped'
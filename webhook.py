@@ -0,0 +1,132 @@
+import os
+import json
+import hmac
+import signal
+import asyncio
+import secrets
+import logging
+from dotenv import load_dotenv
+from tornado.httpserver import HTTPServer
+from tornado.web import Application as WebApplication, RequestHandler
+from telegram import Update
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Telegram'ın güncellemeleri göndereceği genel adres (ör. https://bot.example.com).
+# Boş bırakılırsa setWebhook çağrılmaz; sunucu yalnızca yerel POST'ları kabul eder (test için).
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '').rstrip('/')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', 8443))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'telegram').strip('/')
+# Telegram her istekte bu değeri X-Telegram-Bot-Api-Secret-Token başlığında gönderir.
+# WEBHOOK_URL ayarlıysa zorunludur: birden fazla süreç aynı değeri kullanmalıdır, aksi halde
+# setWebhook'u son çağıran sürecin anahtarı diğerlerinin isteklerini reddettirir.
+# Yalnızca WEBHOOK_URL boşken (yerel deneme) boş bırakılabilir; o zaman rastgele üretilir.
+WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN', '')
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', 40))
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+class TelegramUpdateHandler(RequestHandler):
+    # tornado RequestHandler'da self.application web uygulamasıdır; bot uygulaması ayrı tutulur
+    def initialize(self, bot_application, secret_token):
+        self.bot_application = bot_application
+        self.secret_token = secret_token
+
+    async def post(self):
+        token = self.request.headers.get(SECRET_HEADER, '')
+        if not hmac.compare_digest(token, self.secret_token):
+            logger.warning(f"Geçersiz webhook gizli anahtarı ({self.request.remote_ip})")
+            self.set_status(403)
+            return
+
+        try:
+            data = json.loads(self.request.body)
+            update = Update.de_json(data, self.bot_application.bot)
+        except Exception as e:
+            logger.warning(f"Webhook isteği çözülemedi: {str(e)}")
+            self.set_status(400)
+            return
+
+        # Güncelleme işlenmeyi beklemeden kuyruğa alınır; Telegram'a hemen 200 döner
+        await self.bot_application.update_queue.put(update)
+        self.set_status(200)
+
+class HealthHandler(RequestHandler):
+    def initialize(self, bot_application):
+        self.bot_application = bot_application
+
+    def get(self):
+        running = self.bot_application.running
+        self.set_status(200 if running else 503)
+        self.write({
+            'status': 'ok' if running else 'stopped',
+            'update_queue': self.bot_application.update_queue.qsize(),
+        })
+
+def make_web_app(application, path=WEBHOOK_PATH, secret_token=WEBHOOK_SECRET_TOKEN):
+    if not secret_token:
+        raise ValueError("Webhook gizli anahtarı boş olamaz")
+    return WebApplication([
+        (f'/{path}', TelegramUpdateHandler, {'bot_application': application, 'secret_token': secret_token}),
+        (r'/healthz', HealthHandler, {'bot_application': application}),
+    ])
+
+async def serve_webhook(application, allowed_updates=None, listen=WEBHOOK_LISTEN, port=WEBHOOK_PORT,
+                        path=WEBHOOK_PATH, url=WEBHOOK_URL, secret_token=WEBHOOK_SECRET_TOKEN, stop_event=None):
+    # run_polling'in webhook karşılığı: uygulamayı başlatır, HTTP sunucusunu açar,
+    # stop_event (ya da SIGINT/SIGTERM) gelene kadar çalışır ve her şeyi sırayla kapatır
+    if not secret_token:
+        if url:
+            raise RuntimeError("WEBHOOK_URL ayarlıyken WEBHOOK_SECRET_TOKEN da ayarlanmalıdır")
+        # Yerel deneme: Telegram'a kaydedilmediği için anahtar yalnızca burada görünür
+        secret_token = secrets.token_urlsafe(32)
+        logger.warning(f"WEBHOOK_SECRET_TOKEN boş, bu çalıştırma için üretilen anahtar: {secret_token}")
+
+    loop = asyncio.get_running_loop()
+    stop_event = stop_event or asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except (NotImplementedError, RuntimeError):
+            # Windows'ta sinyal işleyicisi yok; Ctrl+C KeyboardInterrupt olarak gelir
+            pass
+
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    server = None
+    try:
+        await application.start()
+        server = HTTPServer(make_web_app(application, path, secret_token))
+        server.listen(port, address=listen)
+        logger.info(f"Webhook sunucusu dinleniyor: {listen}:{port}/{path}")
+
+        if url:
+            await application.bot.set_webhook(
+                url=f"{url}/{path}",
+                secret_token=secret_token,
+                allowed_updates=allowed_updates,
+                max_connections=WEBHOOK_MAX_CONNECTIONS
+            )
+            logger.info(f"Webhook ayarlandı: {url}/{path}")
+        else:
+            logger.warning("WEBHOOK_URL boş, setWebhook çağrılmadı; güncellemeler yalnızca doğrudan POST ile gelir")
+
+        await stop_event.wait()
+    finally:
+        if server is not None:
+            server.stop()
+        if application.running:
+            await application.stop()
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+
+def run_webhook(application, allowed_updates=None):
+    try:
+        asyncio.run(serve_webhook(application, allowed_updates))
+    except KeyboardInterrupt:
+        pass